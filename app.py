@@ -9,12 +9,25 @@ import json
 from datetime import datetime
 import traceback
 import sys
+import uuid
+import time
 
 # Import modular components
 from cleaning_functions import *
 from transformations import *
 from profiling import *
 from reporting import *
+from versioning import FrameVersionStore
+from session_manager import SessionDataManager, MB
+from jobs import JobManager
+from exports import export_csv, export_excel, export_json
+from data_browser import DataBrowser
+from frame_index import FrameIndex, parse_value
+from instrumentation import measure, format_metrics, METRIC_FIELDS
+from validation import (RULE_CHECKS, RULE_TYPES, compile_rules, validate_frame, validation_summary,
+                        describe_rule, rules_to_json, rules_from_json)
+# The out-of-core, drift and admin panels import their modules when they are shown
+from incremental import pipeline_step, run_step, new_pipeline, add_step, copy_pipeline, append_rows
 
 # Enhanced error handling decorator
 def handle_errors(func):
@@ -72,9 +85,22 @@ class CleaningProgress:
         total = len(self.steps)
         return completed, total, self.current_step
 
+# One data manager per server process, shared by every session
+@st.cache_resource
+def get_session_manager():
+    return SessionDataManager()
+
+session_manager = get_session_manager()
+
 # Initialize session state
-if 'df' not in st.session_state:
-    st.session_state.df = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+# The working frame lives in the session manager between reruns so idle sessions can be spilled
+if 'df' in st.session_state:
+    # A run that ended in st.rerun() never reached the hand-back at the bottom of the script
+    session_manager.put_frame(st.session_state.session_id, 'df', st.session_state.df)
+else:
+    st.session_state.df = session_manager.get_frame(st.session_state.session_id, 'df')
 if 'progress' not in st.session_state:
     st.session_state.progress = CleaningProgress()
 if 'theme' not in st.session_state:
@@ -85,6 +111,40 @@ if 'cleaning_steps' not in st.session_state:
     st.session_state.cleaning_steps = []
 if 'version' not in st.session_state:
     st.session_state.version = "1.0"
+if 'df_version' not in st.session_state:
+    st.session_state.df_version = 0
+if 'versions' not in st.session_state:
+    st.session_state.versions = FrameVersionStore()
+    session_manager.put_artifact(st.session_state.session_id, 'versions', st.session_state.versions)
+if 'upload_id' not in st.session_state:
+    st.session_state.upload_id = None
+if 'jobs' not in st.session_state:
+    st.session_state.jobs = JobManager()
+    # Finished results, the query index and pipeline state count toward the session's budget
+    session_manager.put_artifact(st.session_state.session_id, 'jobs', st.session_state.jobs)
+if 'active_job_ids' not in st.session_state:
+    st.session_state.active_job_ids = set()
+if 'validation_rules' not in st.session_state:
+    st.session_state.validation_rules = []
+if 'operation_log' not in st.session_state:
+    st.session_state.operation_log = []
+if 'frame_index' not in st.session_state:
+    st.session_state.frame_index = FrameIndex()
+    session_manager.put_artifact(st.session_state.session_id, 'frame_index', st.session_state.frame_index)
+if 'browser' not in st.session_state:
+    st.session_state.browser = DataBrowser(index=st.session_state.frame_index)
+# Files larger than memory are worked on as Parquet partitions on disk instead of st.session_state.df
+if 'dataset' not in st.session_state:
+    st.session_state.dataset = None
+    st.session_state.export_dir = None
+# Only the compact sketch of a comparison baseline is kept, never its frame
+if 'baseline_sketch' not in st.session_state:
+    st.session_state.baseline_sketch = None
+    st.session_state.baseline_name = None
+# Replayable steps with their fitted state, per frame version, for appending new rows
+if 'pipelines' not in st.session_state:
+    st.session_state.pipelines = {}
+    session_manager.put_artifact(st.session_state.session_id, 'pipelines', st.session_state.pipelines)
 
 # Apply selected theme
 def apply_theme(theme_name):
@@ -306,6 +366,293 @@ def apply_theme(theme_name):
 # Apply theme on every run
 apply_theme(st.session_state.theme)
 
+# ===== CLEANING HISTORY & BACKGROUND JOBS =====
+# Timings of the most recent operations (cleaning steps, profiling, exports) kept per session
+OPERATION_LOG_SIZE = 200
+
+def log_operation(metrics):
+    st.session_state.operation_log.append(metrics)
+    del st.session_state.operation_log[:-OPERATION_LOG_SIZE]
+
+def record_step(step_description, metrics=None, step=None, pipeline=None):
+    # The new version's pipeline is the previous one plus `step`, or `pipeline` when an append produced it
+    previous = st.session_state.df_version
+    st.session_state.df_version = st.session_state.versions.commit(st.session_state.df, step_description)
+    if pipeline is None:
+        pipeline = add_step(st.session_state.pipelines.get(previous), step, step_description)
+    live = {version['id'] for version in st.session_state.versions.history()}
+    st.session_state.pipelines = {version: kept for version, kept in st.session_state.pipelines.items()
+                                  if version in live}
+    st.session_state.pipelines[st.session_state.df_version] = pipeline
+    session_manager.put_artifact(st.session_state.session_id, 'pipelines', st.session_state.pipelines)
+    step = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "step": step_description
+    }
+    if metrics is not None:
+        log_operation(metrics)
+        step.update({field: metrics[field] for field in METRIC_FIELDS})
+    st.session_state.cleaning_steps.append(step)
+    st.success(step_description)
+
+def run_in_background(name, label, func, df, *args, unit='rows', step_name=None, replay=None, **kwargs):
+    # The result replaces st.session_state.df on the first rerun after the job finishes;
+    # replay holds the record_step arguments for the pipeline
+    st.session_state.jobs.submit((name, st.session_state.df_version), label, func, df, *args,
+                                 kind='frame', base_version=st.session_state.df_version,
+                                 unit=unit, step_name=step_name, replay=replay, **kwargs)
+    st.info(f"{label} started in the background. Progress is shown in the sidebar.")
+
+def run_step_in_background(name, label, df, step, unit='rows', step_name=None):
+    # The job fills the step's state in place, so the step is recorded once the result is applied
+    run_in_background(name, label, run_step, df, step, unit=unit, step_name=step_name, replay={'step': step})
+
+def background_artifact(name, label, func, df, *args, unit='rows', **kwargs):
+    jobs = st.session_state.jobs
+    key = (name, st.session_state.df_version)
+    job = jobs.get(key)
+    if job is None or not job.matches(func, *args, **kwargs):
+        job = jobs.submit(key, label, func, df, *args, unit=unit, **kwargs)
+    if job.status == 'done':
+        if job.metrics is not None:
+            log_operation(job.metrics)
+            job.metrics = None
+        return job.result
+    if job.status == 'failed':
+        st.error(f"{label} failed")
+        with st.expander("Technical Details", expanded=False):
+            st.code(job.error)
+    elif job.status == 'cancelled':
+        if st.button(f"Restart {label.lower()}", key=f"restart_{name}"):
+            jobs.submit(key, label, func, df, *args, unit=unit, **kwargs)
+            st.rerun()
+    else:
+        st.caption(f"{label} is running in the background...")
+    return None
+
+def apply_finished_jobs():
+    jobs = st.session_state.jobs
+    # Jobs seen finishing here don't need the job panel to trigger another rerun,
+    # which would clear the messages shown below
+    st.session_state.active_job_ids = {job.id for job in jobs.active()}
+    for job in jobs.finished_frame_jobs():
+        job.applied = True
+        if job.status == 'done':
+            # Only commit if nothing else changed the frame while the job was running
+            if job.base_version != st.session_state.df_version:
+                st.warning(f"Discarded the result of '{job.label}' because the data changed while it was running")
+                continue
+            st.session_state.df, report = job.result
+            job.result = None
+            if job.step_name:
+                st.session_state.progress.complete_step(job.step_name)
+            record_step(report, job.metrics, **(job.replay or {}))
+        elif job.status == 'failed':
+            st.error(f"{job.label} failed")
+            with st.expander("Technical Details", expanded=False):
+                st.code(job.error)
+        else:
+            st.info(f"{job.label} was cancelled")
+    jobs.prune(st.session_state.df_version)
+
+def _render_job_panel():
+    active = st.session_state.jobs.active()
+    active_ids = {job.id for job in active}
+    finished = st.session_state.active_job_ids - active_ids
+    st.session_state.active_job_ids = active_ids
+    if finished:
+        st.rerun()
+    
+    st.header("Background Jobs")
+    for job in active:
+        st.progress(job.fraction, text=job.describe())
+        if st.button("Cancel", key=f"cancel_job_{job.id}"):
+            job.cancel()
+
+def job_panel():
+    if not st.session_state.jobs.active() and not st.session_state.active_job_ids:
+        return
+    if hasattr(st, 'fragment'):
+        # Poll once a second; a full rerun is triggered when a job finishes
+        st.fragment(run_every=1)(_render_job_panel)()
+    else:
+        _render_job_panel()
+
+apply_finished_jobs()
+
+# ===== VALIDATION =====
+def show_validation_result(result):
+    if result['passed']:
+        st.success(validation_summary(result))
+    else:
+        st.error(validation_summary(result).split("\n")[0])
+    st.dataframe(pd.DataFrame([{
+        "Rule": rule['rule'],
+        "Violations": rule['violations'],
+        "Sample rows": ", ".join(map(str, rule['sample_rows'])),
+    } for rule in result['rules']]))
+
+def run_export_validation(df):
+    # Returns True when the current frame may be exported
+    rules = st.session_state.validation_rules
+    if not rules:
+        return True
+    name = f"validation_{hash(rules_to_json(rules))}"
+    result = background_artifact(name, "Validation", validate_frame, df, rules)
+    if result is None:
+        # A validation that errored (e.g. rules loaded for other columns) is reported above and
+        # doesn't hold back the export; one still running does
+        job = st.session_state.jobs.get((name, st.session_state.df_version))
+        if job is not None and job.status == 'failed':
+            st.warning("The data could not be validated, so exports are not checked against the rules.")
+            return True
+        return False
+    show_validation_result(result)
+    if result['passed']:
+        return True
+    return st.checkbox("Export anyway", value=False, key="export_override")
+
+# ===== OUT-OF-CORE DATASETS =====
+def set_dataset(dataset):
+    # Each operation writes new partitions; the ones it replaces are deleted from disk
+    previous = st.session_state.dataset
+    st.session_state.dataset = dataset
+    session_manager.put_artifact(st.session_state.session_id, 'dataset', dataset)
+    if previous is not None and previous is not dataset:
+        previous.close()
+
+def record_dataset_step(dataset, step_description, metrics):
+    set_dataset(dataset)
+    log_operation(metrics)
+    st.session_state.cleaning_steps.append({
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "step": step_description,
+        **{field: metrics[field] for field in METRIC_FIELDS}
+    })
+    st.success(step_description)
+
+def open_partitioned(source, name):
+    from out_of_core import PartitionedDataset
+    with st.spinner(f"Converting {name} to Parquet partitions..."):
+        dataset, metrics = measure("Partitioned upload", PartitionedDataset.from_csv, source)
+    # The in-memory frame and its history are dropped; the partitions are the working data now
+    st.session_state.df = None
+    session_manager.put_frame(st.session_state.session_id, 'df', None)
+    st.session_state.versions.close()
+    st.session_state.versions = FrameVersionStore()
+    session_manager.put_artifact(st.session_state.session_id, 'versions', st.session_state.versions)
+    st.session_state.progress.complete_step("Upload")
+    record_dataset_step(dataset, f"Converted {name} into {len(dataset.partitions)} Parquet partitions "
+                                 f"({dataset.rows} rows, {len(dataset.columns)} columns)", metrics)
+
+def out_of_core_panel(dataset):
+    from out_of_core import OUTLIER_METHODS, filter_outliers, apply_rowwise, encode_partitions
+    st.subheader("Partitioned Data (out-of-core)")
+    st.info(f"{dataset.rows:,} rows × {len(dataset.columns)} columns in {len(dataset.partitions)} partitions "
+            f"({dataset.disk_usage() / MB:.1f} MB on disk). Row-wise steps run partition by partition; "
+            "previews and profiles use a random sample.")
+    columns = dataset.sketch['columns']
+    num_cols = [col for col in dataset.columns if col in columns and columns[col].kind == 'numeric']
+    cat_cols = [col for col in dataset.columns if col in columns and columns[col].kind == 'categorical']
+    
+    with st.expander("📊 Outlier Detection", expanded=False):
+        st.info("Bounds are computed once for the whole dataset, then rows are filtered in every partition.")
+        outlier_method = st.radio("Select method:", OUTLIER_METHODS, horizontal=True, key="ooc_outlier_method")
+        selected_cols = st.multiselect("Select columns for outlier detection:", num_cols, key="ooc_outlier_cols")
+        threshold = st.slider("Z-score threshold", 2.0, 5.0, 3.0, key="ooc_threshold") \
+            if outlier_method == 'zscore' else None
+        if st.button("Detect and Remove Outliers", key="ooc_outliers") and selected_cols:
+            with st.spinner("Filtering partitions..."):
+                (dataset, report), metrics = measure("Outlier removal", filter_outliers, dataset, selected_cols,
+                                                     outlier_method, threshold)
+            st.session_state.progress.complete_step("Outliers")
+            record_dataset_step(dataset, report, metrics)
+    
+    with st.expander("✨ Advanced Transformations", expanded=False):
+        st.markdown("**🔤 Categorical Encoding**")
+        st.caption("The vocabulary of every column is collected from all partitions first, so codes and "
+                   "one-hot columns match across partitions.")
+        encode_cols = st.multiselect("Select columns to encode:", cat_cols, key="ooc_encode_cols")
+        encode_method = st.radio("Encoding method:", ['onehot', 'label'], horizontal=True, key="ooc_encode_method")
+        if st.button("Apply Encoding", key="ooc_encode") and encode_cols:
+            with st.spinner("Encoding partitions..."):
+                (dataset, report), metrics = measure("Encoding", encode_partitions, dataset, encode_cols,
+                                                     encode_method)
+            st.session_state.progress.complete_step("Transformations")
+            record_dataset_step(dataset, report, metrics)
+        
+        st.markdown("**📅 DateTime Feature Extraction**")
+        date_col = st.selectbox("Select datetime column:", cat_cols + num_cols, key="ooc_date_col")
+        features = st.multiselect("Select features to extract:",
+                                  ['year', 'month', 'day', 'hour', 'weekday', 'quarter'], key="ooc_features")
+        if st.button("Extract Features", key="ooc_dt_features") and date_col and features:
+            try:
+                with st.spinner("Extracting features..."):
+                    (dataset, report), metrics = measure("DateTime features", apply_rowwise, dataset,
+                                                         extract_datetime_features, date_col, features)
+                record_dataset_step(dataset, report, metrics)
+            except ValueError as e:
+                st.error(str(e))
+        
+        st.markdown("**🛠️ Custom Transformations**")
+        transform_col = st.selectbox("Select column to transform:", dataset.columns, key="ooc_transform_col")
+        operation = st.text_input("Operation (Python expression using 'x'):", "x * 2", key="ooc_operation")
+        new_col = st.text_input("New column name (optional):", key="ooc_new_col")
+        if st.button("Apply Custom Transformation", key="ooc_custom_transform"):
+            try:
+                with st.spinner("Transforming partitions..."):
+                    (dataset, report), metrics = measure("Custom transformation", apply_rowwise, dataset,
+                                                         apply_custom_transformation, transform_col, operation, new_col)
+                record_dataset_step(dataset, report, metrics)
+            except ValueError as e:
+                st.error(str(e))
+    
+    st.subheader("Preview (random sample)")
+    st.dataframe(dataset.sample.head(100))
+    
+    with st.expander("📝 Cleaning History", expanded=False):
+        for step in st.session_state.cleaning_steps:
+            st.markdown(f"<div class='glass-card'>⏱️ {step['timestamp']} - {step['step']}</div>",
+                        unsafe_allow_html=True)
+            if step.get('wall_seconds') is not None:
+                st.caption(format_metrics(step))
+
+def export_partitioned(dataset):
+    from out_of_core import ExportDirectory, export_partitions, LOCAL_FILES_DIR, local_files_enabled, resolve_local_path
+    st.subheader("Export Cleaned Data")
+    st.info("Partitioned data is streamed into one file on local disk, a partition at a time.")
+    if st.session_state.validation_rules:
+        st.caption("Validation rules are checked on in-memory data only; run them on a sample before exporting.")
+    fmt = st.radio("Format:", ['csv', 'json'], horizontal=True, key="ooc_export_format")
+    mime = 'text/csv' if fmt == 'csv' else 'application/json'
+    if st.button("Prepare Export", key="ooc_export"):
+        if st.session_state.export_dir is None:
+            st.session_state.export_dir = ExportDirectory()
+            session_manager.put_artifact(st.session_state.session_id, 'export_dir', st.session_state.export_dir)
+        with st.spinner("Writing partitions..."):
+            path, metrics = measure(f"{fmt.upper()} export", st.session_state.export_dir.write, dataset, fmt)
+        log_operation(metrics)
+        st.success(f"Exported {dataset.rows:,} rows ({os.path.getsize(path) / MB:.1f} MB)")
+    export_file = st.session_state.export_dir.file if st.session_state.export_dir is not None else None
+    if export_file and export_file.endswith(f".{fmt}"):
+        # The file is only read when the button is clicked, off the script thread
+        def read_export(path=export_file):
+            with open(path, 'rb') as f:
+                return f.read()
+        st.download_button(f"Download {fmt.upper()}", data=read_export, file_name=os.path.basename(export_file),
+                           mime=mime, key="ooc_download")
+    
+    if local_files_enabled():
+        target = st.text_input(f"Also write to a path under {LOCAL_FILES_DIR}:", key="ooc_export_path")
+        if st.button("Write to Server Path", key="ooc_export_server") and target.strip():
+            try:
+                path = resolve_local_path(target.strip())
+                _, metrics = measure(f"{fmt.upper()} export", export_partitions, dataset, path, fmt)
+                log_operation(metrics)
+                st.success(f"Wrote {dataset.rows:,} rows to {path}")
+            except (ValueError, OSError) as e:
+                st.error(f"Export failed: {str(e)}")
+
 # ===== PAGE DEFINITIONS =====
 @handle_errors
 def home_page():
@@ -395,24 +742,64 @@ def cleaning_page():
         uploaded_file = st.file_uploader("Choose CSV/Excel", type=["csv", "xlsx"], 
                                          help="Supports files up to 200MB")
         
+        # The uploader keeps returning the same file on every rerun, so only load new uploads
+        upload_id = None
         if uploaded_file:
+            upload_id = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+        if uploaded_file and upload_id != st.session_state.upload_id:
+            from out_of_core import OUT_OF_CORE_THRESHOLD
             try:
-                if uploaded_file.name.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file)
+                # Large CSVs are partitioned on disk instead of loaded; the uploader still buffers the file,
+                # so files beyond the upload limit go through the local path below on admin deployments
+                if uploaded_file.name.endswith('.csv') and uploaded_file.size > OUT_OF_CORE_THRESHOLD:
+                    open_partitioned(uploaded_file, uploaded_file.name)
+                    st.session_state.upload_id = upload_id
                 else:
-                    df = pd.read_excel(uploaded_file)
+                    reader = pd.read_csv if uploaded_file.name.endswith('.csv') else pd.read_excel
+                    df, upload_metrics = measure("Upload", reader, uploaded_file)
                 
-                st.session_state.df = df.copy()
-                st.session_state.progress.complete_step("Upload")
-                st.success("Data uploaded successfully!")
-                st.session_state.cleaning_steps.append({
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "step": f"Uploaded file: {uploaded_file.name} ({df.shape[0]} rows, {df.shape[1]} columns)"
-                })
+                    upload_step = f"Uploaded file: {uploaded_file.name} ({df.shape[0]} rows, {df.shape[1]} columns)"
+                    session_manager.put_frame(st.session_state.session_id, 'df', df, strict=True)
+                    st.session_state.df = df
+                    if st.session_state.dataset is not None:
+                        set_dataset(None)
+                    st.session_state.versions.close()
+                    st.session_state.versions = FrameVersionStore()
+                    session_manager.put_artifact(st.session_state.session_id, 'versions', st.session_state.versions)
+                    st.session_state.df_version = st.session_state.versions.commit(st.session_state.df, upload_step)
+                    st.session_state.pipelines = {st.session_state.df_version: new_pipeline(df)}
+                    session_manager.put_artifact(st.session_state.session_id, 'pipelines', st.session_state.pipelines)
+                    log_operation(upload_metrics)
+                    st.session_state.upload_id = upload_id
+                    st.session_state.progress.complete_step("Upload")
+                    st.success("Data uploaded successfully!")
+                    st.session_state.cleaning_steps.append({
+                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "step": upload_step,
+                        **{field: upload_metrics[field] for field in METRIC_FIELDS}
+                    })
             except Exception as e:
                 st.error(f"Error reading file: {str(e)}")
                 with st.expander("Technical Details", expanded=False):
                     st.code(traceback.format_exc())
+        
+        from out_of_core import LOCAL_FILES_DIR, local_files_enabled, resolve_local_path
+        if local_files_enabled():
+            st.caption("Files larger than memory")
+            local_path = st.text_input(f"CSV path under {LOCAL_FILES_DIR}", key="ooc_path",
+                                       help="Converted once into Parquet partitions on local disk and cleaned out of core")
+            if st.button("Open as Partitioned Data", key="open_ooc") and local_path.strip():
+                try:
+                    path = resolve_local_path(local_path.strip())
+                    open_partitioned(path, os.path.basename(path))
+                except Exception as e:
+                    st.error(f"Error reading file: {str(e)}")
+                    with st.expander("Technical Details", expanded=False):
+                        st.code(traceback.format_exc())
+    
+    if st.session_state.dataset is not None:
+        out_of_core_panel(st.session_state.dataset)
+        return
     
     if st.session_state.df is None:
         st.warning("Please upload a file to begin cleaning")
@@ -427,6 +814,8 @@ def cleaning_page():
         st.write("Preview")
         st.dataframe(df.head(3))
     with col2:
+        null_counts = st.session_state.browser.null_counts(df, st.session_state.df_version)
+        missing = null_counts[null_counts > 0]
         st.markdown("""
         <div class='glass-card'>
             <h4>Dataset Summary</h4>
@@ -435,38 +824,76 @@ def cleaning_page():
             <h4>Missing Values</h4>
             {}
         </div>
-        """.format(df.shape[0], df.shape[1], df.isnull().sum().rename('Count').to_frame().to_html()), 
+        """.format(df.shape[0], df.shape[1],
+                   missing.rename('Count').to_frame().to_html() if len(missing) else "<p>No missing values</p>"), 
         unsafe_allow_html=True)
     
+    # Query rows through indexes cached on the current version
+    with st.expander("🔎 Query Rows", expanded=False):
+        st.info("Count and filter rows before cleaning. Indexes are built on first use and reused "
+                "until a step changes the column.")
+        frame_index = st.session_state.frame_index.sync(df, st.session_state.df_version,
+                                                        st.session_state.versions)
+        query_cols = st.multiselect("Filter on columns", df.columns.tolist(), key="query_cols")
+        conditions = []
+        try:
+            for col in query_cols:
+                if frame_index.is_range_column(col):
+                    low_col, high_col = st.columns(2)
+                    low = low_col.text_input(f"{col} from", key=f"query_low_{col}")
+                    high = high_col.text_input(f"{col} to", key=f"query_high_{col}")
+                    if low or high:
+                        conditions.append((col, 'between', (parse_value(df[col], low) if low else None,
+                                                            parse_value(df[col], high) if high else None)))
+                elif st.radio(f"Match {col}", ["is one of", "contains"], horizontal=True,
+                              key=f"query_mode_{col}") == "is one of":
+                    values = st.multiselect(f"{col} values", frame_index.top_values(col), key=f"query_in_{col}")
+                    if values:
+                        conditions.append((col, 'in', values))
+                else:
+                    text = st.text_input(f"{col} contains", key=f"query_contains_{col}")
+                    if text:
+                        conditions.append((col, 'contains', text))
+        except (ValueError, TypeError) as e:
+            st.error(f"Invalid filter value: {str(e)}")
+            conditions = []
+        
+        if conditions:
+            start = time.perf_counter()
+            mask = frame_index.query(conditions)
+            elapsed = time.perf_counter() - start
+            matches = int(mask.sum())
+            st.write(f"**{matches:,}** of {len(df):,} rows match ({elapsed * 1000:.1f} ms)")
+            st.dataframe(df.iloc[np.flatnonzero(mask)[:5]])
+            if st.button("Keep Only Matching Rows", key="apply_query"):
+                df, metrics = measure("Query rows", lambda frame: frame[mask], df)
+                st.session_state.df = df
+                record_step(f"Kept {matches} of {len(mask)} rows matching the query on {', '.join(query_cols)}", metrics,
+                            pipeline_step('query_rows', conditions))
+    
     # Cleaning operations
     st.markdown("---")
     st.subheader("Cleaning Operations")
     
-    # Record cleaning steps
-    def record_step(step_description):
-        st.session_state.cleaning_steps.append({
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "step": step_description
-        })
-        st.success(step_description)
-    
     # 1. Remove duplicates
     with st.expander("➗ Remove Duplicates", expanded=False):
         st.info("Removes identical rows from your dataset. Only the first occurrence is kept.")
         if st.button("Remove Duplicates", key="remove_dup"):
-            df, dup_report = remove_duplicates(df)
+            step = pipeline_step('remove_duplicates')
+            (df, dup_report), metrics = measure("Remove duplicates", run_step, df, step)
             st.session_state.df = df
             st.session_state.progress.complete_step("Duplicates")
-            record_step(dup_report)
+            record_step(dup_report, metrics, step)
     
     # 2. Drop Columns
     with st.expander("🗑️ Remove Columns", expanded=False):
         st.info("Select columns to permanently remove from your dataset.")
         cols_to_drop = st.multiselect("Select columns to remove", df.columns)
         if st.button("Remove Selected Columns", key="remove_cols") and cols_to_drop:
-            df = df.drop(columns=cols_to_drop)
+            step = pipeline_step('drop_columns', cols_to_drop)
+            (df, drop_report), metrics = measure("Remove columns", run_step, df, step)
             st.session_state.df = df
-            record_step(f"Removed columns: {', '.join(cols_to_drop)}")
+            record_step(drop_report, metrics, step)
     
     # # 3. Handle Missing Values
     # with st.expander("❓ Missing Value Handling", expanded=False):
@@ -485,13 +912,55 @@ def cleaning_page():
         date_col = st.selectbox("Convert column to datetime", df.columns)
         if st.button("Convert to Datetime", key="convert_dt") and date_col:
             try:
-                df[date_col] = pd.to_datetime(df[date_col])
+                step = pipeline_step('convert_datetime', date_col)
+                (df, convert_report), metrics = measure("Convert to datetime", run_step, df, step)
                 st.session_state.df = df
-                record_step(f"Converted {date_col} to datetime")
+                record_step(convert_report, metrics, step)
             except Exception as e:
                 st.error(f"Conversion failed: {str(e)}")
     
-    # 5. Outlier Detection
+    # 4b. Text cleaning
+    with st.expander("🧽 Text Cleaning", expanded=False):
+        st.info("Trim, recase, rewrite or merge messy text values, or parse currency and percent strings "
+                "into numbers. Each distinct value is cleaned once, so large columns stay fast.")
+        text_cols = st.multiselect("Select text columns:", df.select_dtypes(include=TEXT_DTYPES).columns.tolist(),
+                                   key="text_cols")
+        text_ops = st.multiselect("Operations (applied in this order):", TEXT_OPERATIONS, default=['trim'],
+                                  key="text_ops")
+        text_pattern, text_replacement, similarity = None, '', 1.0
+        if 'replace' in text_ops:
+            text_pattern = st.text_input("Regex pattern:", key="text_pattern")
+            text_replacement = st.text_input("Replacement:", key="text_replacement")
+        if 'merge_similar' in text_ops:
+            similarity = st.slider("Similarity needed to merge values", 0.5, 1.0, 1.0, 0.05, key="text_similarity",
+                                   help="1.0 only merges values that differ in case, spacing or punctuation; "
+                                        "values with different digits are never merged")
+            if text_cols:
+                merges = merge_preview(df, text_cols, text_ops, text_pattern, text_replacement, similarity)
+                if merges.empty:
+                    st.caption("No values would be merged.")
+                else:
+                    st.caption(f"{len(merges)} values would be merged:")
+                    st.dataframe(merges, hide_index=True)
+        if st.button("Clean Text", key="clean_text") and text_cols and text_ops:
+            run_step_in_background("clean_text", "Text cleaning", df,
+                                   pipeline_step('clean_text_columns', text_cols, text_ops, text_pattern,
+                                                 text_replacement, similarity), unit='columns')
+    
+    # 5. Memory Optimization
+    with st.expander("🪶 Optimize Memory", expanded=False):
+        st.info("Shrink the dataset by downcasting numbers and storing repetitive text as categories. "
+                "Every later step runs faster on a smaller frame.")
+        category_threshold = st.slider("Convert text columns to category when unique/total ratio is at most",
+                                       0.05, 1.0, 0.5, 0.05)
+        measure_profile = st.checkbox("Measure the speedup on a profile run", value=False)
+        if st.button("Optimize Memory", key="optimize_memory"):
+            (df, memory_report), metrics = measure("Optimize memory", optimize_memory, df, category_threshold,
+                                                   generate_data_profile if measure_profile else None)
+            st.session_state.df = df
+            record_step(memory_report, metrics, pipeline_step('optimize_memory', category_threshold))
+    
+    # 6. Outlier Detection
     with st.expander("📊 Outlier Detection", expanded=False):
         st.info("Identify and remove statistical outliers using Z-score or IQR methods.")
         outlier_method = st.radio("Select method:", ['zscore', 'iqr'], horizontal=True)
@@ -501,31 +970,59 @@ def cleaning_page():
             threshold = st.slider("Z-score threshold", 2.0, 5.0, 3.0)
         else:
             threshold = None
+        outlier_group = st.selectbox("Compute statistics per group (optional):", [None] + df.columns.tolist(),
+                                     key="outlier_group",
+                                     help="E.g. a store column, so each store is compared with its own distribution")
         if st.button("Detect and Remove Outliers", key="outliers") and selected_cols:
-            df, outlier_report = detect_outliers(df, selected_cols, outlier_method, threshold)
-            st.session_state.df = df
-            st.session_state.progress.complete_step("Outliers")
-            record_step(outlier_report)
+            run_step_in_background("outliers", "Outlier removal", df,
+                                   pipeline_step('detect_outliers', selected_cols, outlier_method, threshold,
+                                                 group_by=outlier_group),
+                                   unit='columns', step_name="Outliers")
     
-    # 6. KNN Imputation
+    # 7. KNN Imputation
     with st.expander("🎯 Advanced Missing Value Handling", expanded=False):
         st.info("Use machine learning (KNN algorithm) to impute missing values based on similar rows.")
         imp_strategy = st.radio("Choose imputation method:", ['simple', 'knn'], horizontal=True)
         if imp_strategy == 'knn':
             knn_neighbors = st.slider("Number of KNN neighbors", 2, 10, 5)
             if st.button("Apply KNN Imputation", key="knn"):
-                df, knn_report = knn_imputation(df, knn_neighbors)
-                st.session_state.df = df
-                record_step(knn_report)
+                run_step_in_background("knn", "KNN imputation", df, pipeline_step('knn_imputation', knn_neighbors))
         else:
             num_strategy = st.radio("Numerical strategy:", ["mean", "median"], horizontal=True)
             cat_strategy = st.radio("Categorical strategy:", ["mode", "drop"], horizontal=True)
+            impute_group = st.selectbox("Compute mean/median per group (optional):", [None] + df.columns.tolist(),
+                                        key="impute_group")
+            
+            st.markdown("**Per-column overrides (optional)**")
+            null_counts = st.session_state.browser.null_counts(df, st.session_state.df_version)
+            missing_cols = null_counts[null_counts > 0].index.tolist()
+            override_cols = st.multiselect("Columns with their own strategy:", missing_cols)
+            # Mean, median, interpolation and group medians are only offered when every chosen column is numeric
+            all_numeric = all(pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+                              for col in override_cols)
+            override_strategy = st.selectbox("Strategy for these columns:",
+                                             [strategy for strategy in FILL_STRATEGIES
+                                              if all_numeric or strategy not in NUMERIC_FILL_STRATEGIES])
+            override_spec = override_strategy
+            if override_strategy == 'constant':
+                constant = st.text_input("Fill value:", "0")
+                override_spec = {'strategy': 'constant', 'value': constant}
+            elif override_strategy == 'group_median':
+                group_col = st.selectbox("Group by column:", [col for col in df.columns if col not in override_cols])
+                override_spec = {'strategy': 'group_median', 'by': group_col}
+            
             if st.button("Apply Basic Imputation", key="basic_impute"):
-                df, missing_report = handle_missing_values(df, num_strategy, cat_strategy)
-                st.session_state.df = df
-                record_step(missing_report)
+                strategies = {}
+                for col in override_cols:
+                    spec = override_spec
+                    if override_strategy == 'constant' and pd.api.types.is_numeric_dtype(df[col]):
+                        spec = {'strategy': 'constant', 'value': pd.to_numeric(override_spec['value'])}
+                    strategies[col] = spec
+                run_step_in_background("basic_impute", "Basic imputation", df,
+                                       pipeline_step('handle_missing_values', num_strategy, cat_strategy, strategies,
+                                                     group_by=impute_group), unit='steps')
     
-    # 7. Advanced Transformations
+    # 8. Advanced Transformations
     with st.expander("✨ Advanced Transformations", expanded=False):
         st.info("Apply advanced data transformations and feature engineering techniques.")
         
@@ -535,33 +1032,36 @@ def cleaning_page():
         norm_cols = st.multiselect("Select columns to normalize:", num_cols)
         norm_method = st.radio("Method:", ['standard', 'minmax'], horizontal=True)
         if st.button("Apply Normalization", key="normalize") and norm_cols:
-            df, norm_report = normalize_data(df, norm_cols, norm_method)
+            step = pipeline_step('normalize_data', norm_cols, norm_method)
+            (df, norm_report), metrics = measure("Normalization", run_step, df, step)
             st.session_state.df = df
             st.session_state.progress.complete_step("Transformations")
-            record_step(norm_report)
+            record_step(norm_report, metrics, step)
         
         # Encoding
         st.markdown("**🔤 Categorical Encoding**")
-        cat_cols = df.select_dtypes(include='object').columns.tolist()
+        cat_cols = df.select_dtypes(include=TEXT_DTYPES).columns.tolist()
         encode_cols = st.multiselect("Select columns to encode:", cat_cols)
         encode_method = st.radio("Encoding method:", ['onehot', 'label'], horizontal=True)
         if st.button("Apply Encoding", key="encode") and encode_cols:
-            df, encode_report = encode_categorical(df, encode_cols, encode_method)
+            step = pipeline_step('encode_categorical', encode_cols, encode_method)
+            (df, encode_report), metrics = measure("Encoding", run_step, df, step)
             st.session_state.df = df
-            record_step(encode_report)
+            record_step(encode_report, metrics, step)
         
         # DateTime Features
         st.markdown("**📅 DateTime Feature Extraction**")
         date_cols = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
         if not date_cols:
-            date_cols = df.select_dtypes(include='object').columns.tolist()
+            date_cols = df.select_dtypes(include=TEXT_DTYPES).columns.tolist()
         date_col = st.selectbox("Select datetime column:", date_cols)
         features = st.multiselect("Select features to extract:", 
                                  ['year', 'month', 'day', 'hour', 'weekday', 'quarter'])
         if st.button("Extract Features", key="dt_features") and date_col and features:
-            df, date_report = extract_datetime_features(df, date_col, features)
+            step = pipeline_step('extract_datetime_features', date_col, features)
+            (df, date_report), metrics = measure("DateTime features", run_step, df, step)
             st.session_state.df = df
-            record_step(date_report)
+            record_step(date_report, metrics, step)
         
         # Custom Transformations
         st.markdown("**🛠️ Custom Transformations**")
@@ -569,41 +1069,177 @@ def cleaning_page():
         operation = st.text_input("Operation (Python expression using 'x'):", "x * 2")
         new_col = st.text_input("New column name (optional):")
         if st.button("Apply Custom Transformation", key="custom_transform"):
-            df, custom_report = apply_custom_transformation(df, transform_col, operation, new_col)
+            step = pipeline_step('apply_custom_transformation', transform_col, operation, new_col)
+            (df, custom_report), metrics = measure("Custom transformation", run_step, df, step)
             st.session_state.df = df
-            record_step(custom_report)
+            record_step(custom_report, metrics, step)
+    
+        # SQL Transformations
+        st.markdown("**🦆 SQL Transformation**")
+        st.caption(f"Query the working data as the table `{SQL_TABLE_NAME}`. The result replaces the working data.")
+        sql_query = st.text_area("SQL query:", f"SELECT * FROM {SQL_TABLE_NAME}", key="sql_query")
+        if st.button("Run SQL", key="run_sql") and sql_query.strip():
+            run_in_background("sql", "SQL transformation", run_sql_query, df, sql_query,
+                              unit='steps', step_name="Transformations")
     
+    # 9. Validation rules
+    with st.expander("✅ Validation Rules", expanded=False):
+        st.info("Declare what the data should look like. Every export is checked against these rules.")
+        rule_check = st.selectbox("Check:", RULE_CHECKS, key="rule_check")
+        rule = {'check': rule_check}
+        if rule_check != 'expression':
+            rule['column'] = st.selectbox("Column:", df.columns.tolist(), key="rule_column")
+        if rule_check == 'type':
+            rule['type'] = st.selectbox("Expected type:", RULE_TYPES, key="rule_type")
+        elif rule_check == 'range':
+            to_bound = float if pd.api.types.is_numeric_dtype(df[rule['column']]) else str
+            low_col, high_col = st.columns(2)
+            low = low_col.text_input("Minimum:", key="rule_min")
+            high = high_col.text_input("Maximum:", key="rule_max")
+        elif rule_check == 'regex':
+            rule['pattern'] = st.text_input("Values must fully match the regex:", key="rule_pattern")
+        elif rule_check == 'allowed':
+            allowed = st.text_input("Allowed values (comma-separated):", key="rule_allowed")
+            rule['values'] = [value.strip() for value in allowed.split(",") if value.strip()]
+        elif rule_check == 'expression':
+            rule['expression'] = st.text_input("Condition every row must meet (e.g. end_date >= start_date):",
+                                               key="rule_expression")
+        if st.button("Add Rule", key="add_rule"):
+            try:
+                if rule_check == 'range':
+                    rule['min'] = to_bound(low) if low else None
+                    rule['max'] = to_bound(high) if high else None
+                compile_rules([rule], df)
+                st.session_state.validation_rules.append(rule)
+            except (ValueError, KeyError) as e:
+                st.error(f"Invalid rule: {str(e)}")
+        
+        rules = st.session_state.validation_rules
+        for i, existing in enumerate(rules):
+            rule_col, remove_col = st.columns([4, 1])
+            rule_col.markdown(f"`{describe_rule(existing)}`")
+            if remove_col.button("Remove", key=f"remove_rule_{i}"):
+                rules.pop(i)
+                st.rerun()
+        
+        rules_file = st.file_uploader("Load rules (JSON)", type=['json'], key="rules_file")
+        if rules_file is not None and st.button("Load Rules", key="load_rules"):
+            try:
+                st.session_state.validation_rules = rules_from_json(rules_file.getvalue().decode('utf-8'))
+                st.rerun()
+            except ValueError as e:
+                st.error(f"Could not load rules: {str(e)}")
+        if rules and st.button("Validate Now", key="validate"):
+            try:
+                result, metrics = measure("Validation", validate_frame, df, rules)
+                log_operation(metrics)
+                show_validation_result(result)
+            except (ValueError, KeyError, TypeError) as e:
+                st.error(f"Validation failed: {str(e)}")
+
+    # 10. Incremental append
+    with st.expander("📥 Append New Rows", expanded=False):
+        st.info("Clean a new batch of the same feed with the fill values, scaling, vocabularies, outlier bounds "
+                "and duplicate hashes fitted by the steps above, then append it. Only the new rows are processed.")
+        pipeline = st.session_state.pipelines.get(st.session_state.df_version)
+        if pipeline is None:
+            st.warning("No replayable steps are recorded for this data. Upload the file again to start recording.")
+        elif pipeline['blocked']:
+            st.warning(f"'{pipeline['blocked']}' can't be replayed on new rows. Undo it to append.")
+        else:
+            steps = [step['operation'] for step in pipeline['steps']]
+            st.caption(f"Steps replayed on the new rows: {', '.join(steps) if steps else 'none'}")
+            delta_file = st.file_uploader("New rows (CSV/Excel)", type=["csv", "xlsx"], key="append_file")
+            if st.button("Clean and Append", key="append_rows") and delta_file:
+                try:
+                    reader = pd.read_csv if delta_file.name.endswith('.csv') else pd.read_excel
+                    delta, read_metrics = measure("Append upload", reader, delta_file)
+                    log_operation(read_metrics)
+                    # The job updates a copy, so undoing the append restores the previous duplicate hashes
+                    updated = copy_pipeline(pipeline)
+                    run_in_background("append", "Incremental append", append_rows, df, delta, updated,
+                                      unit='steps', replay={'pipeline': updated})
+                except Exception as e:
+                    st.error(f"Error reading file: {str(e)}")
+
     # Show cleaned data
     st.markdown("---")
     st.subheader("Cleaned Data Preview")
-    st.dataframe(df.head(5))
+    st.session_state.frame_index.sync(df, st.session_state.df_version, st.session_state.versions)
+    st.session_state.browser.render(df, st.session_state.df_version)
     
     # Cleaning history
     with st.expander("📝 Cleaning History", expanded=False):
+        versions = st.session_state.versions
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("↩️ Undo", key="undo", disabled=not versions.can_undo()):
+                undone = versions.history()[versions.position]['label']
+                st.session_state.df = versions.undo()
+                st.session_state.df_version = versions.current_id
+                st.session_state.cleaning_steps.append({
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "step": f"Undid: {undone}"
+                })
+                st.rerun()
+        with col2:
+            if st.button("↪️ Redo", key="redo", disabled=not versions.can_redo()):
+                st.session_state.df = versions.redo()
+                st.session_state.df_version = versions.current_id
+                st.session_state.cleaning_steps.append({
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "step": f"Redid: {versions.history()[versions.position]['label']}"
+                })
+                st.rerun()
+        with col3:
+            st.caption(f"Version history: {versions.memory_usage() / 1024 ** 2:.1f} MB in memory")
+        if versions.can_undo():
+            history = versions.history()
+            last_diff = versions.diff(history[versions.position - 1]['id'], versions.current_id)
+            st.caption(f"Last step: rows {last_diff['rows_before']} → {last_diff['rows_after']}, "
+                       f"added {last_diff['added'] or 'none'}, removed {last_diff['removed'] or 'none'}, "
+                       f"changed {last_diff['changed'] or 'none'}")
+        
         if st.session_state.cleaning_steps:
             for step in st.session_state.cleaning_steps:
                 st.markdown(f"<div class='glass-card'>⏱️ {step['timestamp']} - {step['step']}</div>", 
                            unsafe_allow_html=True)
+                if step.get('wall_seconds') is not None:
+                    st.caption(format_metrics(step))
             if st.button("Clear History", key="clear_history"):
                 st.session_state.cleaning_steps = []
                 st.rerun()
         else:
             st.info("No cleaning steps recorded yet")
+        
+        if st.session_state.operation_log:
+            st.markdown("**Operation timings**")
+            st.dataframe(pd.DataFrame(st.session_state.operation_log))
 
 @handle_errors
 def profiling_page():
     # FIX: Use markdown for title instead of st.title
     st.markdown("<h1>📊 <span class='header-glow'>Data Profiling & Visualization</span></h1>", unsafe_allow_html=True)
     
-    if st.session_state.df is None:
+    dataset = st.session_state.dataset
+    if st.session_state.df is None and dataset is None:
         st.warning("Please upload a file and clean your data first")
         return
     
-    df = st.session_state.df
-    
-    # Generate data profile
-    with st.spinner("Generating data profile..."):
-        profile = generate_data_profile(df)
+    if dataset is not None:
+        from out_of_core import profile_dataset
+        # Partitioned data is profiled from its sample, with counts and moments from its sketch
+        df = dataset.sample
+        profile = profile_dataset(dataset)
+        st.caption(f"Row counts, missing values, extremes, means and distinct counts cover all {dataset.rows:,} "
+                   f"rows; charts and the remaining statistics come from a random sample of {len(df):,} rows.")
+    else:
+        df = st.session_state.df
+        
+        # Generate data profile
+        profile = background_artifact("profile", "Profiling", generate_data_profile, df, unit='columns')
+        if profile is None:
+            return
     
     # Profile summary cards
     col1, col2, col3, col4 = st.columns(4)
@@ -632,16 +1268,72 @@ def profiling_page():
     st.subheader("Correlation Analysis")
     show_correlation(df)
     
+    # Dataset comparison
+    from sketches import sketch_frame, sketch_file, compare_sketches, drift_summary, sketch_to_json
+    st.markdown("---")
+    st.subheader("🔀 Compare with Baseline")
+    st.info("Upload an earlier file of the same feed, or a saved sketch, to see which columns drifted. "
+            "Only compact summaries of both datasets are compared.")
+    sketch = dataset.sketch if dataset is not None else background_artifact("sketch", "Sketching", sketch_frame, df)
+    baseline_file = st.file_uploader("Baseline CSV/Excel or saved sketch (JSON)", type=["csv", "xlsx", "json"],
+                                     key="baseline_file")
+    if baseline_file and baseline_file.name != st.session_state.baseline_name:
+        try:
+            with st.spinner("Summarizing baseline..."):
+                baseline, metrics = measure("Baseline sketch", sketch_file, baseline_file, baseline_file.name)
+            log_operation(metrics)
+            st.session_state.baseline_sketch = baseline
+            st.session_state.baseline_name = baseline_file.name
+        except Exception as e:
+            st.error(f"Error reading baseline: {str(e)}")
+            with st.expander("Technical Details", expanded=False):
+                st.code(traceback.format_exc())
+    drift = None
+    if sketch is not None:
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Use current data as baseline", key="set_baseline"):
+                st.session_state.baseline_sketch = sketch
+                st.session_state.baseline_name = f"current data (version {st.session_state.df_version})"
+        with col2:
+            st.download_button("Download Sketch (JSON)", data=sketch_to_json(sketch),
+                               file_name="dataset_sketch.json", mime="application/json", key="download_sketch")
+        if st.session_state.baseline_sketch is not None:
+            drift = compare_sketches(st.session_state.baseline_sketch, sketch)
+            st.caption(f"Baseline: {st.session_state.baseline_name}")
+            summary = drift_summary(drift)
+            if any(column['status'] != 'stable' for column in drift['columns']) or \
+                    drift['added_columns'] or drift['removed_columns'] or drift['dtype_changes']:
+                st.warning(summary)
+            else:
+                st.success(summary)
+            st.dataframe(pd.DataFrame([{
+                "Column": column['column'],
+                "Status": column['status'],
+                "PSI": column['psi'],
+                "KS": column['ks'],
+                "Null rate (baseline)": column['null_rate_baseline'],
+                "Null rate (current)": column['null_rate_current'],
+                "Distinct (baseline)": column['distinct_baseline'],
+                "Distinct (current)": column['distinct_current'],
+            } for column in drift['columns']]))
+    
     # Data Quality Report
     st.markdown("---")
     st.subheader("📝 Data Quality Report")
     st.info("Generate a comprehensive PDF report of your data quality with detailed statistics.")
+    include_charts = st.checkbox("Include charts for every column", value=False,
+                                 help="Renders a compact histogram or bar chart per column from a sample of the data")
     if st.button("Generate PDF Report", key="pdf_report"):
         with st.spinner("Generating report..."):
             try:
-                report_path = create_quality_report(profile)
-                with open(report_path, "rb") as f:
-                    pdf_bytes = f.read()
+                figures = None
+                if include_charts:
+                    figures, metrics = measure("Column charts", render_column_figures, df)
+                    log_operation(metrics)
+                pdf_bytes, metrics = measure("PDF report", create_quality_report, profile, figures,
+                                             drift=drift)
+                log_operation(metrics)
                 st.session_state.progress.complete_step("Profiling")
                 st.success("Report generated successfully!")
                 st.download_button(
@@ -650,27 +1342,19 @@ def profiling_page():
                     file_name="data_quality_report.pdf",
                     mime="application/pdf"
                 )
-                os.unlink(report_path)
             except Exception as e:
                 st.error(f"Error generating report: {str(e)}")
                 with st.expander("Technical Details", expanded=False):
                     st.code(traceback.format_exc())
 
-@handle_errors
-def export_page():
-    # FIX: Use markdown for title instead of st.title
-    st.markdown("<h1>💾 <span class='header-glow'>Export Data</span></h1>", unsafe_allow_html=True)
-    
-    if st.session_state.df is None:
-        st.warning("No data to export. Please upload and clean your data first.")
-        return
-    
-    df = st.session_state.df
-    
+def export_in_memory(df):
     # Export formats
     st.subheader("Export Cleaned Data")
     st.info("Download your cleaned dataset in various formats for further analysis.")
     
+    # Exports are only prepared once the data passes the validation rules (or the user overrides)
+    export_allowed = run_export_validation(df)
+    
     col1, col2, col3 = st.columns(3)
     with col1:
         st.markdown("""
@@ -679,13 +1363,14 @@ def export_page():
             <p>Comma-separated values, suitable for most applications</p>
         </div>
         """, unsafe_allow_html=True)
-        csv = df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="Download CSV",
-            data=csv,
-            file_name='cleaned_data.csv',
-            mime='text/csv'
-        )
+        csv = background_artifact("export_csv", "CSV export", export_csv, df) if export_allowed else None
+        if csv is not None:
+            st.download_button(
+                label="Download CSV",
+                data=csv,
+                file_name='cleaned_data.csv',
+                mime='text/csv'
+            )
     
     with col2:
         st.markdown("""
@@ -694,16 +1379,14 @@ def export_page():
             <p>Microsoft Excel format with multiple sheets support</p>
         </div>
         """, unsafe_allow_html=True)
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='Cleaned Data')
-        excel_bytes = excel_buffer.getvalue()
-        st.download_button(
-            label="Download Excel",
-            data=excel_bytes,
-            file_name='cleaned_data.xlsx',
-            mime='application/vnd.ms-excel'
-        )
+        excel_bytes = background_artifact("export_excel", "Excel export", export_excel, df) if export_allowed else None
+        if excel_bytes is not None:
+            st.download_button(
+                label="Download Excel",
+                data=excel_bytes,
+                file_name='cleaned_data.xlsx',
+                mime='application/vnd.ms-excel'
+            )
     
     with col3:
         st.markdown("""
@@ -712,13 +1395,28 @@ def export_page():
             <p>JavaScript Object Notation, ideal for web applications</p>
         </div>
         """, unsafe_allow_html=True)
-        json_str = df.to_json(orient='records', indent=2)
-        st.download_button(
-            label="Download JSON",
-            data=json_str,
-            file_name='cleaned_data.json',
-            mime='application/json'
-        )
+        json_str = background_artifact("export_json", "JSON export", export_json, df) if export_allowed else None
+        if json_str is not None:
+            st.download_button(
+                label="Download JSON",
+                data=json_str,
+                file_name='cleaned_data.json',
+                mime='application/json'
+            )
+
+@handle_errors
+def export_page():
+    # FIX: Use markdown for title instead of st.title
+    st.markdown("<h1>💾 <span class='header-glow'>Export Data</span></h1>", unsafe_allow_html=True)
+    
+    if st.session_state.df is None and st.session_state.dataset is None:
+        st.warning("No data to export. Please upload and clean your data first.")
+        return
+    
+    if st.session_state.dataset is not None:
+        export_partitioned(st.session_state.dataset)
+    else:
+        export_in_memory(st.session_state.df)
     
     # Export cleaning history
     st.markdown("---")
@@ -748,6 +1446,14 @@ def export_page():
         st.dataframe(history_df)
     else:
         st.info("No cleaning steps recorded yet")
+    
+    if st.session_state.validation_rules:
+        st.download_button(
+            label="Download Validation Rules (JSON)",
+            data=rules_to_json(st.session_state.validation_rules),
+            file_name='validation_rules.json',
+            mime='application/json'
+        )
 
 # ===== DOCUMENTATION PAGE =====
 @handle_errors
@@ -792,7 +1498,7 @@ def documentation_page():
         <ul>
             <li>Modern web browser (Chrome, Firefox, Edge)</li>
             <li>Python 3.8+ (for local execution)</li>
-            <li>4GB+ RAM recommended for large datasets</li>
+            <li>4GB+ RAM recommended for large datasets; CSVs larger than memory are cleaned out of core</li>
         </ul>
         
         <h4>First Steps:</h4>
@@ -807,6 +1513,30 @@ def documentation_page():
     
     # ... rest of documentation page remains similar with glass-card elements ...
 
+# ===== ADMIN PAGE =====
+@handle_errors
+def admin_page():
+    import profiling
+    import reporting
+    st.markdown("<h1>🛡️ <span class='header-glow'>Server Memory Usage</span></h1>", unsafe_allow_html=True)
+    usage = session_manager.usage()
+    total = session_manager.total_bytes()
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Active Sessions", len(usage))
+    with col2:
+        st.metric("In-Memory Data", f"{total / MB:.1f} MB",
+                  help=f"Global budget: {session_manager.global_budget / MB:.0f} MB")
+    with col3:
+        st.metric("Per-Session Budget", f"{session_manager.session_budget / MB:.0f} MB")
+    
+    st.progress(min(total / session_manager.global_budget, 1.0))
+    if usage:
+        st.dataframe(pd.DataFrame(usage))
+    st.caption(f"Shared caches: {len(reporting._report_cache)} PDF reports, "
+               f"{len(profiling._figure_cache)} column figures")
+
 # ===== SIDEBAR NAVIGATION =====
 with st.sidebar:
     st.title("NeatSheet")
@@ -820,6 +1550,8 @@ with st.sidebar:
         "💾 Export Data": export_page,
         "📚 Documentation": documentation_page
     }
+    if os.environ.get('NEATSHEET_ADMIN'):
+        page_options["🛡️ Admin"] = admin_page
     selected_page = st.selectbox("Go to", list(page_options.keys()), 
                                index=list(page_options.keys()).index(st.session_state.page))
     
@@ -845,6 +1577,8 @@ with st.sidebar:
     
     # Reset button
     if st.button("🔄 Reset Session"):
+        st.session_state.jobs.shutdown()
+        session_manager.drop_session(st.session_state.session_id)
         st.session_state.clear()
         st.session_state.progress = CleaningProgress()
         st.session_state.theme = "Light"
@@ -856,3 +1590,11 @@ with st.sidebar:
 # ===== MAIN APP RENDERING =====
 page_options[selected_page]()
 
+# Rendered after the page so jobs it just started are listed straight away
+with st.sidebar:
+    job_panel()
+
+# Hand the working frame back to the session manager until the next rerun
+session_manager.put_frame(st.session_state.session_id, 'df', st.session_state.df)
+del st.session_state.df
+
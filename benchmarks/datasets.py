@@ -0,0 +1,77 @@
+import pandas as pd
+import numpy as np
+
+# Row counts for the --scale option of run_benchmarks.py
+SCALES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# Wide frames have this many columns and a tenth of the rows, so every shape fits in memory
+WIDE_COLUMNS = 100
+WIDE_ROW_FRACTION = 10
+
+CATEGORIES = ['north', 'south', 'east', 'west', 'central']
+
+def _with_nans(rng, values, rate):
+    values = values.astype(float)
+    values[rng.random(len(values)) < rate] = np.nan
+    return values
+
+def narrow(rows, seed=0):
+    # A typical upload: a few numeric measures, low-cardinality text, an id and some gaps
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': np.arange(rows),
+        'amount': _with_nans(rng, rng.lognormal(3, 1, rows), 0.05),
+        'quantity': rng.integers(0, 100, rows),
+        'score': _with_nans(rng, rng.normal(50, 10, rows), 0.02),
+        'ratio': rng.random(rows),
+        'region': pd.Series(rng.choice(CATEGORIES, rows)).where(rng.random(rows) > 0.03),
+        'segment': rng.choice(['a', 'b', 'c'], rows),
+        'flag': rng.random(rows) < 0.5,
+    })
+
+def wide(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = max(rows // WIDE_ROW_FRACTION, 1)
+    data = {f'x{i}': _with_nans(rng, rng.normal(size=rows), 0.01) for i in range(WIDE_COLUMNS - 1)}
+    data['group'] = rng.choice(CATEGORIES, rows)
+    return pd.DataFrame(data)
+
+def high_cardinality(rows, seed=0):
+    # Text columns with roughly one distinct value per two rows
+    rng = np.random.default_rng(seed)
+    keys = rng.integers(0, max(rows // 2, 1), rows)
+    return pd.DataFrame({
+        'customer': pd.Series(keys).map('customer-{:08d}'.format),
+        'email': pd.Series(rng.integers(0, max(rows // 2, 1), rows)).map('user{}@example.com'.format),
+        'value': rng.normal(size=rows),
+        'region': rng.choice(CATEGORIES, rows),
+    })
+
+def heavy_nan(rows, seed=0):
+    # Half of every column missing
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'a': _with_nans(rng, rng.normal(size=rows), 0.5),
+        'b': _with_nans(rng, rng.normal(size=rows), 0.5),
+        'c': _with_nans(rng, rng.integers(0, 1000, rows), 0.5),
+        'label': pd.Series(rng.choice(CATEGORIES, rows)).where(rng.random(rows) > 0.5),
+        'group': rng.choice(['g1', 'g2', 'g3'], rows),
+    })
+
+def datetime_strings(rows, seed=0):
+    # Dates as text, the way they arrive from CSV uploads
+    rng = np.random.default_rng(seed)
+    stamps = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 4 * 365 * 86400, rows), unit='s')
+    return pd.DataFrame({
+        'timestamp': stamps.strftime('%Y-%m-%d %H:%M:%S'),
+        'value': rng.normal(size=rows),
+        'region': rng.choice(CATEGORIES, rows),
+    })
+
+DATASETS = {
+    'narrow': narrow,
+    'wide': wide,
+    'high_cardinality': high_cardinality,
+    'heavy_nan': heavy_nan,
+    'datetime_strings': datetime_strings,
+}
@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+
+# Cold start of the home page (importing app.py in a fresh interpreter) must stay under this many seconds
+STARTUP_BUDGET_SECONDS = float(os.environ.get('NEATSHEET_STARTUP_BUDGET', 2.5))
+STARTUP_RUNS = 3
+
+# Heavy libraries that only specific operations or pages need; none may load for the home page.
+# streamlit imports plotly itself, so for app.py only what loads after streamlit counts.
+LAZY_MODULES = ['sklearn', 'scipy', 'matplotlib', 'seaborn', 'fpdf', 'duckdb', 'plotly', 'plotly.express']
+# The data modules are also used without the UI (service.py) and must not load streamlit either
+CORE_MODULES = ['cleaning_functions', 'transformations', 'profiling', 'reporting', 'validation', 'sketches',
+                'out_of_core', 'incremental', 'versioning', 'session_manager', 'jobs', 'exports', 'frame_index']
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import json, sys, time, warnings
+warnings.simplefilter('ignore')
+start = time.perf_counter()
+import streamlit
+preloaded = [m for m in %r if m in sys.modules]
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules and m not in preloaded]}))
+""" % (LAZY_MODULES, LAZY_MODULES)
+
+_CORE_PROBE = """
+import json, sys, warnings
+warnings.simplefilter('ignore')
+%s
+print(json.dumps({'loaded': [m for m in %r if m in sys.modules]}))
+""" % ('\n'.join(f'import {module}' for module in CORE_MODULES), LAZY_MODULES + ['streamlit'])
+
+def _probe(code, what):
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=REPO_DIR))
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {what} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure_startup():
+    return _probe(_PROBE, 'app.py')
+
+def main():
+    runs = [measure_startup() for _ in range(STARTUP_RUNS)]
+    best = min(run['seconds'] for run in runs)
+    loaded = sorted({module for run in runs for module in run['loaded']})
+    print(f"Home page cold start: {best:.2f}s (budget {STARTUP_BUDGET_SECONDS:.2f}s, best of {STARTUP_RUNS})")
+    failed = False
+    if best > STARTUP_BUDGET_SECONDS:
+        print("FAIL: start-up is over budget")
+        failed = True
+    if loaded:
+        print(f"FAIL: heavy modules imported at start-up: {', '.join(loaded)}")
+        failed = True
+    core_loaded = _probe(_CORE_PROBE, 'the data modules')['loaded']
+    if core_loaded:
+        print(f"FAIL: the data modules import UI or heavy modules: {', '.join(core_loaded)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
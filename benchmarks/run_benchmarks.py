@@ -0,0 +1,249 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+import pandas as pd
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import cleaning_functions
+import transformations
+import profiling
+import reporting
+import exports
+import validation
+import sketches
+import incremental
+from datasets import DATASETS, SCALES
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# A case is this many times slower than the baseline before --compare reports a regression
+REGRESSION_THRESHOLD = 1.2
+
+def _copy(df):
+    return (df.copy(),)
+
+def _profile(df):
+    return (profiling.generate_data_profile(df),)
+
+def _sketch_pair(df):
+    half = len(df) // 2
+    return sketches.sketch_frame(df.iloc[:half]), sketches.sketch_frame(df.iloc[half:])
+
+def _append_batch(df):
+    # A pipeline fitted on the first 99% of the rows, appending the last 1%
+    split = len(df) - max(len(df) // 100, 1)
+    stored, delta = df.iloc[:split].copy(), df.iloc[split:].reset_index(drop=True)
+    pipeline = incremental.new_pipeline(stored)
+    for step in [incremental.pipeline_step('remove_duplicates'),
+                 incremental.pipeline_step('handle_missing_values', 'median', group_by='group'),
+                 incremental.pipeline_step('detect_outliers', ['a', 'b', 'c'], 'iqr'),
+                 incremental.pipeline_step('normalize_data', ['a', 'b'], 'standard')]:
+        stored, _ = incremental.run_step(stored, step)
+        pipeline = incremental.add_step(pipeline, step, step['operation'])
+    return stored, delta, pipeline
+
+# Each case names the dataset it runs on; setup builds the call arguments outside the timed region.
+# max_rows skips cases whose cost or format limits make larger scales meaningless.
+CASES = [
+    {'name': 'remove_duplicates', 'dataset': 'narrow',
+     'func': cleaning_functions.remove_duplicates},
+    {'name': 'handle_missing_values', 'dataset': 'heavy_nan',
+     'func': cleaning_functions.handle_missing_values},
+    {'name': 'handle_missing_values_grouped', 'dataset': 'heavy_nan',
+     'func': lambda df: cleaning_functions.handle_missing_values(df, 'median', group_by='group')},
+    {'name': 'handle_missing_values_per_column', 'dataset': 'heavy_nan',
+     'func': lambda df: cleaning_functions.handle_missing_values(df, strategies={
+         'a': 'interpolate', 'b': 'ffill', 'c': {'strategy': 'group_median', 'by': 'group'},
+         'label': {'strategy': 'constant', 'value': 'unknown'}})},
+    {'name': 'detect_outliers_zscore', 'dataset': 'narrow',
+     'func': lambda df: cleaning_functions.detect_outliers(df, ['amount', 'score', 'ratio'], 'zscore')},
+    {'name': 'detect_outliers_iqr_wide', 'dataset': 'wide',
+     'func': lambda df: cleaning_functions.detect_outliers(df, [f'x{i}' for i in range(20)], 'iqr')},
+    {'name': 'detect_outliers_grouped', 'dataset': 'narrow',
+     'func': lambda df: cleaning_functions.detect_outliers(df, ['amount', 'score'], 'zscore', group_by='segment')},
+    {'name': 'knn_imputation', 'dataset': 'heavy_nan', 'max_rows': 20_000,
+     'func': cleaning_functions.knn_imputation},
+    {'name': 'optimize_memory', 'dataset': 'high_cardinality',
+     'func': cleaning_functions.optimize_memory},
+    {'name': 'clean_text_columns', 'dataset': 'high_cardinality',
+     'func': lambda df: cleaning_functions.clean_text_columns(df, ['customer', 'email'], ['trim', 'lower'])},
+    {'name': 'clean_text_columns_merge', 'dataset': 'narrow',
+     'func': lambda df: cleaning_functions.clean_text_columns(df, ['region', 'segment'], ['trim', 'merge_similar'])},
+    {'name': 'normalize_data_wide', 'dataset': 'wide',
+     'func': lambda df: transformations.normalize_data(df, [f'x{i}' for i in range(99)], 'standard')},
+    {'name': 'encode_categorical_onehot', 'dataset': 'narrow',
+     'func': lambda df: transformations.encode_categorical(df, ['region', 'segment'], 'onehot')},
+    {'name': 'encode_categorical_label', 'dataset': 'high_cardinality',
+     'func': lambda df: transformations.encode_categorical(df, ['customer', 'email'], 'label')},
+    {'name': 'extract_datetime_features', 'dataset': 'datetime_strings',
+     'func': lambda df: transformations.extract_datetime_features(
+         df, 'timestamp', ['year', 'month', 'day', 'hour', 'weekday', 'quarter'])},
+    {'name': 'apply_custom_transformation', 'dataset': 'narrow', 'max_rows': 1_000_000,
+     'func': lambda df: transformations.apply_custom_transformation(df, 'amount', 'x * 2', 'amount_x2')},
+    {'name': 'run_sql_query', 'dataset': 'narrow',
+     'func': lambda df: transformations.run_sql_query(
+         df, "SELECT region, segment, avg(amount) AS avg_amount, count(*) AS n FROM df GROUP BY ALL")},
+    {'name': 'generate_data_profile', 'dataset': 'narrow',
+     'func': profiling.generate_data_profile},
+    {'name': 'generate_data_profile_wide', 'dataset': 'wide',
+     'func': profiling.generate_data_profile},
+    {'name': 'render_column_figures', 'dataset': 'narrow',
+     'func': lambda df: profiling.render_column_figures(df, use_cache=False)},
+    {'name': 'create_quality_report', 'dataset': 'narrow', 'setup': _profile,
+     'func': lambda profile: reporting.create_quality_report(profile, use_cache=False)},
+    {'name': 'create_quality_report_wide', 'dataset': 'wide', 'setup': _profile,
+     'func': lambda profile: reporting.create_quality_report(profile, use_cache=False)},
+    {'name': 'validate_frame', 'dataset': 'narrow',
+     'func': lambda df: validation.validate_frame(df, [
+         {'column': 'id', 'check': 'unique'}, {'column': 'amount', 'check': 'not_null'},
+         {'column': 'score', 'check': 'range', 'min': 0, 'max': 100},
+         {'column': 'region', 'check': 'allowed', 'values': ['north', 'south', 'east', 'west']},
+         {'column': 'segment', 'check': 'regex', 'pattern': '[a-c]'},
+         {'column': 'quantity', 'check': 'type', 'type': 'integer'},
+         {'check': 'expression', 'expression': 'ratio <= 1'}])},
+    {'name': 'sketch_frame', 'dataset': 'narrow', 'func': sketches.sketch_frame},
+    {'name': 'sketch_frame_high_cardinality', 'dataset': 'high_cardinality', 'func': sketches.sketch_frame},
+    {'name': 'compare_sketches', 'dataset': 'narrow', 'setup': _sketch_pair, 'func': sketches.compare_sketches},
+    {'name': 'append_rows', 'dataset': 'heavy_nan', 'setup': _append_batch, 'func': incremental.append_rows},
+    {'name': 'export_csv', 'dataset': 'narrow', 'func': exports.export_csv},
+    {'name': 'export_excel', 'dataset': 'narrow', 'max_rows': 1_000_000, 'func': exports.export_excel},
+    {'name': 'export_json', 'dataset': 'narrow', 'func': exports.export_json},
+]
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_case(case, df, repeat):
+    setup = case.get('setup', _copy)
+    wall_times, cpu_times = [], []
+    # CPU time covers this process only; work done in the process pool shows up as wall time
+    for _ in range(repeat):
+        args = setup(df)
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        case['func'](*args)
+        wall_times.append(time.perf_counter() - wall)
+        cpu_times.append(time.process_time() - cpu)
+
+    # Peak memory comes from a separate run, since tracing slows the timed ones down
+    args = setup(df)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        case['func'](*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds': min(wall_times),
+        'mean_seconds': sum(wall_times) / len(wall_times),
+        'cpu_seconds': min(cpu_times),
+        'peak_mb': peak / 1024 ** 2,
+    }
+
+def run_benchmarks(scale='10k', datasets=None, cases=None, repeat=3):
+    rows = SCALES[scale]
+    selected = [case for case in CASES
+                if (not datasets or case['dataset'] in datasets)
+                and (not cases or any(pattern in case['name'] for pattern in cases))]
+    results = []
+    frames = {}
+    for case in selected:
+        if case['dataset'] not in frames:
+            frames = {case['dataset']: DATASETS[case['dataset']](rows)}
+        df = frames[case['dataset']]
+        result = {'case': case['name'], 'dataset': case['dataset'], 'rows': len(df), 'columns': df.shape[1]}
+        if case.get('max_rows') and len(df) > case['max_rows']:
+            result['status'] = 'skipped'
+        else:
+            try:
+                result.update(run_case(case, df, repeat))
+                result['status'] = 'ok'
+            except Exception as e:
+                result['status'] = 'error'
+                result['error'] = f"{type(e).__name__}: {e}"
+        results.append(result)
+        print(_format_result(result), flush=True)
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'scale': scale,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+
+def _format_result(result):
+    label = f"{result['case']:<36} {result['dataset']:<18} {result['rows']:>10,} rows"
+    if result['status'] != 'ok':
+        return f"{label}  {result['status']} {result.get('error', '')}"
+    return (f"{label}  {result['seconds']:8.3f}s wall  {result['cpu_seconds']:8.3f}s cpu  "
+            f"{result['peak_mb']:9.1f} MB peak")
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    old = {(r['case'], r['rows']): r for r in baseline['results'] if r['status'] == 'ok'}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline['timestamp']}):")
+    for result in current['results']:
+        previous = old.get((result['case'], result['rows']))
+        if result['status'] != 'ok' or previous is None:
+            continue
+        ratio = result['seconds'] / previous['seconds'] if previous['seconds'] else float('inf')
+        marker = ''
+        if ratio > threshold:
+            marker = '  REGRESSION'
+            regressions.append(result['case'])
+        print(f"{result['case']:<36} {previous['seconds']:8.3f}s → {result['seconds']:8.3f}s "
+              f"({ratio:5.2f}x)  {previous['peak_mb']:9.1f} → {result['peak_mb']:9.1f} MB{marker}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory-profile NeatSheet operations.")
+    parser.add_argument('--scale', choices=list(SCALES), default='10k')
+    parser.add_argument('--datasets', nargs='+', choices=list(DATASETS))
+    parser.add_argument('--cases', nargs='+', help="Only run cases whose name contains one of these")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<scale>-<commit>.json)")
+    parser.add_argument('--compare', help="Baseline results file to compare against")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter('ignore')
+    report = run_benchmarks(args.scale, args.datasets, args.cases, args.repeat)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{args.scale}-{(report['commit'] or 'local')[:10]}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
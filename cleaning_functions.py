@@ -1,80 +1,583 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
-from sklearn.impute import KNNImputer
-from sklearn.preprocessing import StandardScaler
+import time
+import difflib
+import re
 
-def remove_duplicates(df):
+# Text-like columns: plain object, categories and pandas string dtypes
+TEXT_DTYPES = ['object', 'category', 'string']
+
+# KNN imputation transforms in row chunks so progress can be reported
+KNN_CHUNK_ROWS = 5000
+
+def _row_hashes(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def remove_duplicates(df, state=None):
+    # With a state dict the sorted hashes of the kept rows are recorded; once recorded,
+    # rows whose hash is already there are dropped as duplicates of earlier data
     initial = df.shape[0]
-    df = df.drop_duplicates()
+    if state:
+        hashes = _row_hashes(df)
+        seen = state['hashes']
+        positions = np.minimum(np.searchsorted(seen, hashes), max(len(seen) - 1, 0))
+        keep = ~pd.Series(hashes).duplicated().to_numpy()
+        if len(seen):
+            keep &= seen[positions] != hashes
+        new = np.unique(hashes[keep])
+        state['hashes'] = np.insert(seen, np.searchsorted(seen, new), new)
+        df = df[keep]
+    else:
+        df = df.drop_duplicates()
+        if state is not None:
+            state['hashes'] = np.unique(_row_hashes(df))
     final = df.shape[0]
     return df, f"Removed {initial - final} duplicates"
 
-def handle_missing_values(df, num_strategy='mean', cat_strategy='mode'):
+# Strategies accepted per column by handle_missing_values
+FILL_STRATEGIES = ['mean', 'median', 'mode', 'constant', 'ffill', 'bfill', 'interpolate', 'group_median', 'drop']
+# Strategies that compute with the values, so only numeric columns accept them
+NUMERIC_FILL_STRATEGIES = ['mean', 'median', 'interpolate', 'group_median']
+
+def _strategy_spec(spec):
+    # Per-column strategies are a name, or a dict such as {'strategy': 'constant', 'value': 0}
+    if isinstance(spec, dict):
+        return spec['strategy'], spec
+    return spec, {}
+
+def _castable_fill(series, value):
+    if pd.isna(value):
+        return value
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return round(value)
+    return value
+
+def _group_keys(group_by):
+    if group_by is None:
+        return []
+    return list(group_by) if isinstance(group_by, (list, tuple)) else [group_by]
+
+def _group_index(df, group_keys):
+    # Row keys used to look up statistics fitted per group
+    if len(group_keys) == 1:
+        return pd.Index(df[group_keys[0]])
+    return pd.MultiIndex.from_frame(df[group_keys])
+
+def _last_valid(series):
+    positions = np.flatnonzero(series.notna().to_numpy())
+    return series.iloc[positions[-1]] if len(positions) else None
+
+def _add_fill_categories(df, fill_values):
+    for col, value in fill_values.items():
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and not pd.isna(value) \
+                and value not in df[col].cat.categories:
+            df[col] = df[col].cat.add_categories([value])
+    return df
+
+def _fill_report(df, plan, mask, drop_cols, group_keys):
     report = []
+    filled_cols = [col for col in plan if col not in drop_cols]
+    if filled_cols:
+        remaining = df[filled_cols].isnull().sum()
+        before = mask[filled_cols].sum()
+        for col in filled_cols:
+            if not before[col]:
+                continue
+            strategy, options = plan[col]
+            filled = int(before[col] - remaining[col])
+            detail = ""
+            if strategy == 'group_median':
+                detail = f" by {options['by']}"
+            elif strategy in ('mean', 'median') and group_keys:
+                detail = f" per {', '.join(map(str, group_keys))}"
+            line = f"Imputed {filled} missing values in {col} using {strategy}{detail}"
+            if remaining[col]:
+                line += f" ({int(remaining[col])} could not be filled)"
+            report.append(line)
+    return report
+
+def handle_missing_values(df, num_strategy='mean', cat_strategy='mode', strategies=None,
+                          group_by=None, progress=None, state=None):
+    # An empty state dict is filled with the fitted fill values; a filled one is applied as is.
+    # Columns without nulls are fitted only once new rows need them: the state keeps those
+    # columns (shared with the result, not copied) and _fit_deferred fits them on first use.
+    # Fills are assigned column by column on a shallow copy, so the caller's frame is left as is.
+    df = df.copy(deep=False)
+    if state:
+        return _fill_with_state(df, state, progress)
+    strategies = strategies or {}
+    group_keys = _group_keys(group_by)
     
-    num_cols = df.select_dtypes(include=np.number).columns
-    for col in num_cols:
-        if df[col].isnull().sum() > 0:
-            if num_strategy == 'mean':
-                df[col].fillna(df[col].mean(), inplace=True)
-            elif num_strategy == 'median':
-                df[col].fillna(df[col].median(), inplace=True)
-            report.append(f"Imputed {df[col].isnull().sum()} missing values in {col} using {num_strategy}")
-    
-    cat_cols = df.select_dtypes(include='object').columns
-    for col in cat_cols:
-        if df[col].isnull().sum() > 0:
-            df[col].fillna(df[col].mode()[0], inplace=True)
-            report.append(f"Imputed {df[col].isnull().sum()} missing values in {col} using mode")
+    # One null mask for the whole frame drives every strategy and every count in the report
+    mask = df.isnull()
+    columns = df.columns[mask.sum().to_numpy() > 0]
+    df, report = _fit_missing_values(df, mask, columns, num_strategy, cat_strategy, strategies, group_keys,
+                                     progress, state)
+    if state is not None:
+        deferred = [col for col in df.columns if col not in state['plan'] and col not in group_keys]
+        keys = {_strategy_spec(strategies[col])[1].get('by') for col in deferred if col in strategies}
+        needed = set(deferred) | set(group_keys) | keys
+        state['deferred'] = {'columns': deferred, 'frame': df[[col for col in df.columns if col in needed]],
+                             'options': (num_strategy, cat_strategy, strategies)}
+    if progress:
+        progress(4, 4)
+    return df, report
+
+def _fit_deferred(df, state):
+    # Fits the deferred columns that have nulls in df on the frame the step first ran on
+    deferred = state.get('deferred')
+    if not deferred:
+        return
+    columns = [col for col in deferred['columns'] if col in df.columns and df[col].isnull().any()]
+    if not columns:
+        return
+    frame = deferred['frame']
+    fitted = {}
+    num_strategy, cat_strategy, strategies = deferred['options']
+    _fit_missing_values(frame.copy(deep=False), frame.isnull(), columns, num_strategy, cat_strategy, strategies,
+                        state['group_keys'], None, fitted)
+    # Entries are replaced rather than updated, so copies of the pipeline keep their own state
+    for name in ('plan', 'fill_values', 'last'):
+        state[name] = {**state[name], **fitted[name]}
+    for name in ('group_fills', 'group_medians'):
+        tables = dict(state[name])
+        for key, table in fitted[name].items():
+            tables[key] = table if key not in tables else pd.concat([tables[key], table], axis=1)
+        state[name] = tables
+    state['deferred'] = {**deferred, 'columns': [col for col in deferred['columns'] if col not in columns]}
+
+def _fit_missing_values(df, mask, columns, num_strategy, cat_strategy, strategies, group_keys, progress, state):
+    report = []
+    num_cols = set(df.select_dtypes(include=np.number).columns)
+    cat_cols = set(df.select_dtypes(include=TEXT_DTYPES).columns)
     
+    plan = {}
+    for col in columns:
+        if col in group_keys:
+            continue
+        if col in strategies:
+            plan[col] = _strategy_spec(strategies[col])
+        elif col in num_cols:
+            plan[col] = (num_strategy, {})
+        elif col in cat_cols:
+            plan[col] = (cat_strategy, {})
+    by_strategy = {}
+    for col, (strategy, options) in plan.items():
+        if strategy not in FILL_STRATEGIES:
+            raise ValueError(f"Unknown missing-value strategy '{strategy}' for column '{col}'")
+        if strategy in NUMERIC_FILL_STRATEGIES and col not in num_cols:
+            raise ValueError(f"Strategy '{strategy}' needs a numeric column, but '{col}' is {df[col].dtype}")
+        if strategy == 'group_median' and 'by' not in options:
+            raise ValueError(f"Strategy 'group_median' for column '{col}' needs a 'by' column")
+        by_strategy.setdefault(strategy, []).append(col)
+    if progress:
+        progress(1, 4)
+    
+    drop_cols = by_strategy.pop('drop', [])
+    if drop_cols:
+        keep = ~mask[drop_cols].any(axis=1).to_numpy()
+        df = df[keep]
+        mask = mask[keep]
+        if not keep.all():
+            report.append(f"Dropped {int((~keep).sum())} rows with missing values in "
+                          f"{', '.join(map(str, drop_cols))}")
+    
+    # Fill values for the reduction-based strategies come from one reduction per strategy.
+    # With a group key, mean/median come from one groupby-transform and the global value
+    # only fills groups that have no observed values at all.
+    fill_values = {}
+    group_fills = {}
+    grouped = df.groupby(group_keys, observed=True, sort=False, dropna=False) if group_keys else None
+    for strategy in ('mean', 'median'):
+        cols = by_strategy.get(strategy)
+        if not cols:
+            continue
+        if grouped is not None:
+            if state is not None:
+                group_fills[strategy] = grouped[cols].agg(strategy)
+            df[cols] = df[cols].fillna(grouped[cols].transform(strategy))
+        fill_values.update(getattr(df[cols], strategy)().to_dict())
+    if by_strategy.get('mode'):
+        modes = df[by_strategy['mode']].mode()
+        fill_values.update(modes.iloc[0].to_dict() if len(modes) else {})
+    for col in by_strategy.get('constant', []):
+        fill_values[col] = plan[col][1].get('value')
+    fill_values = {col: _castable_fill(df[col], value) for col, value in fill_values.items()}
+    df = _add_fill_categories(df, fill_values)
+    if progress:
+        progress(2, 4)
+    
+    if fill_values:
+        df = df.fillna(fill_values)
+    if by_strategy.get('ffill'):
+        df[by_strategy['ffill']] = df[by_strategy['ffill']].ffill()
+    if by_strategy.get('bfill'):
+        df[by_strategy['bfill']] = df[by_strategy['bfill']].bfill()
+    if by_strategy.get('interpolate'):
+        df[by_strategy['interpolate']] = df[by_strategy['interpolate']].interpolate(limit_direction='both')
+    
+    # Group-wise medians are computed with one groupby per key column
+    median_groups = {}
+    group_medians = {}
+    for col in by_strategy.get('group_median', []):
+        median_groups.setdefault(plan[col][1]['by'], []).append(col)
+    for key, cols in median_groups.items():
+        grouped_key = df.groupby(key, observed=True, dropna=False)[cols]
+        if state is not None:
+            group_medians[key] = grouped_key.median()
+        df[cols] = df[cols].fillna(grouped_key.transform('median'))
+    if progress:
+        progress(3, 4)
+    
+    report.extend(_fill_report(df, plan, mask, drop_cols, group_keys))
+    if state is not None:
+        # Forward fill and interpolation continue from the last value seen
+        continued = by_strategy.get('ffill', []) + by_strategy.get('interpolate', [])
+        state.update({'plan': plan, 'group_keys': group_keys, 'fill_values': fill_values,
+                      'group_fills': group_fills, 'group_medians': group_medians,
+                      'last': {col: _last_valid(df[col]) for col in continued}})
     return df, "\n".join(report)
 
-def detect_outliers(df, columns, method='zscore', threshold=3):
+def _fill_with_state(df, state, progress=None):
+    _fit_deferred(df, state)
     report = []
-    cleaned_df = df.copy()
+    plan = {col: spec for col, spec in state['plan'].items() if col in df.columns}
+    group_keys = state['group_keys']
+    mask = df[list(plan)].isnull()
+    by_strategy = {}
+    for col, (strategy, options) in plan.items():
+        by_strategy.setdefault(strategy, []).append(col)
+    if progress:
+        progress(1, 4)
     
-    for col in columns:
-        if col not in df.columns or not np.issubdtype(df[col].dtype, np.number):
+    drop_cols = by_strategy.pop('drop', [])
+    if drop_cols:
+        keep = ~mask[drop_cols].any(axis=1).to_numpy()
+        df = df[keep]
+        mask = mask[keep]
+        if not keep.all():
+            report.append(f"Dropped {int((~keep).sum())} rows with missing values in "
+                          f"{', '.join(map(str, drop_cols))}")
+    
+    # Per-group fills are looked up by each row's key; groups not seen when fitting
+    # fall through to the global value
+    for table in state['group_fills'].values():
+        cols = [col for col in table.columns if col in df.columns]
+        if cols and group_keys:
+            df[cols] = df[cols].fillna(table[cols].reindex(_group_index(df, group_keys)).set_axis(df.index))
+    for key, table in state['group_medians'].items():
+        cols = [col for col in table.columns if col in df.columns]
+        if cols and key in df.columns:
+            df[cols] = df[cols].fillna(table[cols].reindex(_group_index(df, [key])).set_axis(df.index))
+    fill_values = {col: value for col, value in state['fill_values'].items() if col in df.columns}
+    last = {col: value for col, value in state['last'].items() if col in df.columns and value is not None}
+    df = _add_fill_categories(df, {**fill_values, **last})
+    if progress:
+        progress(2, 4)
+    
+    if fill_values:
+        df = df.fillna(fill_values)
+    for col in by_strategy.get('ffill', []):
+        df[col] = df[col].ffill()
+        if col in last:
+            df[col] = df[col].fillna(last[col])
+    if by_strategy.get('bfill'):
+        df[by_strategy['bfill']] = df[by_strategy['bfill']].bfill()
+    for col in by_strategy.get('interpolate', []):
+        if not mask[col].any():
             continue
-            
-        if method == 'zscore':
-            z = np.abs(stats.zscore(df[col], nan_policy='omit'))
-            mask = z < threshold
-        elif method == 'iqr':
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            mask = (df[col] >= Q1 - 1.5*IQR) & (df[col] <= Q3 + 1.5*IQR)
-            
-        initial = len(cleaned_df)
-        cleaned_df = cleaned_df[mask]
-        removed = initial - len(cleaned_df)
-        report.append(f"Removed {removed} outliers from {col} ({method})")
+        if col in last:
+            values = pd.concat([pd.Series([last[col]]), df[col].reset_index(drop=True)], ignore_index=True)
+            df[col] = values.interpolate(limit_direction='both').to_numpy()[1:]
+        else:
+            df[col] = df[col].interpolate(limit_direction='both')
+    if progress:
+        progress(3, 4)
+    
+    report.extend(_fill_report(df, plan, mask, drop_cols, group_keys))
+    continued = by_strategy.get('ffill', []) + by_strategy.get('interpolate', [])
+    latest = {col: _last_valid(df[col]) for col in continued}
+    state['last'] = {**state['last'], **{col: value for col, value in latest.items() if value is not None}}
+    if progress:
+        progress(4, 4)
+    
+    return df, "\n".join(report)
+
+def _outlier_bounds(values, method, threshold):
+    # values is the column frame or its groupby, so the bounds come back per column or per group
+    if method == 'zscore':
+        mean, std = values.mean(), values.std(ddof=0)
+        spread = (threshold * std).mask(std == 0, np.inf)
+        return mean - spread, mean + spread
+    Q1, Q3 = values.quantile(0.25), values.quantile(0.75)
+    IQR = Q3 - Q1
+    return Q1 - 1.5*IQR, Q3 + 1.5*IQR
+
+def detect_outliers(df, columns, method='zscore', threshold=3, progress=None, group_by=None, state=None):
+    # An empty state dict is filled with the fitted bounds; a filled one is applied as is
+    report = []
+    columns = [col for col in columns if col in df.columns and pd.api.types.is_numeric_dtype(df[col])
+               and not pd.api.types.is_bool_dtype(df[col])]
+    group_keys = _group_keys(group_by)
+    values = df[columns]
     
-    return cleaned_df.dropna(), "\n".join(report)
+    # Statistics for every column come from one vectorized pass, per group when a key is given
+    if group_keys:
+        grouped = df.groupby(group_keys, observed=True, sort=False, dropna=False)[columns]
+    if state:
+        lower, upper = state['lower'][columns], state['upper'][columns]
+        if group_keys:
+            # Rows of groups that had no bounds fitted are kept
+            keys = _group_index(df, group_keys)
+            lower = lower.reindex(keys).set_axis(df.index).fillna(-np.inf)
+            upper = upper.reindex(keys).set_axis(df.index).fillna(np.inf)
+        if method == 'iqr':
+            masks = values.ge(lower) & values.le(upper)
+        else:
+            masks = values.gt(lower) & values.lt(upper)
+    elif method == 'zscore':
+        if group_keys:
+            mean, std = grouped.transform('mean'), grouped.transform('std', ddof=0)
+        else:
+            mean, std = values.mean(), values.std(ddof=0)
+        z = (values - mean) / std
+        # A constant column or single-row group has no outliers
+        z = z.mask(std == 0, 0) if group_keys else z.loc[:, std != 0].reindex(columns=columns, fill_value=0)
+        masks = z.abs() < threshold
+    elif method == 'iqr':
+        if group_keys:
+            Q1, Q3 = grouped.transform('quantile', q=0.25), grouped.transform('quantile', q=0.75)
+        else:
+            Q1, Q3 = values.quantile(0.25), values.quantile(0.75)
+        IQR = Q3 - Q1
+        masks = (values >= Q1 - 1.5*IQR) & (values <= Q3 + 1.5*IQR)
+    else:
+        raise ValueError(f"Unknown outlier method '{method}'")
+    if state is not None and not state:
+        state['lower'], state['upper'] = _outlier_bounds(grouped if group_keys else values, method, threshold)
+    
+    keep = np.ones(len(df), dtype=bool)
+    suffix = f"{method}, per {', '.join(map(str, group_keys))}" if group_keys else method
+    for i, col in enumerate(columns):
+        if progress:
+            progress(i, len(columns))
+        initial = keep.sum()
+        keep &= masks[col].to_numpy()
+        report.append(f"Removed {initial - keep.sum()} outliers from {col} ({suffix})")
+    
+    return df[keep].dropna(), "\n".join(report)
 
-def knn_imputation(df, n_neighbors=5):
+def knn_imputation(df, n_neighbors=5, progress=None, state=None):
+    # scikit-learn is only imported when KNN imputation actually runs
+    from sklearn.impute import KNNImputer
+    from sklearn.preprocessing import StandardScaler
+    
     report = ["KNN Imputation Report:"]
     try:
-        numeric_cols = df.select_dtypes(include=np.number).columns.tolist()
-        
-        if len(numeric_cols) == 0:
-            raise ValueError("No numeric columns for KNN imputation")
+        if state:
+            # Later rows are imputed from the neighbours among the rows the imputer was fitted on
+            scaler, imputer, numeric_cols = state['scaler'], state['imputer'], state['numeric_cols']
+            scaled_data = scaler.transform(df[numeric_cols])
+        else:
+            numeric_cols = df.select_dtypes(include=np.number).columns.tolist()
             
-        scaler = StandardScaler()
-        scaled_data = scaler.fit_transform(df[numeric_cols])
-        imputer = KNNImputer(n_neighbors=n_neighbors)
-        imputed_data = imputer.fit_transform(scaled_data)
+            if len(numeric_cols) == 0:
+                raise ValueError("No numeric columns for KNN imputation")
+                
+            scaler = StandardScaler()
+            scaled_data = scaler.fit_transform(df[numeric_cols])
+            imputer = KNNImputer(n_neighbors=n_neighbors).fit(scaled_data)
+        imputed_chunks = []
+        for start in range(0, len(scaled_data), KNN_CHUNK_ROWS):
+            imputed_chunks.append(imputer.transform(scaled_data[start:start + KNN_CHUNK_ROWS]))
+            if progress:
+                progress(min(start + KNN_CHUNK_ROWS, len(scaled_data)), len(scaled_data))
+        imputed_data = np.vstack(imputed_chunks) if imputed_chunks else scaled_data
         df[numeric_cols] = scaler.inverse_transform(imputed_data)
         report.append(f"Imputed missing values in numeric columns using KNN (k={n_neighbors})")
         
         cat_cols = df.select_dtypes(exclude=np.number).columns
+        if state:
+            modes = state['modes']
+        else:
+            modes = {col: df[col].mode()[0] for col in cat_cols
+                     if (state is not None or df[col].isnull().sum() > 0) and df[col].notna().any()}
+            if state is not None:
+                state.update({'scaler': scaler, 'imputer': imputer, 'numeric_cols': numeric_cols, 'modes': modes})
         for col in cat_cols:
-            if df[col].isnull().sum() > 0:
-                df[col] = df[col].fillna(df[col].mode()[0])
+            if df[col].isnull().sum() > 0 and col in modes:
+                df[col] = df[col].fillna(modes[col])
                 report.append(f"Imputed missing values in {col} using mode")
                 
         return df, "\n".join(report)
     except Exception as e:
         return df, f"KNN imputation failed: {str(e)}"
+
+# Operations accepted by clean_text_columns, applied in this order
+TEXT_OPERATIONS = ['trim', 'replace', 'lower', 'upper', 'title', 'merge_similar', 'parse_numeric']
+# Fuzzy matching compares distinct values pairwise, so it is skipped above this many of them
+MERGE_FUZZY_MAX_VALUES = 5000
+
+def _parse_numbers(values):
+    # Handles currency symbols, thousands separators, percentages and (negative) accounting notation
+    text = values.str.strip()
+    percent = text.str.endswith('%')
+    negative = text.str.match(r'^\(.*\)$')
+    # Currency codes and other letters are dropped first, keeping an e only as an exponent between digits
+    text = text.str.replace(r'(?<![\d.])[eE]|[eE](?![-+]?\d)|[^\d.\-+eE]', '', regex=True)
+    numbers = pd.to_numeric(text, errors='coerce')
+    numbers = numbers.where(~negative, -numbers)
+    return numbers.where(~percent, numbers / 100)
+
+def _merge_similar(values, counts, cutoff):
+    # Spellings that differ only in case, spacing or punctuation share a key; with a cutoff below 1,
+    # close keys are merged fuzzily, but only when they hold the same digits, so IDs and codes
+    # such as cust-000123 and cust-000124 stay apart. Each group maps to its most frequent spelling.
+    keys = values.str.casefold().str.replace(r'[\W_]+', '', regex=True).tolist()
+    fuzzy = cutoff < 1 and len(values) <= MERGE_FUZZY_MAX_VALUES
+    canonical = {}
+    representatives = {}
+    merged = values.to_numpy(dtype=object, copy=True)
+    for i in np.argsort(-counts, kind='stable'):
+        key = keys[i]
+        digits = re.sub(r'\D', '', key)
+        if key not in canonical and fuzzy:
+            match = difflib.get_close_matches(key, representatives.get(digits, []), n=1, cutoff=cutoff)
+            if match:
+                canonical[key] = canonical[match[0]]
+        if key not in canonical:
+            canonical[key] = merged[i]
+            representatives.setdefault(digits, []).append(key)
+        merged[i] = canonical[key]
+    return pd.Series(merged, index=values.index)
+
+def _text_values(series, operations, pattern, replacement):
+    # Every operation runs once per distinct value and is mapped back to the rows by code
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    values = pd.Series(uniques.astype(str), dtype=object)
+    if 'trim' in operations:
+        values = values.str.strip().str.replace(r'\s+', ' ', regex=True)
+    if 'replace' in operations and pattern:
+        values = values.str.replace(pattern, replacement, regex=True)
+    if 'lower' in operations:
+        values = values.str.casefold()
+    if 'upper' in operations:
+        values = values.str.upper()
+    if 'title' in operations:
+        values = values.str.title()
+    return codes, uniques, values
+
+def merge_preview(df, columns, operations, pattern=None, replacement='', similarity=1.0):
+    # The values merge_similar would rewrite, with the value each one becomes and its row count
+    rows = []
+    for col in columns:
+        codes, _, values = _text_values(df[col], operations, pattern, replacement)
+        counts = np.bincount(codes[codes >= 0], minlength=len(values))
+        merged = _merge_similar(values, counts, similarity)
+        changed = (merged != values).to_numpy()
+        rows.extend({'column': col, 'value': value, 'merged into': target, 'rows': int(count)}
+                    for value, target, count in zip(values[changed], merged[changed], counts[changed]))
+    return pd.DataFrame(rows, columns=['column', 'value', 'merged into', 'rows'])
+
+def clean_text_columns(df, columns, operations, pattern=None, replacement='', similarity=1.0, progress=None,
+                       state=None):
+    # With merge_similar, a state dict records which values were merged so later rows are merged alike
+    report = []
+    frozen = bool(state)
+    unknown = [op for op in operations if op not in TEXT_OPERATIONS]
+    if unknown:
+        raise ValueError(f"Unknown text operation(s): {', '.join(unknown)}")
+    
+    for i, col in enumerate(columns):
+        if progress:
+            progress(i, len(columns))
+        codes, uniques, values = _text_values(df[col], operations, pattern, replacement)
+        if 'merge_similar' in operations and frozen:
+            values = values.replace(state.get(col, {}))
+        elif 'merge_similar' in operations:
+            counts = np.bincount(codes[codes >= 0], minlength=len(values))
+            merged = _merge_similar(values, counts, similarity)
+            if state is not None:
+                state[col] = dict(zip(values[merged != values], merged[merged != values]))
+            values = merged
+        
+        line = f"Cleaned text in '{col}': {len(uniques)} → {values.nunique()} distinct values"
+        if 'parse_numeric' in operations:
+            parsed = _parse_numbers(values)
+            failed = int(parsed.isna().sum())
+            values = parsed
+            line += f", parsed as numbers ({failed} distinct values could not be parsed)" if failed \
+                else ", parsed as numbers"
+        
+        cleaned = pd.api.extensions.take(values.to_numpy(), codes, allow_fill=True)
+        if 'parse_numeric' in operations:
+            df[col] = pd.Series(cleaned, index=df.index, dtype=float)
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = pd.Series(cleaned, index=df.index).astype('category')
+        else:
+            df[col] = pd.Series(cleaned, index=df.index).astype('str')
+        report.append(line)
+    if progress:
+        progress(len(columns), len(columns))
+    
+    return df, "\n".join(report)
+
+def _string_dtype():
+    try:
+        import pyarrow  # noqa: F401
+        return pd.StringDtype("pyarrow")
+    except ImportError:
+        return pd.StringDtype()
+
+def _optimized_column(series, category_threshold):
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return series
+    if pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, np.dtype):
+        downcast = 'unsigned' if len(series) and series.min() >= 0 else 'integer'
+        return pd.to_numeric(series, downcast=downcast)
+    if pd.api.types.is_float_dtype(dtype) and isinstance(dtype, np.dtype) and dtype.itemsize > 4:
+        # Only downcast floats when every value survives the round trip
+        narrowed = series.astype(np.float32)
+        if np.array_equal(narrowed.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+            return narrowed
+        return series
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        non_null = series.count()
+        if non_null and series.nunique() / non_null <= category_threshold:
+            return series.astype('category')
+        if pd.api.types.is_object_dtype(dtype) and pd.api.types.infer_dtype(series, skipna=True) == 'string':
+            return series.astype(_string_dtype())
+    return series
+
+def optimize_memory(df, category_threshold=0.5, profile_func=None):
+    report = []
+    before = df.memory_usage(deep=True).sum()
+    optimized = {}
+    for col in df.columns:
+        new = _optimized_column(df[col], category_threshold)
+        if new.dtype != df[col].dtype:
+            optimized[col] = new
+            report.append(f"{col}: {df[col].dtype} → {new.dtype}")
+    # Columns are set one by one, since assign() only takes string names
+    result = df
+    if optimized:
+        result = df.copy(deep=False)
+        for col, values in optimized.items():
+            result[col] = values
+    after = result.memory_usage(deep=True).sum()
+    report.insert(0, f"Memory reduced from {before / 1024 ** 2:.2f} MB to {after / 1024 ** 2:.2f} MB "
+                     f"({(1 - after / before) * 100 if before else 0:.1f}% smaller, {len(optimized)} columns converted)")
+
+    # Optionally time a follow-up profile on both frames to show the effect on later steps
+    if profile_func is not None and optimized:
+        start = time.perf_counter()
+        profile_func(df)
+        old_time = time.perf_counter() - start
+        start = time.perf_counter()
+        profile_func(result)
+        new_time = time.perf_counter() - start
+        report.append(f"Profiling took {new_time:.2f}s instead of {old_time:.2f}s "
+                      f"({old_time / new_time if new_time else float('inf'):.1f}x speedup)")
+
+    return result, "\n".join(report)
@@ -0,0 +1,127 @@
+import numpy as np
+import streamlit as st
+from collections import OrderedDict
+from frame_index import parse_value
+
+FILTER_OPERATORS = ['=', '!=', '>', '>=', '<', '<=', 'contains']
+PAGE_SIZES = [25, 50, 100, 500]
+
+def _sorted_positions(series, ascending):
+    values = series.reset_index(drop=True)
+    try:
+        ordered = values.sort_values(ascending=ascending, na_position='last', kind='mergesort')
+    except TypeError:
+        # Mixed-type object columns are ordered by their text form
+        ordered = values.astype(str).where(values.notna()).sort_values(
+            ascending=ascending, na_position='last', kind='mergesort')
+    return ordered.index.to_numpy()
+
+def _filter_mask(series, operator, value):
+    if operator == 'contains':
+        return series.astype(str).str.contains(str(value), case=False, regex=False).to_numpy() & series.notna().to_numpy()
+    value = parse_value(series, value)
+    comparisons = {
+        '=': series.__eq__, '!=': series.__ne__,
+        '>': series.__gt__, '>=': series.__ge__,
+        '<': series.__lt__, '<=': series.__le__,
+    }
+    mask = comparisons[operator](value).fillna(False).to_numpy(dtype=bool)
+    # NaN != x is True for numpy columns; missing values match no comparison, as with nullable types
+    return mask & series.notna().to_numpy() if operator == '!=' else mask
+
+class DataBrowser:
+    def __init__(self, max_versions=2, index=None):
+        # Per-version caches; only the most recent versions are kept
+        self.max_versions = max_versions
+        self.index = index
+        self._caches = OrderedDict()
+
+    def _cache(self, version):
+        if version not in self._caches:
+            self._caches[version] = {}
+            while len(self._caches) > self.max_versions:
+                self._caches.popitem(last=False)
+        self._caches.move_to_end(version)
+        return self._caches[version]
+
+    def null_counts(self, df, version):
+        cache = self._cache(version)
+        if 'null_counts' not in cache:
+            cache['null_counts'] = df.isnull().sum()
+        return cache['null_counts']
+
+    def sort_order(self, df, version, column, ascending=True):
+        cache = self._cache(version)
+        key = ('sort', column, ascending)
+        if key not in cache:
+            cache[key] = _sorted_positions(df[column], ascending)
+        return cache[key]
+
+    def filter_mask(self, df, version, column, operator, value):
+        cache = self._cache(version)
+        key = ('filter', column, operator, value)
+        if key not in cache:
+            mask = None
+            if self.index is not None and self.index.version == version:
+                # A FrameIndex synced to this version answers from its column indexes
+                parsed = value if operator == 'contains' else parse_value(df[column], value)
+                mask = self.index.condition_mask(column, operator, parsed)
+            cache[key] = mask if mask is not None else _filter_mask(df[column], operator, value)
+        return cache[key]
+
+    def row_positions(self, df, version, sort=None, filters=None):
+        positions = None
+        if sort:
+            positions = self.sort_order(df, version, *sort)
+        mask = None
+        for column, operator, value in filters or []:
+            column_mask = self.filter_mask(df, version, column, operator, value)
+            mask = column_mask if mask is None else mask & column_mask
+        if mask is not None:
+            positions = np.flatnonzero(mask) if positions is None else positions[mask[positions]]
+        return positions
+
+    def page(self, df, version, page, page_size, sort=None, filters=None):
+        positions = self.row_positions(df, version, sort, filters)
+        total = len(df) if positions is None else len(positions)
+        start = page * page_size
+        if positions is None:
+            return df.iloc[start:start + page_size], total
+        return df.iloc[positions[start:start + page_size]], total
+
+    def render(self, df, version, key="browser"):
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            sort_col = st.selectbox("Sort by", [None] + df.columns.tolist(), key=f"{key}_sort")
+        with col2:
+            ascending = st.radio("Order", ["Ascending", "Descending"], horizontal=True,
+                                 key=f"{key}_order") == "Ascending"
+        with col3:
+            page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+
+        col1, col2, col3 = st.columns([2, 1, 2])
+        with col1:
+            filter_col = st.selectbox("Filter column", [None] + df.columns.tolist(), key=f"{key}_filter_col")
+        with col2:
+            operator = st.selectbox("Operator", FILTER_OPERATORS, key=f"{key}_operator")
+        with col3:
+            filter_value = st.text_input("Value", key=f"{key}_filter_value")
+
+        filters = []
+        if filter_col is not None and filter_value != "":
+            filters.append((filter_col, operator, filter_value))
+        sort = (sort_col, ascending) if sort_col is not None else None
+        try:
+            total = len(df) if not filters else len(self.row_positions(df, version, None, filters))
+        except (ValueError, TypeError) as e:
+            st.error(f"Invalid filter: {str(e)}")
+            filters = []
+            total = len(df)
+
+        pages = max(1, -(-total // page_size))
+        page_number = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                                      step=1, key=f"{key}_page")
+        # Only the visible window is sent to the browser
+        window, total = self.page(df, version, min(page_number, pages) - 1, page_size, sort, filters)
+        st.dataframe(window)
+        st.caption(f"Showing {len(window)} of {total:,} matching rows ({len(df):,} total)")
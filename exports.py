@@ -0,0 +1,63 @@
+import pandas as pd
+import io
+
+# Exports are serialized in row chunks so long-running jobs can report progress
+EXPORT_CHUNK_ROWS = 50000
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield start + min(chunk_rows, len(df) - start), df.iloc[start:start + chunk_rows]
+
+def export_csv(df, progress=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    buffer = io.StringIO()
+    if len(df) == 0:
+        df.to_csv(buffer, index=False)
+    for done, chunk in _chunks(df, chunk_rows):
+        chunk.to_csv(buffer, index=False, header=buffer.tell() == 0)
+        if progress:
+            progress(done, len(df))
+    return buffer.getvalue().encode('utf-8')
+
+def export_excel(df, progress=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        df.head(0).to_excel(writer, index=False, sheet_name='Cleaned Data')
+        for done, chunk in _chunks(df, chunk_rows):
+            chunk.to_excel(writer, index=False, header=False, sheet_name='Cleaned Data',
+                           startrow=done - len(chunk) + 1)
+            if progress:
+                progress(done, len(df))
+    return buffer.getvalue()
+
+def json_records(chunk):
+    # Each chunk is a JSON array; keep only its records so the chunks join into one array
+    return chunk.to_json(orient='records', indent=2).strip()[1:-1].strip('\n')
+
+def export_json(df, progress=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    parts = []
+    for done, chunk in _chunks(df, chunk_rows):
+        records = json_records(chunk)
+        if records:
+            parts.append(records)
+        if progress:
+            progress(done, len(df))
+    return "[\n" + ",\n".join(parts) + "\n]" if parts else "[]"
+
+def export_chunks(df, fmt='csv', chunk_rows=EXPORT_CHUNK_ROWS):
+    # Yields the CSV or JSON export as encoded pieces, one row chunk at a time, for streamed downloads
+    if fmt == 'csv':
+        if len(df) == 0:
+            yield df.to_csv(index=False).encode('utf-8')
+        for done, chunk in _chunks(df, chunk_rows):
+            yield chunk.to_csv(index=False, header=done == len(chunk)).encode('utf-8')
+    elif fmt == 'json':
+        first = True
+        yield b"["
+        for _, chunk in _chunks(df, chunk_rows):
+            records = json_records(chunk)
+            if records:
+                yield (("\n" if first else ",\n") + records).encode('utf-8')
+                first = False
+        yield b"]" if first else b"\n]"
+    else:
+        raise ValueError(f"Unknown export format '{fmt}'")
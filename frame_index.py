@@ -0,0 +1,215 @@
+import pandas as pd
+import numpy as np
+
+# Substring search uses trigrams; shorter queries scan the distinct values instead
+NGRAM_SIZE = 3
+
+def parse_value(series, value):
+    # Filter values arrive as text from the UI
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return float(value)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.Timestamp(value)
+    return value
+
+def _positions_mask(positions, length):
+    mask = np.zeros(length, dtype=bool)
+    mask[positions] = True
+    return mask
+
+def _range_values(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy(dtype='datetime64[ns]')
+    if isinstance(series.dtype, np.dtype):
+        return series.to_numpy()
+    return series.to_numpy(dtype='float64', na_value=np.nan)
+
+def _grams(text):
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+class SortedIndex:
+    # Non-null row positions ordered by value; range filters are two binary searches
+    def __init__(self, series):
+        values = _range_values(series)
+        valid = np.flatnonzero(~pd.isna(values))
+        order = np.argsort(values[valid], kind='stable')
+        self.positions = valid[order]
+        self.values = values[self.positions]
+        self.length = len(values)
+
+    def _key(self, value):
+        if self.values.dtype.kind == 'M':
+            return pd.Timestamp(value).to_datetime64()
+        return value
+
+    def range(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        low = None if low is None else self._key(low)
+        high = None if high is None else self._key(high)
+        start = 0 if low is None else np.searchsorted(self.values, low, 'left' if low_inclusive else 'right')
+        end = len(self.values) if high is None else \
+            np.searchsorted(self.values, high, 'right' if high_inclusive else 'left')
+        return self.positions[start:max(start, end)]
+
+    def memory_usage(self):
+        return self.positions.nbytes + self.values.nbytes
+
+class InvertedIndex:
+    # Row positions grouped by distinct value, so equality is a slice per matching value
+    def __init__(self, series):
+        self.codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        self.uniques = uniques.astype(str)
+        self.order = np.argsort(self.codes, kind='stable')
+        counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.uniques))
+        # Null rows (code -1) sort first; skip past them
+        self.starts = np.concatenate([[0], np.cumsum(counts)]) + int((self.codes < 0).sum())
+        self.counts = counts
+        self._lookup = {value: code for code, value in enumerate(self.uniques)}
+
+    def codes_for(self, values):
+        return [self._lookup[str(value)] for value in values if str(value) in self._lookup]
+
+    def positions(self, codes):
+        if not len(codes):
+            return np.array([], dtype=np.intp)
+        return np.concatenate([self.order[self.starts[code]:self.starts[code + 1]] for code in codes])
+
+    def top_values(self, limit):
+        top = np.argsort(-self.counts, kind='stable')[:limit]
+        return [self.uniques[code] for code in top]
+
+    def memory_usage(self):
+        return self.codes.nbytes + self.order.nbytes + self.starts.nbytes + self.counts.nbytes
+
+class NGramIndex:
+    # Trigram postings over the distinct values of a column (not its rows), built on its inverted index
+    def __init__(self, inverted):
+        self.inverted = inverted
+        self.lowered = [value.lower() for value in inverted.uniques]
+        postings = {}
+        for code, value in enumerate(self.lowered):
+            for gram in _grams(value):
+                postings.setdefault(gram, []).append(code)
+        self.postings = {gram: np.array(codes, dtype=np.intp) for gram, codes in postings.items()}
+
+    def matching_codes(self, text):
+        text = text.lower()
+        if len(text) < NGRAM_SIZE:
+            return [code for code, value in enumerate(self.lowered) if text in value]
+        candidates = None
+        for gram in sorted(_grams(text), key=lambda gram: len(self.postings.get(gram, ()))):
+            if gram not in self.postings:
+                return []
+            candidates = self.postings[gram] if candidates is None else \
+                np.intersect1d(candidates, self.postings[gram], assume_unique=True)
+        # Trigram hits are candidates only; confirm the full substring
+        return [code for code in candidates if text in self.lowered[code]]
+
+    def contains(self, text):
+        return self.inverted.positions(self.matching_codes(text))
+
+    def memory_usage(self):
+        return sum(codes.nbytes for codes in self.postings.values())
+
+class FrameIndex:
+    def __init__(self):
+        self.version = None
+        self.df = None
+        self._indexes = {}
+
+    def sync(self, df, version, versions=None):
+        # Indexes on columns the new version shares with the old one are kept
+        if version == self.version:
+            return self
+        stale = None
+        if self.version is not None and versions is not None:
+            try:
+                diff = versions.diff(self.version, version)
+                if diff['rows_before'] == diff['rows_after']:
+                    stale = set(diff['changed']) | set(diff['removed'])
+            except KeyError:
+                pass
+        if stale is None:
+            self._indexes = {}
+        else:
+            self._indexes = {key: index for key, index in self._indexes.items() if key[0] not in stale}
+        self.df = df
+        self.version = version
+        return self
+
+    def _index(self, column, kind):
+        key = (column, kind)
+        if key not in self._indexes:
+            if kind == 'sorted':
+                self._indexes[key] = SortedIndex(self.df[column])
+            elif kind == 'inverted':
+                self._indexes[key] = InvertedIndex(self.df[column])
+            else:
+                self._indexes[key] = NGramIndex(self._index(column, 'inverted'))
+        return self._indexes[key]
+
+    def is_range_column(self, column):
+        series = self.df[column]
+        return (pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)) \
+            or pd.api.types.is_datetime64_any_dtype(series)
+
+    def range_positions(self, column, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        return self._index(column, 'sorted').range(low, high, low_inclusive, high_inclusive)
+
+    def equal_positions(self, column, values):
+        inverted = self._index(column, 'inverted')
+        return inverted.positions(inverted.codes_for(values))
+
+    def contains_positions(self, column, text):
+        return self._index(column, 'ngram').contains(text)
+
+    def top_values(self, column, limit=1000):
+        return self._index(column, 'inverted').top_values(limit)
+
+    def condition_mask(self, column, operator, value):
+        # Returns None for operators the indexes can't answer, so callers fall back to a scan
+        length = len(self.df)
+        if operator == 'contains':
+            return _positions_mask(self.contains_positions(column, str(value)), length)
+        if operator == 'in':
+            return _positions_mask(self.equal_positions(column, value), length)
+        if operator == 'between':
+            return _positions_mask(self.range_positions(column, *value), length)
+        if self.is_range_column(column):
+            bounds = {
+                '=': (value, value), '>': (value, None, False), '>=': (value, None),
+                '<': (None, value, True, False), '<=': (None, value),
+            }
+            if operator == '!=':
+                return self._not_equal(column, self.range_positions(column, value, value))
+            if operator in bounds:
+                return _positions_mask(self.range_positions(column, *bounds[operator]), length)
+            return None
+        if operator == '=':
+            return _positions_mask(self.equal_positions(column, [value]), length)
+        if operator == '!=':
+            return self._not_equal(column, self.equal_positions(column, [value]))
+        return None
+
+    def _not_equal(self, column, equal_positions):
+        # Missing values match no comparison, '!=' included
+        return ~_positions_mask(equal_positions, len(self.df)) & self.df[column].notna().to_numpy()
+
+    def query(self, conditions):
+        mask = np.ones(len(self.df), dtype=bool)
+        for column, operator, value in conditions:
+            condition = self.condition_mask(column, operator, value)
+            if condition is None:
+                raise ValueError(f"Operator '{operator}' is not supported for column '{column}'")
+            mask &= condition
+        return mask
+
+    def memory_usage(self):
+        # A snapshot of the values: session budgets size the index from other sessions' threads
+        return sum(index.memory_usage() for index in list(self._indexes.values()))
+
+    def memory_parts(self):
+        # The indexed frame is usually the working frame, so it is sized with the session's other frames
+        return [self.df, self.memory_usage()]
+
+    def indexed_columns(self):
+        return sorted({f"{column} ({kind})" for column, kind in self._indexes})
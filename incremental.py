@@ -0,0 +1,138 @@
+import inspect
+import pandas as pd
+from cleaning_functions import (remove_duplicates, handle_missing_values, detect_outliers, knn_imputation,
+                                clean_text_columns, optimize_memory)
+from transformations import normalize_data, encode_categorical, extract_datetime_features, apply_custom_transformation
+from frame_index import FrameIndex
+
+# A pipeline is the list of steps that produced the working frame from the uploaded file.
+# Each step keeps the state its operation fitted on the full data (fill values, scaler
+# parameters, vocabularies, outlier bounds, row hashes), so newly arrived rows can be
+# cleaned on their own and appended without refitting on the stored rows.
+
+def drop_columns(df, columns):
+    return df.drop(columns=columns), f"Removed columns: {', '.join(map(str, columns))}"
+
+def convert_datetime(df, column):
+    df[column] = pd.to_datetime(df[column])
+    return df, f"Converted {column} to datetime"
+
+def query_rows(df, conditions):
+    mask = FrameIndex().sync(df, 'query').query(conditions)
+    columns = list(dict.fromkeys(column for column, _, _ in conditions))
+    return df[mask], f"Kept {int(mask.sum())} of {len(mask)} rows matching the query on {', '.join(columns)}"
+
+# Operations that can be replayed on new rows. SQL queries are not among them, since
+# a query may aggregate or join rows instead of transforming them one by one.
+OPERATIONS = {
+    'remove_duplicates': remove_duplicates,
+    'drop_columns': drop_columns,
+    'convert_datetime': convert_datetime,
+    'query_rows': query_rows,
+    'handle_missing_values': handle_missing_values,
+    'knn_imputation': knn_imputation,
+    'detect_outliers': detect_outliers,
+    'clean_text_columns': clean_text_columns,
+    'optimize_memory': optimize_memory,
+    'normalize_data': normalize_data,
+    'encode_categorical': encode_categorical,
+    'extract_datetime_features': extract_datetime_features,
+    'apply_custom_transformation': apply_custom_transformation,
+}
+
+def pipeline_step(operation, *args, **kwargs):
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown pipeline operation '{operation}'")
+    return {'operation': operation, 'args': args, 'kwargs': kwargs, 'state': {}}
+
+def run_step(df, step, progress=None):
+    # The first run of a step fills its empty state; later runs apply the fitted state
+    func = OPERATIONS[step['operation']]
+    parameters = inspect.signature(func).parameters
+    kwargs = dict(step['kwargs'])
+    if 'state' in parameters:
+        kwargs['state'] = step['state']
+    if progress is not None and 'progress' in parameters:
+        kwargs['progress'] = progress
+    return func(df, *step['args'], **kwargs)
+
+def new_pipeline(df):
+    return {'schema': df.dtypes.to_dict(), 'steps': [], 'blocked': None}
+
+def add_step(pipeline, step, description):
+    # A step without a replay spec blocks appending to every later version
+    if pipeline is None:
+        return None
+    if step is None:
+        return {**pipeline, 'blocked': pipeline['blocked'] or description.splitlines()[0]}
+    return {**pipeline, 'steps': pipeline['steps'] + [step]}
+
+def copy_pipeline(pipeline):
+    # Operations replace the state entries they update (row hashes, last values) rather than
+    # mutating them, so copying each state dict keeps the original pipeline intact
+    return {**pipeline, 'steps': [{**step, 'state': dict(step['state'])} for step in pipeline['steps']]}
+
+def _conform(delta, schema):
+    missing = [col for col in schema if col not in delta.columns]
+    if missing:
+        raise ValueError(f"New rows are missing columns: {', '.join(map(str, missing))}")
+    notes = []
+    extra = [col for col in delta.columns if col not in schema]
+    if extra:
+        notes.append(f"Ignored columns not in the original upload: {', '.join(map(str, extra))}")
+    delta = delta[list(schema)]
+    # Columns are read with the original upload's types where possible, so row hashes and
+    # fitted values compare like with like
+    uncast = []
+    for col, dtype in schema.items():
+        if delta[col].dtype != dtype:
+            try:
+                delta[col] = delta[col].astype(dtype)
+            except (ValueError, TypeError):
+                uncast.append(f"{col} ({delta[col].dtype}, uploaded as {dtype})")
+    if uncast:
+        notes.append("Kept the new rows' types for columns that couldn't be read like the original upload: "
+                     f"{', '.join(uncast)}")
+    return delta, notes
+
+def _concat(stored, delta):
+    if list(delta.columns) != list(stored.columns):
+        if set(delta.columns) != set(stored.columns):
+            raise ValueError("The cleaned new rows don't have the same columns as the stored data")
+        delta = delta[stored.columns]
+    stored = stored.copy(deep=False)
+    for col in stored.columns:
+        if isinstance(stored[col].dtype, pd.CategoricalDtype):
+            new = pd.Index(delta[col].dropna().unique()).difference(stored[col].cat.categories, sort=False)
+            if len(new):
+                stored[col] = stored[col].cat.add_categories(new)
+            delta[col] = delta[col].astype(stored[col].dtype)
+    start = stored.index.max() + 1 if len(stored) and pd.api.types.is_integer_dtype(stored.index) else len(stored)
+    delta.index = pd.RangeIndex(start, start + len(delta))
+    combined = pd.concat([stored, delta])
+    widened = [col for col in stored.columns if combined[col].dtype != stored[col].dtype]
+    return combined, widened
+
+def append_rows(stored, delta, pipeline, progress=None):
+    # Only the new rows go through the steps. Running state in the pipeline (row hashes for
+    # duplicates, last values for forward fill) is updated in place, so pass a copy_pipeline().
+    if pipeline['blocked']:
+        raise ValueError(f"New rows can't be cleaned like the stored data: '{pipeline['blocked']}' "
+                         "can't be replayed. Undo it to append.")
+    received = len(delta)
+    delta, report = _conform(delta, pipeline['schema'])
+    steps = pipeline['steps']
+    for i, step in enumerate(steps):
+        if progress:
+            progress(i, len(steps) + 1)
+        delta, line = run_step(delta, step)
+        if line:
+            report.extend(line.splitlines())
+    combined, widened = _concat(stored, delta)
+    if widened:
+        report.append(f"Widened column types to fit the new rows: {', '.join(map(str, widened))}")
+    if progress:
+        progress(len(steps) + 1, len(steps) + 1)
+    summary = (f"Appended {len(delta)} of {received} new rows after replaying {len(steps)} steps "
+               f"with their fitted state ({len(stored)} → {len(combined)} rows)")
+    return combined, "\n".join([summary] + report)
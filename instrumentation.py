@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Append one JSON line per measured operation to this file (unset: keep metrics in the session only)
+METRICS_FILE = os.environ.get('NEATSHEET_METRICS_FILE')
+# Peak memory comes from tracemalloc, which slows pure-Python operations; set to 1 to trace it.
+# Otherwise (and while another operation is being traced) the change in resident memory is reported.
+TRACE_MEMORY = os.environ.get('NEATSHEET_TRACE_MEMORY', '0') == '1'
+
+# Fields copied into cleaning history entries and exports
+METRIC_FIELDS = ['wall_seconds', 'cpu_seconds', 'peak_memory_mb', 'rss_delta_mb',
+                 'rows_in', 'columns_in', 'rows_out', 'columns_out']
+
+# tracemalloc keeps one peak for the whole process, so only one measurement traces at a time
+_trace_lock = threading.Lock()
+_file_lock = threading.Lock()
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+def _rss():
+    # Resident set size from /proc; None where it isn't available
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _start_tracing():
+    if not TRACE_MEMORY or not _trace_lock.acquire(blocking=False):
+        return None
+    tracemalloc.start()
+    return tracemalloc.get_traced_memory()[0]
+
+def _stop_tracing(baseline):
+    if baseline is None:
+        return None
+    try:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        _trace_lock.release()
+    return max(peak - baseline, 0) / 1024 ** 2
+
+def _shape(value):
+    # Operations return (df, report) or an artifact; only frame-like values have a shape
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    shape = getattr(value, 'shape', None)
+    if not isinstance(shape, tuple) or not shape:
+        return None, None
+    return shape[0], shape[1] if len(shape) > 1 else 1
+
+def measure(operation, func, *args, **kwargs):
+    # Calls func(*args, **kwargs) and returns (result, metrics). CPU time is for the calling
+    # thread and memory is what this process allocates; work in the process pool counts as wall time.
+    rows_in, columns_in = _shape(args[0] if args else None)
+    started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    baseline = _start_tracing()
+    rss = _rss()
+    wall, cpu = time.perf_counter(), time.thread_time()
+    status = 'failed'
+    result = None
+    try:
+        result = func(*args, **kwargs)
+        status = 'ok'
+    finally:
+        rows_out, columns_out = _shape(result)
+        metrics = {
+            'operation': operation,
+            'started': started,
+            'status': status,
+            'wall_seconds': round(time.perf_counter() - wall, 4),
+            'cpu_seconds': round(time.thread_time() - cpu, 4),
+            'peak_memory_mb': _round(_stop_tracing(baseline)),
+            'rss_delta_mb': _round(_rss_delta(rss)),
+            'rows_in': rows_in,
+            'columns_in': columns_in,
+            'rows_out': rows_out,
+            'columns_out': columns_out,
+        }
+        emit(metrics)
+    return result, metrics
+
+def _rss_delta(before):
+    after = _rss()
+    return None if before is None or after is None else (after - before) / 1024 ** 2
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+def emit(metrics, path=None):
+    path = path or METRICS_FILE
+    if not path:
+        return
+    with _file_lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(metrics, default=str) + "\n")
+
+def format_metrics(metrics):
+    parts = [f"{metrics['wall_seconds']:.2f}s wall", f"{metrics['cpu_seconds']:.2f}s CPU"]
+    if metrics.get('peak_memory_mb') is not None:
+        parts.append(f"+{metrics['peak_memory_mb']:.1f} MB peak")
+    elif metrics.get('rss_delta_mb') is not None:
+        parts.append(f"{metrics['rss_delta_mb']:+.1f} MB resident")
+    if metrics.get('rows_in') is not None and metrics.get('rows_out') is not None:
+        parts.append(f"{metrics['rows_in']:,}×{metrics['columns_in']} → {metrics['rows_out']:,}×{metrics['columns_out']}")
+    elif metrics.get('rows_out') is not None:
+        parts.append(f"{metrics['rows_out']:,}×{metrics['columns_out']} out")
+    return " · ".join(parts)
@@ -0,0 +1,182 @@
+import hashlib
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from versioning import copy_on_write_enabled
+from instrumentation import measure
+
+# Derives from BaseException so the broad `except Exception` blocks in the operations can't swallow it
+class JobCancelled(BaseException):
+    pass
+
+def _update_signature(digest, value):
+    # Frames and arrays are compared by content; everything else by its repr
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(repr((type(value).__name__, list(getattr(value, 'columns', [])), value.shape)).encode('utf-8'))
+        try:
+            digest.update(pd.util.hash_pandas_object(value).to_numpy().tobytes())
+        except TypeError:
+            digest.update(repr(id(value)).encode('utf-8'))
+    elif hasattr(value, 'tobytes'):
+        digest.update(value.tobytes())
+    elif isinstance(value, dict):
+        digest.update(b'{')
+        for key, item in value.items():
+            digest.update(repr(key).encode('utf-8'))
+            _update_signature(digest, item)
+        digest.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'[')
+        for item in value:
+            _update_signature(digest, item)
+        digest.update(b']')
+    else:
+        digest.update(repr(value).encode('utf-8'))
+
+def job_signature(func, args, kwargs):
+    digest = hashlib.sha256()
+    _update_signature(digest, (func, args, kwargs))
+    return digest.hexdigest()
+
+class Job:
+    def __init__(self, job_id, key, label, kind, base_version, unit, step_name, replay=None, signature=None):
+        self.id = job_id
+        self.key = key
+        # Fingerprint of the function and parameters, taken before the job can fill any state in them
+        self.signature = signature
+        self.label = label
+        self.kind = kind
+        self.base_version = base_version
+        self.unit = unit
+        self.step_name = step_name
+        # How to record the step in the pipeline once a frame job's result is applied
+        self.replay = replay
+        self.status = 'queued'
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.metrics = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.applied = False
+        self._cancel = threading.Event()
+
+    # Passed to operations as their `progress` callback
+    def report(self, done, total=None):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.done = done
+        if total is not None:
+            self.total = total
+
+    def cancel(self):
+        self._cancel.set()
+        if self.status == 'queued':
+            self.status = 'cancelled'
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def matches(self, func, *args, **kwargs):
+        return self.signature == job_signature(func, args, kwargs)
+
+    @property
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    def eta(self):
+        if not self.started or not self.done or not self.total:
+            return None
+        elapsed = time.time() - self.started
+        return elapsed * (self.total - self.done) / self.done
+
+    def describe(self):
+        eta = self.eta()
+        eta_text = f"ETA {eta:.0f}s" if eta is not None else "estimating..."
+        if self.status == 'queued':
+            return f"{self.label}: queued"
+        return f"{self.label}: {self.done:,}/{self.total:,} {self.unit} · {eta_text}"
+
+class JobManager:
+    def __init__(self, max_workers=2):
+        # Threads rather than processes so jobs can share the frame and report progress cheaply;
+        # the heavy lifting happens in numpy/sklearn code that releases the GIL
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='neatsheet-job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._next_id = 1
+
+    def submit(self, key, label, func, df, *args, kind='artifact', base_version=None,
+               unit='rows', step_name=None, replay=None, **kwargs):
+        signature = job_signature(func, args, kwargs)
+        with self._lock:
+            existing = self._jobs.get(key)
+            if existing is not None and existing.status not in ('failed', 'cancelled'):
+                if existing.signature == signature and (existing.kind != 'frame' or not existing.applied):
+                    return existing
+                # The same operation submitted with other parameters replaces the earlier run
+                existing.cancel()
+            job = Job(self._next_id, key, label, kind, base_version, unit, step_name, replay, signature)
+            self._next_id += 1
+            self._jobs[key] = job
+
+        # Jobs work on a detached frame so the script thread never sees a half-applied step
+        detached = df.copy(deep=not copy_on_write_enabled())
+        self._executor.submit(self._run, job, func, detached, args, kwargs)
+        return job
+
+    def _run(self, job, func, df, args, kwargs):
+        if job.status == 'cancelled':
+            return
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            job.result, job.metrics = measure(job.label, func, df, *args, progress=job.report, **kwargs)
+            job.status = 'done'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = f"{e}\n{traceback.format_exc()}"
+            job.status = 'failed'
+        finally:
+            job.finished = time.time()
+
+    def get(self, key):
+        # Keys name an operation on a frame version; check job.matches() before reusing the result
+        with self._lock:
+            return self._jobs.get(key)
+
+    def active(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if job.active]
+
+    def memory_parts(self):
+        # Finished results are held until they are applied or pruned
+        with self._lock:
+            return [job.result for job in self._jobs.values() if job.result is not None]
+
+    def finished_frame_jobs(self):
+        with self._lock:
+            return [job for job in self._jobs.values()
+                    if job.kind == 'frame' and not job.active and not job.applied]
+
+    def prune(self, current_version):
+        # Artifacts are keyed by (name, frame version); results for older versions are dead weight
+        with self._lock:
+            for key, job in list(self._jobs.items()):
+                if not job.active and (job.kind == 'frame' and job.applied or
+                                       job.kind != 'frame' and key[-1] != current_version):
+                    del self._jobs[key]
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # The session manager closes the artifacts of sessions it expires or drops
+    close = shutdown
@@ -0,0 +1,408 @@
+import pandas as pd
+import numpy as np
+import os
+import shutil
+import tempfile
+import inspect
+from functools import partial, reduce
+from parallel import process_pool, MAX_WORKERS
+from versioning import write_frame_parquet, read_frame_parquet
+from sketches import empty_sketch, update_sketch, sketch_frame, merge_sketches
+from exports import json_records
+
+MB = 1024 ** 2
+# Uploads larger than this are converted to Parquet partitions instead of being loaded into memory
+OUT_OF_CORE_THRESHOLD = int(os.environ.get('NEATSHEET_OUT_OF_CORE_MB', 500)) * MB
+# Partitions live under this directory (default: the system temp directory)
+OUT_OF_CORE_DIR = os.environ.get('NEATSHEET_OUT_OF_CORE_DIR')
+PARTITION_ROWS = 500_000
+# Previews and profiles use a uniform sample of this many rows
+SAMPLE_ROWS = 10_000
+
+# Server-side paths are only accepted on admin deployments, and only under this directory
+LOCAL_FILES_DIR = os.environ.get('NEATSHEET_LOCAL_FILES_DIR')
+
+OUTLIER_METHODS = ['zscore', 'iqr']
+
+def _new_directory(prefix='neatsheet_partitions_'):
+    if OUT_OF_CORE_DIR:
+        os.makedirs(OUT_OF_CORE_DIR, exist_ok=True)
+    return tempfile.mkdtemp(prefix=prefix, dir=OUT_OF_CORE_DIR)
+
+class ExportDirectory:
+    # Each session exports into its own temporary directory and downloads from there;
+    # a new export replaces the previous file, and the directory goes with the session
+    def __init__(self):
+        self.path = _new_directory('neatsheet_export_')
+        self.file = None
+
+    def write(self, dataset, fmt):
+        path = os.path.join(self.path, f"cleaned_data.{fmt}")
+        if self.file and self.file != path and os.path.exists(self.file):
+            os.unlink(self.file)
+        export_partitions(dataset, path, fmt)
+        self.file = path
+        return path
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.file = None
+
+def local_files_enabled():
+    return bool(LOCAL_FILES_DIR and os.environ.get('NEATSHEET_ADMIN'))
+
+def resolve_local_path(path):
+    # Relative paths are taken from LOCAL_FILES_DIR; anything that resolves outside it is refused
+    if not local_files_enabled():
+        raise ValueError("Server paths are disabled; set NEATSHEET_ADMIN and NEATSHEET_LOCAL_FILES_DIR to enable them")
+    root = os.path.realpath(LOCAL_FILES_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"'{path}' is outside the allowed directory {root}")
+    return resolved
+
+def _partition_path(directory, i):
+    return os.path.join(directory, f"part-{i:05d}.parquet")
+
+def _sample_keys(rows, seed):
+    # Every row gets a random key and the sample is the rows with the smallest keys, which is a
+    # uniform sample that can be merged across partitions
+    return np.random.default_rng(seed).random(rows)
+
+def _bottom_rows(df, keys, sample_rows):
+    positions = np.sort(np.argsort(keys, kind='stable')[:sample_rows])
+    return df.iloc[positions], keys[positions]
+
+def _write_partition(df, path, seed, sample_rows):
+    columns = write_frame_parquet(df, path)
+    sample, keys = _bottom_rows(df, _sample_keys(len(df), seed), sample_rows)
+    return {'path': path, 'rows': len(df), 'columns': columns, 'sample': sample, 'sample_keys': keys}
+
+def _process_partition(path, columns, out_path, seed, sample_rows, func, args):
+    # Runs in a pool worker: read one partition, apply func and write the result next to it
+    result = func(read_frame_parquet(path, columns), *args)
+    report = None
+    if isinstance(result, tuple):
+        result, report = result
+    written = _write_partition(result, out_path, seed, sample_rows)
+    written['sketch'] = sketch_frame(result)
+    written['report'] = report
+    return written
+
+def _scan_partition(path, columns, func, args):
+    return func(read_frame_parquet(path, columns), *args)
+
+def _run(tasks, progress=None):
+    # tasks is a list of (func, args); single partitions and single-CPU hosts skip the pool
+    if MAX_WORKERS <= 1 or len(tasks) <= 1:
+        results = []
+        for func, args in tasks:
+            results.append(func(*args))
+            if progress:
+                progress(len(results), len(tasks))
+        return results
+    results = []
+    with process_pool() as pool:
+        futures = [pool.submit(func, *args) for func, args in tasks]
+        for future in futures:
+            results.append(future.result())
+            if progress:
+                progress(len(results), len(tasks))
+    return results
+
+def _conform_chunk(chunk, dtypes, empty, rows):
+    # Casts a later CSV chunk to the column types of the chunks before it. Types only widen
+    # (int to float, bool to nullable boolean, a column with no values so far to whatever comes next);
+    # text in a numeric column can't be cleaned with one type and is refused.
+    chunk = chunk.copy(deep=False)
+    for col, dtype in dtypes.items():
+        values = chunk[col]
+        if col in empty or values.isna().all():
+            target = values.dtype if col in empty else dtype
+            if values.isna().any() or col in empty and dtype != target:
+                target = float if target.kind in 'iu' else 'boolean' if target.kind == 'b' else target
+            chunk[col] = values.astype(target)
+        elif values.dtype == dtype:
+            continue
+        elif dtype.kind in 'iuf':
+            converted = values if values.dtype.kind in 'iuf' else pd.to_numeric(values, errors='coerce')
+            invalid = converted.isna() & values.notna()
+            if invalid.any():
+                position = int(np.argmax(invalid.to_numpy()))
+                raise ValueError(f"Column '{col}' is numeric in the first {rows:,} rows but line {rows + position + 2:,} "
+                                 f"holds '{values.iloc[position]}'. Partitions need one type per column; fix the "
+                                 "value or quote the column's numbers so it is read as text.")
+            chunk[col] = converted.astype(np.result_type(dtype, converted.dtype))
+        elif dtype.kind == 'b' and values.dropna().map(type).eq(bool).all():
+            chunk[col] = values.astype('boolean')
+        elif dtype.kind != 'b':
+            try:
+                chunk[col] = values.astype(dtype)
+            except (ValueError, TypeError):
+                raise ValueError(f"Column '{col}' is read as {dtype} in the first {rows:,} rows but as "
+                                 f"{values.dtype} later; partitions need one type per column") from None
+        else:
+            raise ValueError(f"Column '{col}' is read as {dtype} in the first {rows:,} rows but as "
+                             f"{values.dtype} later; partitions need one type per column")
+    return chunk
+
+class PartitionedDataset:
+    # A dataset stored as Parquet partitions on local disk, with a sketch and a row sample kept in
+    # memory for previews and profiles. Operations return a new dataset in a new directory.
+    def __init__(self, directory, partitions, columns, sketch, sample):
+        self.directory = directory
+        self.partitions = partitions
+        self.columns = columns
+        self.sketch = sketch
+        self.sample = sample
+
+    @classmethod
+    def from_csv(cls, file, partition_rows=PARTITION_ROWS, sample_rows=SAMPLE_ROWS, progress=None):
+        # The CSV is parsed once, a chunk at a time; each chunk becomes one partition. Every partition
+        # gets the same column types, so later operations see one schema.
+        directory = _new_directory()
+        try:
+            written = []
+            sketch = empty_sketch()
+            dtypes = {}
+            empty = set()
+            with pd.read_csv(file, chunksize=partition_rows) as chunks:
+                for i, chunk in enumerate(chunks):
+                    if written:
+                        chunk = _conform_chunk(chunk, dtypes, empty, sketch['rows'])
+                        empty &= {col for col in empty if chunk[col].isna().all()}
+                    else:
+                        empty = {col for col in chunk.columns if chunk[col].isna().all()}
+                    dtypes.update(chunk.dtypes.to_dict())
+                    update_sketch(sketch, chunk)
+                    written.append(_write_partition(chunk, _partition_path(directory, i), i, sample_rows))
+                    written[-1]['dtypes'] = chunk.dtypes.to_dict()
+                    if progress:
+                        progress(sketch['rows'], None)
+            # Columns widened by a later chunk (integers that gained missing values, columns that were
+            # empty at first) are rewritten in the earlier partitions, and the sketch is taken again
+            if any(part['dtypes'] != dtypes for part in written):
+                sketch = empty_sketch()
+                for i, part in enumerate(written):
+                    chunk = read_frame_parquet(part['path'], part['columns'])
+                    if part['dtypes'] != dtypes:
+                        chunk = chunk.astype(dtypes)
+                        written[i] = _write_partition(chunk, part['path'], i, sample_rows)
+                    update_sketch(sketch, chunk)
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return cls._assemble(directory, written, sample_rows, sketch)
+
+    @classmethod
+    def _assemble(cls, directory, written, sample_rows, sketch=None):
+        columns = written[0]['columns'] if written else []
+        for part in written:
+            if part['columns'] != columns:
+                shutil.rmtree(directory, ignore_errors=True)
+                raise ValueError("Partitions ended up with different columns; only row-wise operations "
+                                 "can run out of core")
+        if sketch is None:
+            sketch = reduce(merge_sketches, [part['sketch'] for part in written]) if written else empty_sketch()
+        if written:
+            sample, _ = _bottom_rows(pd.concat([part['sample'] for part in written], ignore_index=True),
+                                     np.concatenate([part['sample_keys'] for part in written]), sample_rows)
+            sample = sample.reset_index(drop=True)
+        else:
+            sample = pd.DataFrame()
+        return cls(directory, [(part['path'], part['rows']) for part in written], columns, sketch, sample)
+
+    @property
+    def rows(self):
+        return sum(rows for _, rows in self.partitions)
+
+    @property
+    def shape(self):
+        return self.rows, len(self.columns)
+
+    def disk_usage(self):
+        return sum(os.path.getsize(path) for path, _ in self.partitions if os.path.exists(path))
+
+    def read_partition(self, i):
+        return read_frame_parquet(self.partitions[i][0], self.columns)
+
+    def iter_partitions(self):
+        for i in range(len(self.partitions)):
+            yield self.read_partition(i)
+
+    def head(self, n=5):
+        return self.read_partition(0).head(n) if self.partitions else pd.DataFrame(columns=self.columns)
+
+    def map_partitions(self, func, *args, sample_rows=SAMPLE_ROWS, progress=None):
+        # func(df, *args) must be row-wise and picklable; it returns df or (df, report) and raises on failure.
+        # Returns the new dataset and the per-partition reports.
+        directory = _new_directory()
+        try:
+            tasks = [(_process_partition, (path, self.columns, _partition_path(directory, i), i, sample_rows,
+                                           func, args))
+                     for i, (path, _) in enumerate(self.partitions)]
+            written = _run(tasks, progress)
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return self._assemble(directory, written, sample_rows), [part['report'] for part in written]
+
+    def scan_partitions(self, func, *args, progress=None):
+        # func(df, *args) is called on every partition for a result that is combined by the caller
+        return _run([(_scan_partition, (path, self.columns, func, args)) for path, _ in self.partitions], progress)
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+# ----- row-wise operations with state fitted on the whole dataset -----
+def outlier_bounds(dataset, columns, method='zscore', threshold=3):
+    # Bounds come from the dataset sketch: exact mean and standard deviation, approximate quartiles
+    bounds = {}
+    for col in columns:
+        column = dataset.sketch['columns'].get(col)
+        if column is None or column.kind != 'numeric':
+            continue
+        if method == 'zscore':
+            std = column.std
+            # A constant column has no outliers
+            bounds[col] = None if not std else (column.mean - threshold * std, column.mean + threshold * std, False)
+        elif method == 'iqr':
+            q1, q3 = column.quantiles.quantiles([0.25, 0.75])
+            bounds[col] = (q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1), True)
+        else:
+            raise ValueError(f"Unknown outlier method '{method}'")
+    return bounds
+
+def _filter_partition(df, bounds):
+    # Same rule as detect_outliers: a row goes when any column is outside its bounds, then rows
+    # with missing values are dropped
+    keep = np.ones(len(df), dtype=bool)
+    removed = []
+    for col, bound in bounds.items():
+        initial = keep.sum()
+        if bound is not None:
+            low, high, inclusive = bound
+            values = df[col].to_numpy(dtype=float, na_value=np.nan)
+            keep &= (values >= low) & (values <= high) if inclusive else (values > low) & (values < high)
+        removed.append(int(initial - keep.sum()))
+    return df[keep].dropna(), removed
+
+def filter_outliers(dataset, columns, method='zscore', threshold=3, progress=None):
+    bounds = outlier_bounds(dataset, columns, method, threshold)
+    result, removed = dataset.map_partitions(_filter_partition, bounds, progress=progress)
+    totals = np.sum(removed, axis=0) if removed else np.zeros(len(bounds), dtype=int)
+    report = [f"Removed {total} outliers from {col} ({method}, bounds from the full dataset)"
+              for col, total in zip(bounds, totals)]
+    return result, "\n".join(report)
+
+def apply_rowwise(dataset, func, *args, progress=None):
+    # For transformations.extract_datetime_features, apply_custom_transformation and other
+    # functions whose output rows depend only on the same input rows. Every partition reports
+    # the same step, so the first report stands for all of them. Operations that report a failure
+    # and return the frame unchanged are asked to raise instead, so one failed partition can't
+    # leave the others transformed.
+    if 'errors' in inspect.signature(func).parameters:
+        func = partial(func, errors='raise')
+    try:
+        result, reports = dataset.map_partitions(func, *args, progress=progress)
+    except Exception as e:
+        raise ValueError(f"{getattr(func, 'func', func).__name__} failed on a partition: {e}") from e
+    return result, reports[0] if reports else ""
+
+def _partition_uniques(df, columns):
+    return {col: df[col].dropna().unique() for col in columns}
+
+def _sorted_vocabulary(values):
+    try:
+        return sorted(values)
+    except TypeError:
+        return sorted(values, key=str)
+
+def fit_vocabularies(dataset, columns, progress=None):
+    # One pass over the partitions collects every distinct value, sorted the way LabelEncoder does
+    parts = dataset.scan_partitions(_partition_uniques, columns, progress=progress)
+    return {col: _sorted_vocabulary(set().union(*(part[col].tolist() for part in parts))) for col in columns}
+
+def _encode_partition(df, columns, method, vocabularies):
+    new_columns = []
+    for col in columns:
+        values = pd.Categorical(df[col], categories=vocabularies[col])
+        if method == 'onehot':
+            dummies = pd.get_dummies(values, prefix=col)
+            dummies.index = df.index
+            new_columns.append(dummies)
+        else:
+            df[col] = values.codes
+    if new_columns:
+        df = pd.concat([df] + new_columns, axis=1)
+    return df
+
+def encode_partitions(dataset, columns, method='onehot', vocabularies=None, progress=None):
+    # Every partition is encoded with the same vocabulary, so one-hot columns and label codes line up
+    vocabularies = vocabularies or fit_vocabularies(dataset, columns)
+    result, _ = dataset.map_partitions(_encode_partition, columns, method, vocabularies, progress=progress)
+    if method == 'onehot':
+        report = [f"One-hot encoded '{col}' → {len(vocabularies[col])} new columns" for col in columns]
+    else:
+        report = [f"Label encoded column '{col}' ({len(vocabularies[col])} values)" for col in columns]
+    return result, "\n".join(report)
+
+# ----- previews, profiles and exports -----
+def profile_dataset(dataset):
+    # Distributions come from the sample; counts, extremes and moments from the sketch
+    from profiling import generate_data_profile
+
+    profile = generate_data_profile(dataset.sample)
+    columns = dataset.sketch['columns']
+    scale = dataset.rows / len(dataset.sample) if len(dataset.sample) else 0
+    profile['shape'] = (dataset.rows, len(dataset.columns))
+    profile['missing_values'] = sum(column.nulls for column in columns.values())
+    profile['duplicates'] = "n/a (out-of-core)"
+    for col, stats in profile['numeric_stats'].items():
+        column = columns.get(col)
+        if column is None or column.kind != 'numeric' or not column.quantiles.count:
+            continue
+        stats.update({
+            'min': column.quantiles.min,
+            'max': column.quantiles.max,
+            'mean': column.mean,
+            'median': float(column.quantiles.quantiles([0.5])[0]),
+            'std': column.std,
+            'zeros': int(round(stats['zeros'] * scale)),
+            'missing': column.nulls,
+        })
+    for col, stats in profile['categorical_stats'].items():
+        column = columns.get(col)
+        if column is None or column.kind != 'categorical':
+            continue
+        stats.update({
+            'unique': column.distinct.estimate(),
+            'top_values': dict(list(column.top.counts.items())[:5]),
+            'missing': column.nulls,
+        })
+    return profile
+
+def export_partitions(dataset, path, fmt='csv', progress=None):
+    # Streams the partitions into one file, holding a single partition in memory at a time
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            if not dataset.partitions:
+                pd.DataFrame(columns=dataset.columns).to_csv(f, index=False)
+            for i, part in enumerate(dataset.iter_partitions()):
+                part.to_csv(f, index=False, header=i == 0)
+                if progress:
+                    progress(i + 1, len(dataset.partitions))
+        elif fmt == 'json':
+            f.write("[")
+            first = True
+            for i, part in enumerate(dataset.iter_partitions()):
+                records = json_records(part)
+                if records:
+                    f.write(("\n" if first else ",\n") + records)
+                    first = False
+                if progress:
+                    progress(i + 1, len(dataset.partitions))
+            f.write("]" if first else "\n]")
+        else:
+            raise ValueError(f"Unknown export format '{fmt}'")
+    return path
@@ -0,0 +1,133 @@
+import pandas as pd
+import numpy as np
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+# Below this many cells the pool start-up and transfer cost outweighs the parallel speedup
+PARALLEL_MIN_CELLS = 2_000_000
+MAX_WORKERS = int(os.environ.get('NEATSHEET_WORKERS', os.cpu_count() or 1))
+
+_pool = None
+_pool_workers = None
+# Number of callers currently submitting to each pool; a replaced pool is shut down by its last user
+_pool_users = {}
+_pool_lock = threading.Lock()
+
+@contextmanager
+def process_pool(max_workers=None):
+    # forkserver/spawn rather than fork: the pool is often created from Streamlit or job threads
+    global _pool, _pool_workers
+    max_workers = max_workers or MAX_WORKERS
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None and _pool not in _pool_users:
+                _pool.shutdown(wait=False)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+            _pool_workers = max_workers
+        pool = _pool
+        _pool_users[pool] = _pool_users.get(pool, 0) + 1
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users[pool] -= 1
+            if not _pool_users[pool]:
+                del _pool_users[pool]
+                if pool is not _pool:
+                    pool.shutdown(wait=False)
+
+def _shareable(series):
+    return isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM'
+
+def _column_spec(series, shm_name, offset):
+    if shm_name is not None:
+        return (series.name, 'shm', (shm_name, offset, series.dtype.str, len(series)))
+    return (series.name, 'pickle', series.reset_index(drop=True))
+
+def _attach(spec, segments):
+    name, kind, payload = spec
+    if kind == 'pickle':
+        return payload
+    shm_name, offset, dtype, length = payload
+    if shm_name not in segments:
+        segments[shm_name] = shared_memory.SharedMemory(name=shm_name)
+    values = np.ndarray((length,), dtype=np.dtype(dtype), buffer=segments[shm_name].buf, offset=offset)
+    return pd.Series(values, name=name, copy=False)
+
+def _copy_into(segment, offset, series):
+    target = np.ndarray((len(series),), dtype=series.dtype, buffer=segment.buf, offset=offset)
+    target[:] = series.to_numpy()
+
+def _run_partition(func, specs, args):
+    segments = {}
+    try:
+        return [func(_attach(spec, segments), *args) for spec in specs]
+    finally:
+        for segment in segments.values():
+            try:
+                segment.close()
+            except BufferError:
+                # A result still views the buffer; the mapping goes away with the worker's references
+                pass
+
+def _partitions(items, n):
+    size, extra = divmod(len(items), n)
+    start = 0
+    for i in range(n):
+        end = start + size + (1 if i < extra else 0)
+        if end > start:
+            yield items[start:end]
+        start = end
+
+def map_columns(func, df, columns, args=(), n_jobs=None, progress=None, min_cells=PARALLEL_MIN_CELLS):
+    # func(series, *args) is called once per column; results come back in column order.
+    # Worker series carry a RangeIndex, so callers re-attach df.index to row-shaped results.
+    columns = list(columns)
+    n_jobs = min(n_jobs or MAX_WORKERS, len(columns))
+    if n_jobs <= 1 or len(df) * len(columns) < min_cells:
+        results = []
+        for i, col in enumerate(columns):
+            if progress:
+                progress(i, len(columns))
+            results.append(func(df[col].reset_index(drop=True), *args))
+        return results
+
+    # Numeric buffers are copied once into shared memory; workers map them without pickling
+    series_list = [df[col] for col in columns]
+    offsets = []
+    shared_bytes = 0
+    for series in series_list:
+        if _shareable(series):
+            offsets.append(shared_bytes)
+            shared_bytes += -(-series.dtype.itemsize * len(series) // 8) * 8
+        else:
+            offsets.append(None)
+
+    segment = shared_memory.SharedMemory(create=True, size=max(shared_bytes, 1)) if shared_bytes else None
+    try:
+        specs = []
+        for series, offset in zip(series_list, offsets):
+            if offset is None or segment is None:
+                specs.append(_column_spec(series, None, None))
+                continue
+            _copy_into(segment, offset, series)
+            specs.append(_column_spec(series, segment.name, offset))
+
+        results = []
+        with process_pool() as pool:
+            futures = [pool.submit(_run_partition, func, part, args) for part in _partitions(specs, n_jobs)]
+            for future in futures:
+                results.extend(future.result())
+                if progress:
+                    progress(len(results), len(columns))
+        return results
+    finally:
+        if segment is not None:
+            segment.close()
+            segment.unlink()
@@ -1,47 +1,71 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import streamlit as st
 import io  # For Excel export
+from cleaning_functions import TEXT_DTYPES
+from parallel import map_columns, process_pool
+from collections import OrderedDict
+import hashlib
 
-def generate_data_profile(df):
+# Report figures are rendered from a sample and cached by column name and sample content,
+# so sessions whose data differs never share a chart
+FIGURE_SAMPLE_SIZE = 5000
+FIGURE_CACHE_SIZE = 1000
+FIGURE_SIZE = (4, 2.5)
+FIGURE_DPI = 80
+_figure_cache = OrderedDict()
+
+def _numeric_column_stats(series):
+    return {
+        'min': series.min(),
+        'max': series.max(),
+        'mean': series.mean(),
+        'median': series.median(),
+        'std': series.std(),
+        'skew': series.skew(),
+        'kurtosis': series.kurtosis(),
+        'zeros': (series == 0).sum(),
+        'missing': series.isnull().sum()
+    }
+
+def _categorical_column_stats(series):
+    return {
+        'unique': series.nunique(),
+        'top_values': series.value_counts().head(5).to_dict(),
+        'missing': series.isnull().sum()
+    }
+
+def _profiled_columns(df):
+    # Numeric and text columns get a section (and a chart) in the report; others are only counted
+    return df.select_dtypes(include=np.number).columns.tolist(), df.select_dtypes(include=TEXT_DTYPES).columns.tolist()
+
+def generate_data_profile(df, progress=None, n_jobs=None):
     profile = {}
     profile['shape'] = df.shape
     profile['missing_values'] = df.isnull().sum().sum()
     profile['duplicates'] = df.duplicated().sum()
     profile['dtypes'] = df.dtypes.value_counts().to_dict()
     
-    numeric_cols = df.select_dtypes(include=np.number).columns
-    numeric_stats = {}
-    for col in numeric_cols:
-        numeric_stats[col] = {
-            'min': df[col].min(),
-            'max': df[col].max(),
-            'mean': df[col].mean(),
-            'median': df[col].median(),
-            'std': df[col].std(),
-            'skew': df[col].skew(),
-            'kurtosis': df[col].kurtosis(),
-            'zeros': (df[col] == 0).sum(),
-            'missing': df[col].isnull().sum()
-        }
-    profile['numeric_stats'] = numeric_stats
+    numeric_cols, cat_cols = _profiled_columns(df)
+    total = len(numeric_cols) + len(cat_cols)
+    numeric_results = map_columns(_numeric_column_stats, df, numeric_cols, n_jobs=n_jobs,
+                                  progress=progress and (lambda done, _: progress(done, total)))
+    profile['numeric_stats'] = dict(zip(numeric_cols, numeric_results))
     
-    cat_cols = df.select_dtypes(include='object').columns
-    cat_stats = {}
-    for col in cat_cols:
-        cat_stats[col] = {
-            'unique': df[col].nunique(),
-            'top_values': df[col].value_counts().head(5).to_dict(),
-            'missing': df[col].isnull().sum()
-        }
-    profile['categorical_stats'] = cat_stats
+    cat_results = map_columns(_categorical_column_stats, df, cat_cols, n_jobs=n_jobs,
+                              progress=progress and (lambda done, _: progress(len(numeric_cols) + done, total)))
+    profile['categorical_stats'] = dict(zip(cat_cols, cat_results))
+    if progress:
+        progress(total, total)
     
     return profile
 
 def visualize_column(df, col_selected, profile):
+    # Charting libraries are imported on first use to keep app start-up fast
+    import streamlit as st
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    import plotly.express as px
+    
     if pd.api.types.is_numeric_dtype(df[col_selected]):
         tab1, tab2, tab3 = st.tabs(["Histogram", "Box Plot", "Distribution"])
         with tab1:
@@ -89,6 +113,10 @@ def visualize_column(df, col_selected, profile):
                        unsafe_allow_html=True)
 
 def show_correlation(df):
+    import streamlit as st
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
     numeric_cols = df.select_dtypes(include=np.number).columns
     if len(numeric_cols) > 1:
         st.subheader("Correlation Matrix")
@@ -96,3 +124,78 @@ def show_correlation(df):
         fig, ax = plt.subplots(figsize=(10, 8))
         sns.heatmap(corr, annot=True, fmt=".2f", cmap="coolwarm", ax=ax)
         st.pyplot(fig)
+
+def _render_column_png(col, values, is_numeric):
+    # Runs in a worker process, so force the non-interactive backend there
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
+    if is_numeric:
+        ax.hist(values, bins=30, color='#4CAF50')
+        ax.set_title(f'Distribution of {col}', fontsize=8)
+    else:
+        labels, counts = values
+        ax.barh([str(label)[:20] for label in labels][::-1], counts[::-1], color='#189AB4')
+        ax.set_title(f'Top Values in {col}', fontsize=8)
+    ax.tick_params(labelsize=6)
+    fig.subplots_adjust(left=0.2 if not is_numeric else 0.12, right=0.97, bottom=0.12, top=0.88)
+    fig.set_dpi(FIGURE_DPI)
+    fig.canvas.draw()
+    rgb = np.asarray(fig.canvas.buffer_rgba())[:, :, :3]
+    plt.close(fig)
+
+    # FPDF embeds RGB PNGs as-is but decodes RGBA ones pixel by pixel
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def _figure_payload(series):
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.dropna()
+        if len(values) > FIGURE_SAMPLE_SIZE:
+            values = values.sample(FIGURE_SAMPLE_SIZE, random_state=0)
+        return values.to_numpy(dtype=float), True
+    counts = series.value_counts().head(10)
+    return (counts.index.tolist(), counts.to_numpy()), False
+
+def _payload_key(col, payload):
+    values, is_numeric = payload
+    digest = hashlib.sha256(str(col).encode('utf-8'))
+    if is_numeric:
+        digest.update(values.tobytes())
+    else:
+        labels, counts = values
+        digest.update(repr([str(label) for label in labels]).encode('utf-8'))
+        digest.update(counts.tobytes())
+    return digest.hexdigest()
+
+def render_column_figures(df, columns=None, use_cache=True, max_workers=None):
+    # Only the columns the report has a section for are rendered
+    profiled = set(sum(_profiled_columns(df), []))
+    columns = [col for col in (df.columns if columns is None else columns) if col in profiled]
+    figures = {}
+    pending = {}
+    for col in columns:
+        # The sample is cheap next to the rendering, so it is taken every time and its content is the key
+        payload = _figure_payload(df[col])
+        key = _payload_key(col, payload)
+        if use_cache and key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            figures[col] = _figure_cache[key]
+        else:
+            pending[col] = (key, payload)
+
+    if pending:
+        with process_pool(max_workers) as executor:
+            futures = {col: executor.submit(_render_column_png, col, *payload) for col, (_, payload) in pending.items()}
+            for col, future in futures.items():
+                figures[col] = future.result()
+                if use_cache:
+                    _figure_cache[pending[col][0]] = figures[col]
+
+    while len(_figure_cache) > FIGURE_CACHE_SIZE:
+        _figure_cache.popitem(last=False)
+    return {col: figures[col] for col in columns}
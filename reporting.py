@@ -1,14 +1,57 @@
-from fpdf import FPDF
-import tempfile
+from collections import OrderedDict
+import hashlib
+import json
 import os
+import tempfile
 
-def create_quality_report(profile):
-    pdf = FPDF()
-    pdf.add_page()
+# Reports are cached by profile fingerprint so repeated clicks reuse the bytes
+REPORT_CACHE_SIZE = 8
+_report_cache = OrderedDict()
+
+# Column sections are laid out in batches; only one batch's charts are on disk at a time
+COLUMN_BATCH_SIZE = 50
+NUMERIC_BLOCK_HEIGHT = 24
+CATEGORICAL_BLOCK_HEIGHT = 19
+DRIFT_ROW_HEIGHT = 6
+
+# Embedded column charts are 4x2.5in PNGs scaled to this size (mm)
+FIGURE_WIDTH = 80
+FIGURE_HEIGHT = 50
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+def profile_fingerprint(profile, figures=None, drift=None):
+    payload = json.dumps(_normalize([profile, drift]), sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode('utf-8'))
+    for col in sorted(figures or {}, key=str):
+        digest.update(str(col).encode('utf-8'))
+        digest.update(hashlib.sha256(figures[col]).digest())
+    return digest.hexdigest()
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _ensure_space(pdf, height):
+    if pdf.get_y() + height > pdf.page_break_trigger:
+        pdf.add_page()
+
+def _write_overview(pdf, profile):
     pdf.set_font("Arial", 'B', 16)
     pdf.cell(0, 10, "Data Quality Report", 0, 1, 'C')
     pdf.ln(10)
-    
+
     pdf.set_font("Arial", 'B', 12)
     pdf.cell(0, 10, "Dataset Overview", 0, 1)
     pdf.set_font("Arial", '', 10)
@@ -17,40 +60,137 @@ def create_quality_report(profile):
     pdf.cell(0, 6, f"Missing Values: {profile['missing_values']}", 0, 1)
     pdf.cell(0, 6, f"Duplicate Rows: {profile['duplicates']}", 0, 1)
     pdf.ln(5)
-    
+
     pdf.set_font("Arial", 'B', 12)
     pdf.cell(0, 10, "Data Types", 0, 1)
     for dtype, count in profile['dtypes'].items():
         pdf.set_font("Arial", '', 10)
         pdf.cell(0, 6, f"{dtype}: {count} columns", 0, 1)
     pdf.ln(5)
+
+def _write_figure(pdf, figure_path):
+    if figure_path:
+        pdf.image(figure_path, x=pdf.l_margin + 10, w=FIGURE_WIDTH, h=FIGURE_HEIGHT)
+        pdf.ln(2)
+
+def _write_numeric_column(pdf, col, stats, figure_path=None):
+    _ensure_space(pdf, NUMERIC_BLOCK_HEIGHT + (FIGURE_HEIGHT if figure_path else 0))
+    pdf.set_font("Arial", 'B', 10)
+    pdf.cell(0, 6, f"Column: {col}", 0, 1)
+    pdf.set_font("Arial", '', 9)
+    pdf.cell(0, 5, f"Min: {stats['min']:.2f}, Max: {stats['max']:.2f}, Mean: {stats['mean']:.2f}, Median: {stats['median']:.2f}", 0, 1)
+    pdf.cell(0, 5, f"Std Dev: {stats['std']:.2f}, Skew: {stats['skew']:.2f}, Kurtosis: {stats['kurtosis']:.2f}", 0, 1)
+    pdf.cell(0, 5, f"Zeros: {stats['zeros']}, Missing: {stats['missing']}", 0, 1)
+    _write_figure(pdf, figure_path)
+    pdf.ln(3)
+
+def _write_categorical_column(pdf, col, stats, figure_path=None):
+    height = CATEGORICAL_BLOCK_HEIGHT + 5 * len(stats['top_values'])
+    _ensure_space(pdf, height + (FIGURE_HEIGHT if figure_path else 0))
+    pdf.set_font("Arial", 'B', 10)
+    pdf.cell(0, 6, f"Column: {col}", 0, 1)
+    pdf.set_font("Arial", '', 9)
+    pdf.cell(0, 5, f"Unique Values: {stats['unique']}, Missing: {stats['missing']}", 0, 1)
+    pdf.cell(0, 5, "Top Values:", 0, 1)
+    for value, count in stats['top_values'].items():
+        pdf.cell(20)
+        pdf.cell(0, 5, f"{value}: {count}", 0, 1)
+    _write_figure(pdf, figure_path)
+    pdf.ln(3)
+
+def _write_column_section(pdf, title, column_stats, write_column, figures, figure_dir):
+    if not column_stats:
+        return
+    _ensure_space(pdf, 10 + NUMERIC_BLOCK_HEIGHT)
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, title, 0, 1)
+    for batch in _batches(column_stats.items(), COLUMN_BATCH_SIZE):
+        # PyFPDF only embeds images from a path; the batch's PNGs are removed once it is laid out
+        # PyFPDF caches images by file name, so names continue from the images already embedded
+        figure_paths = {}
+        for col, _ in batch:
+            if col in figures:
+                figure_paths[col] = os.path.join(figure_dir, f"figure_{len(pdf.images) + len(figure_paths)}.png")
+                with open(figure_paths[col], 'wb') as f:
+                    f.write(figures[col])
+        try:
+            for col, stats in batch:
+                write_column(pdf, col, stats, figure_paths.get(col))
+        finally:
+            for path in figure_paths.values():
+                os.remove(path)
+
+def _format_number(value, pattern):
+    return "-" if value is None else format(value, pattern)
+
+def _write_drift_section(pdf, drift):
+    _ensure_space(pdf, 10 + DRIFT_ROW_HEIGHT * 4)
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 10, "Drift Against Baseline", 0, 1)
+    pdf.set_font("Arial", '', 10)
+    pdf.cell(0, 6, f"Baseline rows: {drift['baseline_rows']}, Current rows: {drift['current_rows']}", 0, 1)
+    if drift['added_columns']:
+        pdf.multi_cell(0, 6, f"Added columns: {', '.join(map(str, drift['added_columns']))}")
+    if drift['removed_columns']:
+        pdf.multi_cell(0, 6, f"Removed columns: {', '.join(map(str, drift['removed_columns']))}")
+    for col, (old, new) in drift['dtype_changes'].items():
+        pdf.cell(0, 6, f"{col}: type changed from {old} to {new}", 0, 1)
+    pdf.ln(3)
+
+    headers = ["Column", "Status", "PSI", "KS", "Nulls (base -> now)", "Distinct (base -> now)"]
+    widths = [50, 20, 18, 18, 40, 44]
+    pdf.set_font("Arial", 'B', 9)
+    for header, width in zip(headers, widths):
+        pdf.cell(width, DRIFT_ROW_HEIGHT, header, 1)
+    pdf.ln()
+    pdf.set_font("Arial", '', 9)
+    for column in drift['columns']:
+        _ensure_space(pdf, DRIFT_ROW_HEIGHT)
+        row = [str(column['column'])[:28], column['status'], _format_number(column['psi'], '.3f'),
+               _format_number(column['ks'], '.3f'),
+               f"{column['null_rate_baseline']:.1%} -> {column['null_rate_current']:.1%}",
+               f"{column['distinct_baseline']} -> {column['distinct_current']}"]
+        for value, width in zip(row, widths):
+            pdf.cell(width, DRIFT_ROW_HEIGHT, value, 1)
+        pdf.ln()
+    pdf.ln(5)
+
+def _pdf_bytes(pdf):
+    # PyFPDF returns a latin-1 str for dest='S', fpdf2 returns a bytearray
+    output = pdf.output(dest='S')
+    if isinstance(output, str):
+        output = output.encode('latin-1')
+    return bytes(output)
+
+def build_quality_report(profile, figures=None, drift=None):
+    from fpdf import FPDF
     
-    if profile['numeric_stats']:
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(0, 10, "Numeric Columns Analysis", 0, 1)
-        for col, stats in profile['numeric_stats'].items():
-            pdf.set_font("Arial", 'B', 10)
-            pdf.cell(0, 6, f"Column: {col}", 0, 1)
-            pdf.set_font("Arial", '', 9)
-            pdf.cell(0, 5, f"Min: {stats['min']:.2f}, Max: {stats['max']:.2f}, Mean: {stats['mean']:.2f}, Median: {stats['median']:.2f}", 0, 1)
-            pdf.cell(0, 5, f"Std Dev: {stats['std']:.2f}, Skew: {stats['skew']:.2f}, Kurtosis: {stats['kurtosis']:.2f}", 0, 1)
-            pdf.cell(0, 5, f"Zeros: {stats['zeros']}, Missing: {stats['missing']}", 0, 1)
-            pdf.ln(3)
-    
-    if profile['categorical_stats']:
-        pdf.set_font("Arial", 'B', 12)
-        pdf.cell(0, 10, "Categorical Columns Analysis", 0, 1)
-        for col, stats in profile['categorical_stats'].items():
-            pdf.set_font("Arial", 'B', 10)
-            pdf.cell(0, 6, f"Column: {col}", 0, 1)
-            pdf.set_font("Arial", '', 9)
-            pdf.cell(0, 5, f"Unique Values: {stats['unique']}, Missing: {stats['missing']}", 0, 1)
-            pdf.cell(0, 5, "Top Values:", 0, 1)
-            for value, count in stats['top_values'].items():
-                pdf.cell(20)
-                pdf.cell(0, 5, f"{value}: {count}", 0, 1)
-            pdf.ln(3)
-    
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-    pdf.output(temp_file.name)
-    return temp_file.name
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    _write_overview(pdf, profile)
+    if drift:
+        _write_drift_section(pdf, drift)
+
+    with tempfile.TemporaryDirectory() as figure_dir:
+        _write_column_section(pdf, "Numeric Columns Analysis", profile['numeric_stats'],
+                              _write_numeric_column, figures or {}, figure_dir)
+        _write_column_section(pdf, "Categorical Columns Analysis", profile['categorical_stats'],
+                              _write_categorical_column, figures or {}, figure_dir)
+        return _pdf_bytes(pdf)
+
+def create_quality_report(profile, figures=None, use_cache=True, drift=None):
+    # drift is a compare_sketches result to include as a section after the overview
+    if not use_cache:
+        return build_quality_report(profile, figures, drift)
+
+    key = profile_fingerprint(profile, figures, drift)
+    if key in _report_cache:
+        _report_cache.move_to_end(key)
+        return _report_cache[key]
+
+    pdf_bytes = build_quality_report(profile, figures, drift)
+    _report_cache[key] = pdf_bytes
+    while len(_report_cache) > REPORT_CACHE_SIZE:
+        _report_cache.popitem(last=False)
+    return pdf_bytes
@@ -0,0 +1,459 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import pandas as pd
+import numpy as np
+from parallel import MAX_WORKERS
+from session_manager import MB
+from versioning import copy_on_write_enabled
+from incremental import OPERATIONS, pipeline_step, run_step, new_pipeline, add_step, copy_pipeline, append_rows
+from transformations import run_sql_query
+from profiling import generate_data_profile
+from reporting import create_quality_report
+from exports import export_chunks, export_excel
+
+# The service binds to localhost unless told otherwise; it runs arbitrary cleaning steps on request
+SERVICE_HOST = os.environ.get('NEATSHEET_SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.environ.get('NEATSHEET_SERVICE_PORT', 8765))
+# Threads for parsing, cleaning, profiling and serializing; the event loop only moves bytes
+SERVICE_WORKERS = int(os.environ.get('NEATSHEET_SERVICE_WORKERS', MAX_WORKERS))
+# Parsed frames and profiles stay warm across requests up to this much memory
+SERVICE_CACHE_BUDGET = int(os.environ.get('NEATSHEET_SERVICE_CACHE_MB', 2048)) * MB
+MAX_UPLOAD_BYTES = int(os.environ.get('NEATSHEET_SERVICE_MAX_UPLOAD_MB', 1024)) * MB
+# Uploads are buffered in memory up to this size, then on disk
+UPLOAD_SPOOL_BYTES = 64 * MB
+# Pipeline results evicted from the cache keep their lineage so they can be rebuilt; the oldest
+# are forgotten beyond this many
+SERVICE_LINEAGE_LIMIT = int(os.environ.get('NEATSHEET_SERVICE_LINEAGE_LIMIT', 1000))
+
+UPLOAD_FORMATS = {
+    'csv': pd.read_csv,
+    'xlsx': pd.read_excel,
+    'json': pd.read_json,
+    'parquet': pd.read_parquet,
+}
+EXPORT_FORMATS = {'csv': 'text/csv', 'json': 'application/json',
+                  'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'}
+
+# Pipeline steps accepted over HTTP. Custom transformations evaluate Python expressions,
+# so they are only available in the app. SQL queries run on a DuckDB connection without
+# file, network or extension access (see transformations.run_sql_query).
+SERVICE_OPERATIONS = sorted([name for name in OPERATIONS if name != 'apply_custom_transformation']
+                            + ['run_sql_query'])
+
+class DatasetNotFound(LookupError):
+    pass
+
+def _jsonable(value):
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+class WarmCache:
+    # LRU of parsed frames and profiles shared by all requests. Concurrent requests for a
+    # value that is still being computed wait for the same computation.
+    def __init__(self, budget=SERVICE_CACHE_BUDGET, on_evict=None):
+        self.budget = budget
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key][0]
+
+    def put(self, key, value, size):
+        self._entries[key] = (value, size)
+        self._entries.move_to_end(key)
+        # The newest entry is kept even when it alone exceeds the budget
+        while len(self._entries) > 1 and self.memory_usage() > self.budget:
+            evicted, _ = self._entries.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(evicted)
+
+    def pop(self, key):
+        self._entries.pop(key, None)
+
+    def memory_usage(self):
+        return sum(size for _, size in self._entries.values())
+
+    async def get_or_compute(self, key, compute):
+        # compute() returns (value, size); get_or_compute returns (value, cached)
+        if key in self._entries:
+            return self.get(key), True
+        if key in self._pending:
+            self.hits += 1
+            return (await asyncio.shield(self._pending[key]))[0], True
+        self.misses += 1
+        task = asyncio.ensure_future(compute())
+        self._pending[key] = task
+        try:
+            value, size = await asyncio.shield(task)
+        finally:
+            self._pending.pop(key, None)
+        self.put(key, value, size)
+        return value, False
+
+def _deep_size(obj, seen):
+    # Fitted state holds arrays, frames, dicts and estimators (e.g. KNNImputer keeps its training
+    # rows); objects shared between pipeline copies are counted once
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(_deep_size(value, seen) for value in obj)
+    if hasattr(obj, '__dict__') and not isinstance(obj, type):
+        return sys.getsizeof(obj) + _deep_size(vars(obj), seen)
+    return sys.getsizeof(obj)
+
+def _entry_size(entry):
+    # Runs in the executor: deep memory usage walks every string in the frame
+    steps = entry['pipeline']['steps'] if entry.get('pipeline') else []
+    return _deep_size(entry['df'], set()) + _deep_size([step['state'] for step in steps], set())
+
+def _parse_upload(spool, fmt):
+    spool.seek(0)
+    try:
+        return UPLOAD_FORMATS[fmt](spool)
+    finally:
+        spool.close()
+
+def _apply_steps(df, pipeline, steps):
+    # Replayable steps keep their fitted state in the pipeline, so new rows can be appended later
+    df = df.copy(deep=not copy_on_write_enabled())
+    report = []
+    for spec in steps:
+        operation, args, kwargs = spec['operation'], spec.get('args', []), spec.get('kwargs', {})
+        if operation == 'run_sql_query':
+            df, line = run_sql_query(df, *args, **kwargs)
+            pipeline = add_step(pipeline, None, line)
+        else:
+            step = pipeline_step(operation, *args, **kwargs)
+            df, line = run_step(df, step)
+            pipeline = add_step(pipeline, step, line)
+        report.extend(line.splitlines() if line else [])
+    return df, pipeline, report
+
+def _steps_from_body(body):
+    steps = body.get('steps') if isinstance(body, dict) else None
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("The request body needs a non-empty 'steps' list")
+    for spec in steps:
+        if not isinstance(spec, dict) or spec.get('operation') not in SERVICE_OPERATIONS:
+            raise ValueError(f"Each step needs an 'operation', one of: {', '.join(SERVICE_OPERATIONS)}")
+        if not isinstance(spec.get('args', []), list) or not isinstance(spec.get('kwargs', {}), dict):
+            raise ValueError("Step 'args' must be a list and 'kwargs' an object")
+    return steps
+
+class CleaningService:
+    def __init__(self, workers=SERVICE_WORKERS, cache_budget=SERVICE_CACHE_BUDGET):
+        self.executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='neatsheet-service')
+        self.cache = WarmCache(cache_budget, on_evict=self._evicted)
+        # Small metadata for every dataset that can still be served; pipeline results keep their
+        # lineage so an evicted frame can be rebuilt from its parent
+        self.datasets = {}
+        self._rebuildable = OrderedDict()
+
+    def _evicted(self, key):
+        kind, dataset_id = key
+        meta = self.datasets.get(dataset_id)
+        if kind != 'frame' or meta is None:
+            return
+        # Uploads and appended rows aren't kept once evicted; pipeline results are rebuilt on demand
+        if meta['steps'] is None or meta['parent'] not in self.datasets:
+            self._forget(dataset_id)
+            return
+        self._rebuildable[dataset_id] = None
+        while len(self._rebuildable) > SERVICE_LINEAGE_LIMIT:
+            self._forget(next(iter(self._rebuildable)))
+
+    def _forget(self, dataset_id):
+        # Evicted descendants were only reachable through this dataset, so they go with it
+        self.datasets.pop(dataset_id, None)
+        self._rebuildable.pop(dataset_id, None)
+        self.cache.pop(('profile', dataset_id))
+        for child, meta in list(self.datasets.items()):
+            if meta['parent'] == dataset_id and ('frame', child) not in self.cache:
+                self._forget(child)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def describe(self, dataset_id):
+        meta = self.datasets[dataset_id]
+        return {'id': dataset_id, **{k: v for k, v in meta.items() if k != 'steps'},
+                'in_memory': ('frame', dataset_id) in self.cache}
+
+    async def frame(self, dataset_id):
+        entry = self.cache.get(('frame', dataset_id))
+        if entry is not None:
+            return entry
+        meta = self.datasets.get(dataset_id)
+        if meta is None or meta.get('steps') is None:
+            raise DatasetNotFound(f"Dataset '{dataset_id}' is not loaded; upload it again")
+        entry, _ = await self.run_pipeline(meta['parent'], meta['steps'])
+        return entry
+
+    async def _spool(self, request):
+        # The body is read as it arrives and hashed on the way, so identical uploads hit the cache
+        spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+        digest = hashlib.sha256()
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                spool.close()
+                raise ValueError(f"Upload is larger than {MAX_UPLOAD_BYTES // MB} MB")
+            digest.update(chunk)
+            spool.write(chunk)
+        if not size:
+            spool.close()
+            raise ValueError("The request body is empty")
+        return spool, digest.hexdigest()
+
+    def _upload_format(self, request):
+        name = request.query_params.get('name', 'upload')
+        fmt = request.query_params.get('format') or os.path.splitext(name)[1].lstrip('.').lower() or 'csv'
+        if fmt not in UPLOAD_FORMATS:
+            raise ValueError(f"Unknown upload format '{fmt}'; use one of {', '.join(UPLOAD_FORMATS)}")
+        return name, fmt
+
+    async def upload(self, request):
+        name, fmt = self._upload_format(request)
+        spool, content_hash = await self._spool(request)
+        dataset_id = _digest(content_hash, fmt)
+
+        async def parse():
+            df = await self._run(_parse_upload, spool, fmt)
+            entry = {'df': df, 'pipeline': new_pipeline(df)}
+            return entry, await self._run(_entry_size, entry)
+
+        entry, cached = await self.cache.get_or_compute(('frame', dataset_id), parse)
+        if cached:
+            spool.close()
+        df = entry['df']
+        self.datasets.setdefault(dataset_id, {'name': name, 'parent': None, 'steps': None})
+        self.datasets[dataset_id].update({'rows': len(df), 'columns': df.columns.astype(str).tolist()})
+        return {**self.describe(dataset_id), 'cached': cached}
+
+    async def run_pipeline(self, parent_id, steps):
+        dataset_id = _digest(parent_id, json.dumps(steps, sort_keys=True, default=str))
+        if parent_id not in self.datasets:
+            raise DatasetNotFound(f"Dataset '{parent_id}' is not loaded; upload it again")
+        # The parent may be evicted (and forgotten) when the result is cached
+        name = self.datasets[parent_id]['name']
+
+        async def compute():
+            parent = await self.frame(parent_id)
+            df, pipeline, report = await self._run(_apply_steps, parent['df'], parent['pipeline'], steps)
+            entry = {'df': df, 'pipeline': pipeline, 'report': report}
+            return entry, await self._run(_entry_size, entry)
+
+        entry, cached = await self.cache.get_or_compute(('frame', dataset_id), compute)
+        self._rebuildable.pop(dataset_id, None)
+        df = entry['df']
+        self.datasets[dataset_id] = {'name': name, 'parent': parent_id,
+                                     'steps': steps, 'rows': len(df), 'columns': df.columns.astype(str).tolist()}
+        return entry, {**self.describe(dataset_id), 'report': entry['report'], 'cached': cached}
+
+    async def append(self, dataset_id, request):
+        entry = await self.frame(dataset_id)
+        parent = self.datasets[dataset_id]
+        name, fmt = self._upload_format(request)
+        spool, content_hash = await self._spool(request)
+        delta = await self._run(_parse_upload, spool, fmt)
+        pipeline = copy_pipeline(entry['pipeline'])
+        df, report = await self._run(append_rows, entry['df'], delta, pipeline)
+        appended_id = _digest(dataset_id, content_hash, fmt)
+        # Appended rows aren't kept, so this frame can't be rebuilt once evicted
+        appended = {'df': df, 'pipeline': pipeline, 'report': report.splitlines()}
+        self.cache.put(('frame', appended_id), appended, await self._run(_entry_size, appended))
+        self.datasets[appended_id] = {'name': parent['name'], 'parent': dataset_id,
+                                      'steps': None, 'rows': len(df), 'columns': df.columns.astype(str).tolist()}
+        return {**self.describe(appended_id), 'report': report.splitlines()}
+
+    async def profile(self, dataset_id):
+        async def compute():
+            entry = await self.frame(dataset_id)
+            profile = await self._run(generate_data_profile, entry['df'])
+            return profile, await self._run(lambda: len(json.dumps(_jsonable(profile))))
+
+        profile, _ = await self.cache.get_or_compute(('profile', dataset_id), compute)
+        return profile
+
+    async def report(self, dataset_id):
+        # PDF bytes are cached by reporting itself, keyed by the profile
+        return await self._run(create_quality_report, await self.profile(dataset_id))
+
+    async def export(self, df, fmt):
+        if fmt == 'xlsx':
+            yield await self._run(export_excel, df)
+            return
+        # Each chunk is serialized in the pool and sent before the next one is built
+        chunks = export_chunks(df, fmt)
+        while True:
+            chunk = await self._run(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+
+    def delete(self, dataset_id):
+        if dataset_id not in self.datasets:
+            raise DatasetNotFound(f"Unknown dataset '{dataset_id}'")
+        self.cache.pop(('frame', dataset_id))
+        self._forget(dataset_id)
+
+    def health(self):
+        return {'status': 'ok', 'datasets': len(self.datasets),
+                'cache_mb': round(self.cache.memory_usage() / MB, 1),
+                'cache_hits': self.cache.hits, 'cache_misses': self.cache.misses}
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+def create_app(workers=SERVICE_WORKERS, cache_budget=SERVICE_CACHE_BUDGET):
+    try:
+        from starlette.applications import Starlette
+        from starlette.responses import JSONResponse, Response, StreamingResponse
+        from starlette.routing import Route
+    except ImportError:
+        raise ImportError("The cleaning service needs the starlette package (pip install starlette uvicorn)")
+
+    service = CleaningService(workers, cache_budget)
+
+    def dataset_id(request):
+        value = request.path_params['dataset_id']
+        if value not in service.datasets:
+            raise DatasetNotFound(f"Unknown dataset '{value}'")
+        return value
+
+    async def health(request):
+        return JSONResponse(service.health())
+
+    async def list_datasets(request):
+        return JSONResponse([service.describe(key) for key in service.datasets])
+
+    async def upload(request):
+        return JSONResponse(await service.upload(request), status_code=201)
+
+    async def describe(request):
+        key = dataset_id(request)
+        result = service.describe(key)
+        rows = int(request.query_params.get('rows', 0))
+        if rows:
+            entry = await service.frame(key)
+            result['preview'] = json.loads(entry['df'].head(rows).to_json(orient='records', date_format='iso'))
+        return JSONResponse(result)
+
+    async def delete(request):
+        service.delete(dataset_id(request))
+        return Response(status_code=204)
+
+    async def pipeline(request):
+        key = dataset_id(request)
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            raise ValueError("The request body must be JSON")
+        _, result = await service.run_pipeline(key, _steps_from_body(body))
+        return JSONResponse(result, status_code=201)
+
+    async def append(request):
+        return JSONResponse(await service.append(dataset_id(request), request), status_code=201)
+
+    async def profile(request):
+        return JSONResponse(_jsonable(await service.profile(dataset_id(request))))
+
+    async def report(request):
+        pdf_bytes = await service.report(dataset_id(request))
+        return Response(pdf_bytes, media_type='application/pdf')
+
+    async def export(request):
+        key = dataset_id(request)
+        fmt = request.query_params.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}'; use one of {', '.join(EXPORT_FORMATS)}")
+        entry = await service.frame(key)
+        filename = f"{os.path.splitext(service.datasets[key]['name'])[0]}_cleaned.{fmt}"
+        return StreamingResponse(service.export(entry['df'], fmt), media_type=EXPORT_FORMATS[fmt],
+                                 headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+    async def not_found(request, exc):
+        return JSONResponse({'error': str(exc.args[0] if exc.args else exc)}, status_code=404)
+
+    async def bad_request(request, exc):
+        return JSONResponse({'error': str(exc)}, status_code=400)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        service.close()
+
+    routes = [
+        Route('/health', health),
+        Route('/datasets', list_datasets, methods=['GET']),
+        Route('/datasets', upload, methods=['POST']),
+        Route('/datasets/{dataset_id}', describe, methods=['GET']),
+        Route('/datasets/{dataset_id}', delete, methods=['DELETE']),
+        Route('/datasets/{dataset_id}/pipeline', pipeline, methods=['POST']),
+        Route('/datasets/{dataset_id}/append', append, methods=['POST']),
+        Route('/datasets/{dataset_id}/profile', profile),
+        Route('/datasets/{dataset_id}/report', report),
+        Route('/datasets/{dataset_id}/export', export),
+    ]
+    handlers = {DatasetNotFound: not_found, ValueError: bad_request, KeyError: bad_request, TypeError: bad_request}
+    app = Starlette(routes=routes, exception_handlers=handlers, lifespan=lifespan)
+    app.state.service = service
+    return app
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve NeatSheet cleaning operations over HTTP.")
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--workers', type=int, default=SERVICE_WORKERS, help="Threads for CPU-bound steps")
+    parser.add_argument('--cache-mb', type=int, default=SERVICE_CACHE_BUDGET // MB)
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        raise ImportError("The cleaning service needs the uvicorn package (pip install starlette uvicorn)")
+    uvicorn.run(create_app(args.workers, args.cache_mb * MB), host=args.host, port=args.port)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+import pandas as pd
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from versioning import write_frame_parquet, read_frame_parquet, buffer_key
+
+MB = 1024 ** 2
+
+logger = logging.getLogger(__name__)
+
+# Budgets can be tuned per deployment through the environment
+DEFAULT_SESSION_BUDGET = int(os.environ.get('NEATSHEET_SESSION_BUDGET_MB', 1024)) * MB
+DEFAULT_GLOBAL_BUDGET = int(os.environ.get('NEATSHEET_GLOBAL_BUDGET_MB', 4096)) * MB
+DEFAULT_IDLE_SECONDS = int(os.environ.get('NEATSHEET_IDLE_SECONDS', 300))
+DEFAULT_SESSION_TTL = int(os.environ.get('NEATSHEET_SESSION_TTL', 24 * 3600))
+
+class SessionBudgetExceeded(MemoryError):
+    pass
+
+def _column_sizeof(values, seen):
+    key = buffer_key(values)
+    if key is not None:
+        if key in seen:
+            return 0
+        seen.add(key)
+    return int(pd.Series(values, copy=False).memory_usage(deep=True, index=False))
+
+def _index_sizeof(index, seen):
+    if id(index) in seen:
+        return 0
+    seen.add(id(index))
+    return int(index.memory_usage(deep=True))
+
+def deep_sizeof(obj, seen=None):
+    # seen collects the column buffers and indexes already counted, so frames that share them
+    # (the working frame, pooled versions, pipeline state, the query index) are sized once.
+    # Objects that hold frames list them in memory_parts(); plain numbers there are byte counts.
+    seen = set() if seen is None else seen
+    if obj is None:
+        return 0
+    if isinstance(obj, pd.DataFrame):
+        return (sum(_column_sizeof(obj.iloc[:, i].values, seen) for i in range(obj.shape[1]))
+                + _index_sizeof(obj.index, seen))
+    if isinstance(obj, pd.Series):
+        return _column_sizeof(obj.values, seen) + _index_sizeof(obj.index, seen)
+    if isinstance(obj, pd.Index):
+        return _index_sizeof(obj, seen)
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if hasattr(obj, 'memory_parts'):
+        return sum(part if isinstance(part, int) else deep_sizeof(part, seen) for part in obj.memory_parts())
+    if hasattr(obj, 'memory_usage'):
+        return int(obj.memory_usage())
+    # Snapshots, since other threads may be adding entries while a budget check walks them
+    if isinstance(obj, dict):
+        return sum(deep_sizeof(value, seen) for value in list(obj.values()))
+    if isinstance(obj, (list, tuple)):
+        return sum(deep_sizeof(value, seen) for value in list(obj))
+    return sys.getsizeof(obj)
+
+class SessionData:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.frames = {}
+        self.frame_sizes = {}
+        self.spilled = {}
+        self.artifacts = {}
+        self.last_access = time.time()
+        self.spill_error = None
+
+    def memory_usage(self):
+        # Frames first, so buffers the artifacts share with them are counted as frame memory
+        seen = set()
+        frames = sum(deep_sizeof(df, seen) for df in list(self.frames.values()))
+        return frames + sum(deep_sizeof(obj, seen) for obj in list(self.artifacts.values()))
+
+class SessionDataManager:
+    def __init__(self, session_budget=DEFAULT_SESSION_BUDGET, global_budget=DEFAULT_GLOBAL_BUDGET,
+                 idle_seconds=DEFAULT_IDLE_SECONDS, session_ttl=DEFAULT_SESSION_TTL, spill_dir=None):
+        self.session_budget = session_budget
+        self.global_budget = global_budget
+        self.idle_seconds = idle_seconds
+        self.session_ttl = session_ttl
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix='neatsheet_sessions_')
+        self.sessions = {}
+        self._lock = threading.RLock()
+
+    def _session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = SessionData(session_id)
+        session.last_access = time.time()
+        return session
+
+    # ----- frames -----
+    def put_frame(self, session_id, name, df, strict=False):
+        with self._lock:
+            session = self._session(session_id)
+            if df is not None and session.frames.get(name) is df:
+                return
+            size = deep_sizeof(df)
+            if strict and size > self.session_budget:
+                raise SessionBudgetExceeded(
+                    f"Dataset needs {size / MB:.1f} MB but the per-session limit is {self.session_budget / MB:.0f} MB")
+            self._discard_spill(session, name)
+            session.frames[name] = df
+            session.frame_sizes[name] = size
+            self._enforce_budgets(session)
+
+    def get_frame(self, session_id, name):
+        with self._lock:
+            session = self._session(session_id)
+            if name in session.spilled:
+                path, columns = session.spilled.pop(name)
+                session.frames[name] = read_frame_parquet(path, columns)
+                session.frame_sizes[name] = deep_sizeof(session.frames[name])
+                os.unlink(path)
+                self._enforce_budgets(session)
+            return session.frames.get(name)
+
+    # ----- artifacts -----
+    def put_artifact(self, session_id, name, obj):
+        with self._lock:
+            session = self._session(session_id)
+            session.artifacts[name] = obj
+            self._enforce_budgets(session)
+
+    def get_artifact(self, session_id, name, default=None):
+        with self._lock:
+            return self._session(session_id).artifacts.get(name, default)
+
+    # ----- budgets and spilling -----
+    def _discard_spill(self, session, name):
+        if name in session.spilled:
+            path, _ = session.spilled.pop(name)
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def _spill_frame(self, session, name):
+        df = session.frames.get(name)
+        if df is None:
+            return
+        path = os.path.join(self.spill_dir, f"{session.session_id}_{len(session.spilled)}_{time.time_ns()}.parquet")
+        try:
+            session.spilled[name] = (path, write_frame_parquet(df, path))
+        except Exception:
+            if os.path.exists(path):
+                os.unlink(path)
+            raise
+        session.frames[name] = None
+        session.frame_sizes[name] = 0
+
+    def _spill_session(self, session, keep_frames=False):
+        for obj in session.artifacts.values():
+            if hasattr(obj, 'spill_all'):
+                obj.spill_all()
+        if not keep_frames:
+            for name in list(session.frames):
+                self._spill_frame(session, name)
+
+    def _enforce_budgets(self, active):
+        # The active session first gives up its history, then idle sessions are spilled least recent first
+        if active.memory_usage() > self.session_budget:
+            self._spill_session(active, keep_frames=True)
+
+        self._expire_sessions(active)
+        now = time.time()
+        for session in sorted(self.sessions.values(), key=lambda s: s.last_access):
+            if self.total_bytes() <= self.global_budget:
+                break
+            if session is active or now - session.last_access < self.idle_seconds:
+                continue
+            # Spilling runs inside whichever session's rerun crossed the budget, so a session whose
+            # data can't be written is logged and left in memory instead of failing that rerun
+            try:
+                self._spill_session(session)
+            except Exception as e:
+                session.spill_error = f"{type(e).__name__}: {e}"
+                logger.warning("Could not spill session %s: %s", session.session_id[:8], session.spill_error)
+
+    def _expire_sessions(self, active):
+        now = time.time()
+        for session_id, session in list(self.sessions.items()):
+            if session is not active and now - session.last_access > self.session_ttl:
+                self._drop(session_id)
+
+    def total_bytes(self):
+        return sum(session.memory_usage() for session in self.sessions.values())
+
+    def drop_session(self, session_id):
+        with self._lock:
+            self._drop(session_id)
+
+    def _drop(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        for name in list(session.spilled):
+            self._discard_spill(session, name)
+        for obj in session.artifacts.values():
+            if hasattr(obj, 'close'):
+                obj.close()
+
+    # ----- admin view -----
+    def usage(self):
+        with self._lock:
+            now = time.time()
+            rows = []
+            for session in self.sessions.values():
+                frames = sum(session.frame_sizes.values())
+                rows.append({
+                    'session': session.session_id[:8],
+                    'frames_mb': round(frames / MB, 2),
+                    'artifacts_mb': round((session.memory_usage() - frames) / MB, 2),
+                    'spilled_frames': len(session.spilled),
+                    'idle_seconds': int(now - session.last_access),
+                    'spill_error': session.spill_error,
+                })
+            return rows
+
+    def close(self):
+        with self._lock:
+            for session_id in list(self.sessions):
+                self._drop(session_id)
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
@@ -0,0 +1,482 @@
+import pandas as pd
+import numpy as np
+import copy
+import json
+
+# Frames are summarized in row chunks, so a baseline file never has to be held in memory in full
+SKETCH_CHUNK_ROWS = 1_000_000
+# Items kept per level of a quantile sketch; rank error is roughly 1 / QUANTILE_SKETCH_SIZE
+QUANTILE_SKETCH_SIZE = 256
+# 2**HLL_PRECISION registers per distinct-count sketch, about 1.6% relative error
+HLL_PRECISION = 12
+# Most frequent values tracked per text column; rarer values are only counted in 'other'
+TOP_K_CAPACITY = 100
+
+# Population stability index bands: below the first is stable, above the second is drift
+PSI_BINS = 10
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# Null rate changes larger than this also flag a column
+NULL_RATE_TOLERANCE = 0.05
+PSI_FLOOR = 1e-4
+
+class QuantileSketch:
+    # Mergeable KLL-style compactor: levels[h] holds items that each stand for 2**h values.
+    # A full level is sorted and every other item is promoted, which keeps the sketch at
+    # about k items per level however many values it has seen.
+    def __init__(self, k=QUANTILE_SKETCH_SIZE, seed=0):
+        self.k = k
+        self.levels = []
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._add(0, values)
+        self._compress()
+
+    def merge(self, other):
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for level, items in enumerate(other.levels):
+            self._add(level, items)
+        self._compress()
+        return self
+
+    def _add(self, level, items):
+        while len(self.levels) <= level:
+            self.levels.append(np.empty(0))
+        self.levels[level] = np.concatenate([self.levels[level], items])
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.k:
+                items = np.sort(items)
+                # An odd item out stays behind; the rest are halved with a random offset
+                kept, pairs = items[:len(items) % 2], items[len(items) % 2:]
+                self.levels[level] = kept
+                self._add(level + 1, pairs[self._rng.integers(2)::2])
+            level += 1
+
+    def _weighted_items(self):
+        if not self.levels:
+            return np.empty(0), np.empty(0)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2.0 ** level)
+                                  for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def cdf(self, points):
+        # Fraction of values <= each point
+        items, weights = self._weighted_items()
+        if not len(items):
+            return np.full(len(np.atleast_1d(points)), np.nan)
+        cumulative = np.concatenate([[0.0], np.cumsum(weights)])
+        return cumulative[np.searchsorted(items, points, side='right')] / cumulative[-1]
+
+    def quantiles(self, fractions):
+        items, weights = self._weighted_items()
+        if not len(items):
+            return np.full(len(np.atleast_1d(fractions)), np.nan)
+        cumulative = np.cumsum(weights) / weights.sum()
+        positions = np.searchsorted(cumulative, fractions, side='left').clip(0, len(items) - 1)
+        result = items[positions]
+        # The extremes are tracked exactly
+        result = np.where(np.asarray(fractions) <= 0, self.min, result)
+        return np.where(np.asarray(fractions) >= 1, self.max, result)
+
+    def to_dict(self):
+        return {'k': self.k, 'count': self.count, 'min': _finite(self.min), 'max': _finite(self.max),
+                'levels': [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'])
+        sketch.count = data['count']
+        sketch.min = np.inf if data['min'] is None else data['min']
+        sketch.max = -np.inf if data['max'] is None else data['max']
+        sketch.levels = [np.asarray(items, dtype=float) for items in data['levels']]
+        return sketch
+
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8)
+
+    def update(self, values):
+        if not len(values):
+            return
+        hashes = pd.util.hash_array(np.asarray(values))
+        width = 64 - self.precision
+        buckets = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # Rank is the position of the first set bit in the remaining bits, counted from the top
+        rank = width - _bit_length(rest) + 1
+        np.maximum.at(self.registers, buckets, rank.astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(float))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': self.registers.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['precision'])
+        sketch.registers = np.asarray(data['registers'], dtype=np.uint8)
+        return sketch
+
+def _bit_length(values):
+    # Exact bit length of uint64 values; frexp is only exact below 2**53, so split into halves
+    high = (values >> np.uint64(32)).astype(float)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(float)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+def _finite(value):
+    return float(value) if np.isfinite(value) else None
+
+class TopValues:
+    # Counts of the most frequent values. Merging sums the counts and keeps the top capacity
+    # entries; a value dropped from one chunk and seen again later is undercounted.
+    def __init__(self, capacity=TOP_K_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.other = 0
+
+    def update(self, counts):
+        # Values outside the chunk's own top entries cannot overtake them, so only those are aligned
+        top = counts.nlargest(self.capacity)
+        self.other += int(counts.sum() - top.sum())
+        merged = pd.Series(self.counts, dtype=float).add(top.astype(float), fill_value=0)
+        self._truncate(merged)
+
+    def merge(self, other):
+        merged = pd.Series(self.counts, dtype=float).add(pd.Series(other.counts, dtype=float), fill_value=0)
+        self.other += other.other
+        self._truncate(merged)
+        return self
+
+    def _truncate(self, counts):
+        counts = counts.sort_values(ascending=False, kind='stable')
+        self.other += int(counts.iloc[self.capacity:].sum())
+        self.counts = {str(value): int(count) for value, count in counts.iloc[:self.capacity].items()}
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'counts': self.counts, 'other': self.other}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['capacity'])
+        sketch.counts = dict(data['counts'])
+        sketch.other = data['other']
+        return sketch
+
+def _column_kind(series):
+    if pd.api.types.is_bool_dtype(series):
+        return 'categorical'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    return 'categorical'
+
+def _numeric_values(series, kind):
+    # Datetimes are sketched as seconds since the epoch
+    if kind == 'datetime':
+        values = pd.to_datetime(series, errors='coerce')
+        if values.dt.tz is not None:
+            values = values.dt.tz_localize(None)
+        return ((values - pd.Timestamp(0)) / pd.Timedelta(seconds=1)).to_numpy(dtype=float, na_value=np.nan)
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+def _common_dtype(old, new):
+    # Chunks of one CSV can be read as int64 and float64; only numeric types are widened
+    if old == new:
+        return old
+    try:
+        old_dtype, new_dtype = np.dtype(old), np.dtype(new)
+    except TypeError:
+        return 'object'
+    if old_dtype.kind in 'iuf' and new_dtype.kind in 'iuf':
+        return str(np.promote_types(old_dtype, new_dtype))
+    return 'object'
+
+class ColumnSketch:
+    def __init__(self, kind, dtype):
+        self.dtype = dtype
+        self.rows = 0
+        self.nulls = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.distinct = HyperLogLog()
+        self._set_kind(kind)
+
+    def _set_kind(self, kind):
+        self.kind = kind
+        self.quantiles = QuantileSketch() if kind != 'categorical' else None
+        self.top = TopValues() if kind == 'categorical' else None
+
+    def update(self, series):
+        # The kind is fixed by the first chunk with values; later chunks are coerced to it, so text
+        # in a numeric column counts as missing. A chunk holding only missing values is read as
+        # float, so a sketch that has seen nothing else takes the kind of the next chunk with values.
+        if self.rows == self.nulls and series.notna().any():
+            kind = _column_kind(series)
+            if kind != self.kind:
+                self._set_kind(kind)
+        self.dtype = _common_dtype(self.dtype, str(series.dtype))
+        self.rows += len(series)
+        if self.kind == 'categorical':
+            self.nulls += int(series.isna().sum())
+            counts = series.dropna().astype(str).value_counts(sort=False)
+            self.top.update(counts)
+            self.distinct.update(counts.index.to_numpy(dtype=object))
+            return
+        values = _numeric_values(series, self.kind)
+        values = values[~np.isnan(values)]
+        self.nulls += len(series) - len(values)
+        self.total += float(values.sum())
+        self.total_sq += float(np.dot(values, values))
+        self.quantiles.update(values)
+        self.distinct.update(values)
+
+    def merge(self, other):
+        if other.kind != self.kind:
+            # A chunk holding only missing values is read as float, so an all-missing side
+            # takes the kind of the other
+            if other.rows == other.nulls:
+                self.dtype = _common_dtype(self.dtype, other.dtype)
+                self.rows += other.rows
+                self.nulls += other.nulls
+                return self
+            if self.rows != self.nulls:
+                raise ValueError(f"Cannot merge a {other.kind} sketch into a {self.kind} sketch")
+            self._set_kind(other.kind)
+        self.dtype = _common_dtype(self.dtype, other.dtype)
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.distinct.merge(other.distinct)
+        if self.quantiles is not None:
+            self.quantiles.merge(other.quantiles)
+        if self.top is not None:
+            self.top.merge(other.top)
+        return self
+
+    @property
+    def null_rate(self):
+        return self.nulls / self.rows if self.rows else 0.0
+
+    @property
+    def mean(self):
+        count = self.rows - self.nulls
+        return self.total / count if count and self.kind != 'categorical' else None
+
+    @property
+    def std(self):
+        # Population standard deviation from the running sums
+        count = self.rows - self.nulls
+        if not count or self.kind == 'categorical':
+            return None
+        return float(np.sqrt(max(self.total_sq / count - (self.total / count) ** 2, 0.0)))
+
+    def to_dict(self):
+        return {
+            'kind': self.kind, 'dtype': self.dtype, 'rows': self.rows, 'nulls': self.nulls, 'total': self.total,
+            'total_sq': self.total_sq,
+            'distinct': self.distinct.to_dict(),
+            'quantiles': self.quantiles.to_dict() if self.quantiles is not None else None,
+            'top': self.top.to_dict() if self.top is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['kind'], data['dtype'])
+        sketch.rows, sketch.nulls, sketch.total = data['rows'], data['nulls'], data['total']
+        sketch.total_sq = data['total_sq']
+        sketch.distinct = HyperLogLog.from_dict(data['distinct'])
+        if data['quantiles'] is not None:
+            sketch.quantiles = QuantileSketch.from_dict(data['quantiles'])
+        if data['top'] is not None:
+            sketch.top = TopValues.from_dict(data['top'])
+        return sketch
+
+def empty_sketch():
+    return {'rows': 0, 'columns': {}}
+
+def update_sketch(sketch, chunk):
+    for col in chunk.columns:
+        column = sketch['columns'].get(col)
+        if column is None:
+            column = sketch['columns'][col] = ColumnSketch(_column_kind(chunk[col]), str(chunk[col].dtype))
+        column.update(chunk[col])
+    sketch['rows'] += len(chunk)
+    return sketch
+
+def sketch_chunks(chunks, total_rows=None, progress=None):
+    # Summarizes an iterable of frames (e.g. pd.read_csv(..., chunksize=n)) one chunk at a time
+    sketch = empty_sketch()
+    for chunk in chunks:
+        update_sketch(sketch, chunk)
+        if progress and total_rows:
+            progress(min(sketch['rows'], total_rows), total_rows)
+    return sketch
+
+def sketch_frame(df, chunk_rows=SKETCH_CHUNK_ROWS, progress=None):
+    chunks = (df.iloc[start:start + chunk_rows] for start in range(0, max(len(df), 1), chunk_rows))
+    return sketch_chunks(chunks, len(df), progress)
+
+def sketch_file(file, name, chunk_rows=SKETCH_CHUNK_ROWS):
+    # Saved sketches are loaded as-is; CSVs are streamed in chunks. Excel has no chunked
+    # reader, so that frame is read in full and dropped once sketched.
+    if name.endswith('.json'):
+        return sketch_from_json(file.read())
+    if name.endswith('.csv'):
+        with pd.read_csv(file, chunksize=chunk_rows) as chunks:
+            return sketch_chunks(chunks)
+    return sketch_frame(pd.read_excel(file), chunk_rows)
+
+def merge_sketches(first, second):
+    # Combines summaries of two parts of the same dataset, e.g. two days of one feed
+    merged = copy.deepcopy(first)
+    merged['rows'] += second['rows']
+    for col, column in second['columns'].items():
+        if col in merged['columns']:
+            merged['columns'][col].merge(column)
+        else:
+            merged['columns'][col] = copy.deepcopy(column)
+    return merged
+
+def _psi(expected, actual):
+    expected = np.maximum(np.asarray(expected, dtype=float), PSI_FLOOR)
+    actual = np.maximum(np.asarray(actual, dtype=float), PSI_FLOOR)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def _numeric_drift(old, new):
+    if not old.quantiles.count or not new.quantiles.count:
+        return None, None
+    # Bins are the baseline deciles, so each holds about a tenth of the baseline values
+    edges = np.unique(old.quantiles.quantiles(np.linspace(0, 1, PSI_BINS + 1)[1:-1]))
+    old_cdf = np.concatenate([[0.0], old.quantiles.cdf(edges), [1.0]])
+    new_cdf = np.concatenate([[0.0], new.quantiles.cdf(edges), [1.0]])
+    psi = _psi(np.diff(old_cdf), np.diff(new_cdf))
+    # Kolmogorov-Smirnov statistic: largest CDF gap over every point either sketch retained
+    points = np.unique(np.concatenate(old.quantiles.levels + new.quantiles.levels))
+    ks = float(np.max(np.abs(old.quantiles.cdf(points) - new.quantiles.cdf(points))))
+    return psi, ks
+
+def _categorical_drift(old, new):
+    old_total = sum(old.top.counts.values()) + old.top.other
+    new_total = sum(new.top.counts.values()) + new.top.other
+    if not old_total or not new_total:
+        return None, []
+    values = sorted(set(old.top.counts) | set(new.top.counts))
+    old_share = np.array([old.top.counts.get(v, 0) for v in values] + [old.top.other]) / old_total
+    new_share = np.array([new.top.counts.get(v, 0) for v in values] + [new.top.other]) / new_total
+    shifts = sorted(zip(values, old_share[:-1], new_share[:-1]), key=lambda s: -abs(s[2] - s[1]))
+    return _psi(old_share, new_share), [
+        {'value': value, 'baseline_share': round(float(before), 4), 'current_share': round(float(after), 4)}
+        for value, before, after in shifts[:3] if before != after]
+
+def _status(psi, null_change):
+    if (psi is not None and psi >= PSI_SIGNIFICANT) or abs(null_change) > 2 * NULL_RATE_TOLERANCE:
+        return 'drift'
+    if (psi is not None and psi >= PSI_MODERATE) or abs(null_change) > NULL_RATE_TOLERANCE:
+        return 'moderate'
+    return 'stable'
+
+def compare_sketches(baseline, current):
+    # Drift of current relative to baseline, computed from the two summaries only
+    old_columns, new_columns = baseline['columns'], current['columns']
+    drift = {
+        'baseline_rows': baseline['rows'],
+        'current_rows': current['rows'],
+        'added_columns': [col for col in new_columns if col not in old_columns],
+        'removed_columns': [col for col in old_columns if col not in new_columns],
+        'dtype_changes': {},
+        'columns': [],
+    }
+    for col, old in old_columns.items():
+        new = new_columns.get(col)
+        if new is None:
+            continue
+        if old.dtype != new.dtype:
+            drift['dtype_changes'][col] = (old.dtype, new.dtype)
+        # Distributions are only compared when both sides were sketched the same way
+        psi = ks = None
+        shifts = []
+        if old.kind == new.kind == 'categorical':
+            psi, shifts = _categorical_drift(old, new)
+        elif old.kind == new.kind:
+            psi, ks = _numeric_drift(old, new)
+        status = _status(psi, new.null_rate - old.null_rate) if old.kind == new.kind else 'schema'
+        drift['columns'].append({
+            'column': col,
+            'kind': new.kind,
+            'status': status,
+            'psi': None if psi is None else round(psi, 4),
+            'ks': None if ks is None else round(ks, 4),
+            'null_rate_baseline': round(old.null_rate, 4),
+            'null_rate_current': round(new.null_rate, 4),
+            'distinct_baseline': old.distinct.estimate(),
+            'distinct_current': new.distinct.estimate(),
+            'mean_baseline': old.mean,
+            'mean_current': new.mean,
+            'top_shifts': shifts,
+        })
+    return drift
+
+def drift_summary(drift):
+    flagged = [c for c in drift['columns'] if c['status'] != 'stable']
+    lines = [f"{len(flagged)} of {len(drift['columns'])} shared columns changed "
+             f"({drift['baseline_rows']} baseline rows, {drift['current_rows']} current rows)"]
+    if drift['added_columns']:
+        lines.append(f"Added columns: {', '.join(map(str, drift['added_columns']))}")
+    if drift['removed_columns']:
+        lines.append(f"Removed columns: {', '.join(map(str, drift['removed_columns']))}")
+    for col, (old, new) in drift['dtype_changes'].items():
+        lines.append(f"{col}: type changed from {old} to {new}")
+    for column in flagged:
+        parts = [f"{column['column']}: {column['status']}"]
+        if column['psi'] is not None:
+            parts.append(f"PSI {column['psi']:.3f}")
+        if column['ks'] is not None:
+            parts.append(f"KS {column['ks']:.3f}")
+        if column['null_rate_current'] != column['null_rate_baseline']:
+            parts.append(f"nulls {column['null_rate_baseline']:.1%} → {column['null_rate_current']:.1%}")
+        lines.append(", ".join(parts))
+    return "\n".join(lines)
+
+def sketch_to_json(sketch):
+    return json.dumps({'rows': sketch['rows'],
+                       'columns': [[col, column.to_dict()] for col, column in sketch['columns'].items()]})
+
+def sketch_from_json(text):
+    data = json.loads(text)
+    if not isinstance(data, dict) or 'columns' not in data:
+        raise ValueError("Not a NeatSheet dataset sketch")
+    return {'rows': data['rows'], 'columns': {col: ColumnSketch.from_dict(column) for col, column in data['columns']}}
@@ -1,38 +1,100 @@
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler, MinMaxScaler, LabelEncoder
+from parallel import map_columns, MAX_WORKERS
 
-def normalize_data(df, columns, method='standard'):
+# Name the working frame is registered under in SQL transformations
+SQL_TABLE_NAME = 'df'
+
+def _scale_column(series, method):
+    # scikit-learn is imported on first use (in the worker, when run in parallel)
+    from sklearn.preprocessing import StandardScaler, MinMaxScaler
+    
+    # The fitted offset and scale are returned too, so later rows can be scaled the same way
+    if method == 'standard':
+        scaler = StandardScaler()
+        values = scaler.fit_transform(series.to_frame())[:, 0]
+        return values, f"Standardized column '{series.name}' (mean=0, std=1)", (scaler.mean_[0], scaler.scale_[0])
+    elif method == 'minmax':
+        scaler = MinMaxScaler()
+        values = scaler.fit_transform(series.to_frame())[:, 0]
+        return (values, f"Min-Max normalized column '{series.name}' (0-1 range)",
+                (scaler.data_min_[0], 1 / scaler.scale_[0]))
+    return None, None, None
+
+def normalize_data(df, columns, method='standard', progress=None, n_jobs=None, state=None):
+    # An empty state dict is filled with each column's offset and scale; a filled one is applied as is
     report = []
-    for col in columns:
-        if method == 'standard':
-            scaler = StandardScaler()
-            df[col] = scaler.fit_transform(df[[col]])
-            report.append(f"Standardized column '{col}' (mean=0, std=1)")
-        elif method == 'minmax':
-            scaler = MinMaxScaler()
-            df[col] = scaler.fit_transform(df[[col]])
-            report.append(f"Min-Max normalized column '{col}' (0-1 range)")
+    if state:
+        for col in columns:
+            offset, scale = state[col]
+            df[col] = (df[col] - offset) / scale
+            report.append(f"Scaled column '{col}' with the fitted {method} parameters")
+        return df, "\n".join(report)
+    results = map_columns(_scale_column, df, columns, args=(method,), n_jobs=n_jobs, progress=progress)
+    for col, (values, line, params) in zip(columns, results):
+        if values is not None:
+            df[col] = values
+            report.append(line)
+            if state is not None:
+                state[col] = params
     return df, "\n".join(report)
 
-def encode_categorical(df, columns, method='onehot'):
+def _encode_column(series, method):
+    from sklearn.preprocessing import LabelEncoder
+    
+    # The categories are returned too, so later rows are encoded against the same vocabulary
+    if method == 'onehot':
+        categorical = pd.Categorical(series)
+        dummies = pd.get_dummies(categorical, prefix=series.name)
+        return (dummies, f"One-hot encoded '{series.name}' → {len(dummies.columns)} new columns",
+                categorical.categories.tolist())
+    elif method == 'label':
+        encoder = LabelEncoder()
+        return encoder.fit_transform(series), f"Label encoded column '{series.name}'", encoder.classes_.tolist()
+    return None, None, None
+
+def _encode_with_vocabulary(series, method, categories):
+    # Values missing from the vocabulary get no dummy column set, or the label -1
+    categorical = pd.Categorical(series, categories=categories)
+    unseen = int((categorical.codes == -1).sum() - series.isna().sum())
+    detail = f" ({unseen} values not in the fitted vocabulary)" if unseen else ""
+    if method == 'onehot':
+        dummies = pd.get_dummies(categorical, prefix=series.name)
+        return dummies, f"One-hot encoded '{series.name}' with the fitted vocabulary{detail}", categories
+    line = f"Label encoded column '{series.name}' with the fitted vocabulary{detail}"
+    return categorical.codes.astype(np.int64), line, categories
+
+def encode_categorical(df, columns, method='onehot', progress=None, n_jobs=None, state=None):
+    # An empty state dict is filled with each column's vocabulary; a filled one is applied as is
     report = []
-    for col in columns:
+    new_columns = []
+    if state:
+        results = [_encode_with_vocabulary(df[col], method, state[col]) for col in columns]
+    else:
+        results = map_columns(_encode_column, df, columns, args=(method,), n_jobs=n_jobs, progress=progress)
+    for col, (encoded, line, categories) in zip(columns, results):
+        if encoded is None:
+            continue
         if method == 'onehot':
-            dummies = pd.get_dummies(df[col], prefix=col)
-            df = pd.concat([df, dummies], axis=1)
-            report.append(f"One-hot encoded '{col}' → {len(dummies.columns)} new columns")
-        elif method == 'label':
-            encoder = LabelEncoder()
-            df[col] = encoder.fit_transform(df[col])
-            report.append(f"Label encoded column '{col}'")
+            encoded.index = df.index
+            new_columns.append(encoded)
+        else:
+            df[col] = encoded
+        report.append(line)
+        if state is not None:
+            state[col] = categories
+    if new_columns:
+        df = pd.concat([df] + new_columns, axis=1)
     return df, "\n".join(report)
 
-def extract_datetime_features(df, column, features):
+def extract_datetime_features(df, column, features, errors='report'):
+    # errors='raise' raises instead of returning the frame unchanged with a failure report
     if not pd.api.types.is_datetime64_any_dtype(df[column]):
         try:
             df[column] = pd.to_datetime(df[column])
-        except:
+        except Exception:
+            if errors == 'raise':
+                raise
             return df, "Conversion to datetime failed"
     
     extracted = []
@@ -57,7 +119,7 @@ def extract_datetime_features(df, column, features):
     
     return df, f"Extracted features from '{column}': {', '.join(extracted)}"
 
-def apply_custom_transformation(df, column, operation, new_column=None):
+def apply_custom_transformation(df, column, operation, new_column=None, errors='report'):
     try:
         safe_env = {'np': np, 'pd': pd}
         if new_column:
@@ -68,4 +130,65 @@ def apply_custom_transformation(df, column, operation, new_column=None):
             report = f"Transformed '{column}' with operation: {operation}"
         return df, report
     except Exception as e:
+        if errors == 'raise':
+            raise
         return df, f"Transformation failed: {str(e)}"
+
+def _arrow_table(df):
+    # Object columns holding mixed Python types (common in Excel uploads) can't become Arrow
+    # columns as they are, so those are passed to SQL as text
+    import pyarrow as pa
+    
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False), []
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    converted = []
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_object_dtype(series.dtype):
+            try:
+                pa.array(series, from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                series = series.astype(str).where(series.notna())
+                converted.append(col)
+        columns[col] = series
+    return pa.Table.from_pandas(pd.DataFrame(columns, index=df.index), preserve_index=False), converted
+
+def run_sql_query(df, query, table_name=SQL_TABLE_NAME, progress=None):
+    try:
+        import duckdb
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("SQL transformations need the duckdb and pyarrow packages (pip install duckdb pyarrow)")
+    
+    if progress:
+        progress(0, 1)
+    # The frame is handed to DuckDB as an Arrow table, which wraps numeric buffers without copying
+    table, converted = _arrow_table(df)
+    # Queries only see the registered frame: no file, network or extension access, and the
+    # setting can't be switched back from inside the query
+    con = duckdb.connect(config={'threads': MAX_WORKERS, 'enable_external_access': False})
+    try:
+        con.execute("SET lock_configuration = true")
+        con.register(table_name, table)
+        result = con.execute(query).df()
+    except duckdb.Error as e:
+        raise ValueError(f"SQL query failed: {str(e)}")
+    finally:
+        con.close()
+    if progress:
+        progress(1, 1)
+    
+    added = [col for col in result.columns if col not in df.columns]
+    removed = [col for col in df.columns if col not in result.columns]
+    report = [f"Applied SQL query: {' '.join(query.split())}",
+              f"Rows: {len(df)} → {len(result)}, columns: {len(df.columns)} → {len(result.columns)}"]
+    if converted:
+        report.append(f"Read mixed-type columns as text: {', '.join(map(str, converted))}")
+    if added:
+        report.append(f"Added columns: {', '.join(map(str, added))}")
+    if removed:
+        report.append(f"Removed columns: {', '.join(map(str, removed))}")
+    return result, "\n".join(report)
@@ -0,0 +1,212 @@
+import pandas as pd
+import numpy as np
+import json
+import re
+
+# Checks a rule can use; every rule is a plain dict such as
+# {'column': 'age', 'check': 'range', 'min': 0, 'max': 120} so rule sets can be saved as JSON
+RULE_CHECKS = ['not_null', 'type', 'range', 'regex', 'allowed', 'unique', 'expression']
+RULE_TYPES = ['numeric', 'integer', 'string', 'datetime', 'bool']
+
+# Rules are evaluated over row chunks of this size to bound temporary memory
+VALIDATION_CHUNK_ROWS = 1_000_000
+SAMPLE_ROWS = 5
+
+def _per_unique(series, func):
+    # Value checks run once per distinct value and are mapped back to the rows by code
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    if not len(uniques):
+        return np.zeros(len(series), dtype=bool)
+    bad = np.append(np.asarray(func(pd.Series(uniques, dtype=object)), dtype=bool), False)
+    return bad[codes]
+
+def _type_violations(series, expected):
+    if expected == 'numeric':
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            return np.zeros(len(series), dtype=bool)
+        return _per_unique(series, lambda values: pd.to_numeric(values, errors='coerce').isna())
+    if expected == 'integer':
+        if pd.api.types.is_integer_dtype(series):
+            return np.zeros(len(series), dtype=bool)
+        if pd.api.types.is_float_dtype(series) and isinstance(series.dtype, np.dtype):
+            values = series.to_numpy()
+            return (np.trunc(values) != values) & ~np.isnan(values)
+        return _per_unique(series, lambda values: (pd.to_numeric(values, errors='coerce') % 1).ne(0))
+    if expected == 'string':
+        if pd.api.types.is_string_dtype(series) and not pd.api.types.is_object_dtype(series):
+            return np.zeros(len(series), dtype=bool)
+        return _per_unique(series, lambda values: ~values.map(lambda value: isinstance(value, str)))
+    if expected == 'datetime':
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return np.zeros(len(series), dtype=bool)
+        return _per_unique(series, lambda values: pd.to_datetime(values.astype(str), errors='coerce',
+                                                                  format='mixed').isna())
+    if expected == 'bool':
+        if pd.api.types.is_bool_dtype(series):
+            return np.zeros(len(series), dtype=bool)
+        return _per_unique(series, lambda values: ~values.map(lambda value: isinstance(value, (bool, np.bool_))))
+    raise ValueError(f"Unknown type '{expected}'; expected one of {', '.join(RULE_TYPES)}")
+
+def _range_violations(series, bounds):
+    low, high = bounds['min'], bounds['max']
+    bad = np.zeros(len(series), dtype=bool)
+    if low is not None:
+        bad |= (series < low).to_numpy(dtype=bool, na_value=False)
+    if high is not None:
+        bad |= (series > high).to_numpy(dtype=bool, na_value=False)
+    return bad
+
+def _allowed_violations(series, allowed):
+    # Allowed values typed in the UI arrive as text; match numeric columns on their numeric form too
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        numbers = pd.to_numeric(pd.Series(allowed, dtype=object), errors='coerce').dropna().to_numpy(dtype=float)
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        return ~np.isin(values, numbers) & ~np.isnan(values)
+    return (~series.isin(allowed) & series.notna()).to_numpy(dtype=bool)
+
+def describe_rule(rule):
+    column, check = rule.get('column'), rule['check']
+    if check == 'not_null':
+        return f"{column} is not null"
+    if check == 'type':
+        return f"{column} is {rule['type']}"
+    if check == 'range':
+        low, high = rule.get('min'), rule.get('max')
+        if low is not None and high is not None:
+            return f"{column} between {low} and {high}"
+        return f"{column} >= {low}" if low is not None else f"{column} <= {high}"
+    if check == 'regex':
+        return f"{column} matches {rule['pattern']}"
+    if check == 'allowed':
+        return f"{column} in {list(rule['values'])}"
+    if check == 'unique':
+        return f"{column} is unique"
+    return rule['expression']
+
+def _range_bounds(series, rule):
+    # Range rules need a numeric or datetime column and bounds of the same kind
+    column = rule['column']
+    if pd.api.types.is_datetime64_any_dtype(series):
+        bounds = {}
+        for bound in ('min', 'max'):
+            try:
+                value = pd.Timestamp(rule[bound]) if rule.get(bound) is not None else None
+            except (ValueError, TypeError):
+                raise ValueError(f"Range rule on '{column}' needs dates as bounds") from None
+            # Bounds without a time zone are read in the column's time zone
+            if value is not None and series.dt.tz is not None and value.tzinfo is None:
+                value = value.tz_localize(series.dt.tz)
+            bounds[bound] = value
+        return bounds
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        raise ValueError(f"Range rule on '{column}' needs a numeric or datetime column, not {series.dtype}")
+    try:
+        return {bound: float(rule[bound]) if rule.get(bound) is not None else None for bound in ('min', 'max')}
+    except (ValueError, TypeError):
+        raise ValueError(f"Range rule on '{column}' needs numbers as bounds") from None
+
+def _expression_mask(df, expression):
+    # Expressions are tried on the first row, so syntax errors, unknown columns and type mismatches
+    # surface when the rule is added rather than halfway through a validation
+    try:
+        probe = df.head(1).eval(expression)
+    except Exception as e:
+        raise ValueError(f"Expression '{expression}' can't be evaluated: {str(e)}") from None
+    if not pd.api.types.is_bool_dtype(getattr(probe, 'dtype', None)):
+        raise ValueError(f"Expression '{expression}' must be a condition that is true or false for each row")
+    return lambda chunk: ~chunk.eval(expression).fillna(False).to_numpy(dtype=bool)
+
+def compile_rules(rules, df):
+    # Each compiled rule is a function chunk -> boolean mask of violating rows. Uniqueness needs the
+    # whole column, so it is computed once up front and sliced per chunk. Rules are checked against
+    # the frame's columns and types here, so a compiled rule doesn't fail part way through.
+    compiled = []
+    for rule in rules:
+        check = rule.get('check')
+        column = rule.get('column')
+        if check not in RULE_CHECKS:
+            raise ValueError(f"Unknown check '{check}'; expected one of {', '.join(RULE_CHECKS)}")
+        if check != 'expression' and column not in df.columns:
+            raise ValueError(f"Rule '{describe_rule(rule)}' refers to missing column '{column}'")
+        if check == 'not_null':
+            mask = lambda chunk, column=column: chunk[column].isna().to_numpy()
+        elif check == 'type':
+            if rule.get('type') not in RULE_TYPES:
+                raise ValueError(f"Unknown type '{rule.get('type')}'; expected one of {', '.join(RULE_TYPES)}")
+            mask = lambda chunk, column=column, expected=rule['type']: _type_violations(chunk[column], expected)
+        elif check == 'range':
+            if rule.get('min') is None and rule.get('max') is None:
+                raise ValueError(f"Range rule on '{column}' needs a min or a max")
+            bounds = _range_bounds(df[column], rule)
+            mask = lambda chunk, column=column, bounds=bounds: _range_violations(chunk[column], bounds)
+        elif check == 'regex':
+            try:
+                pattern = re.compile(rule['pattern'])
+            except re.error as e:
+                raise ValueError(f"Invalid regex '{rule['pattern']}': {str(e)}") from None
+            mask = lambda chunk, column=column, pattern=pattern: _per_unique(
+                chunk[column], lambda values: ~values.map(lambda value: bool(pattern.fullmatch(str(value)))))
+        elif check == 'allowed':
+            mask = lambda chunk, column=column, allowed=list(rule['values']): _allowed_violations(chunk[column], allowed)
+        elif check == 'unique':
+            mask = ('unique', column)
+        else:
+            mask = _expression_mask(df, rule['expression'])
+        compiled.append((rule, mask))
+    return compiled
+
+def validate_frame(df, rules, chunk_rows=VALIDATION_CHUNK_ROWS, sample_rows=SAMPLE_ROWS, progress=None):
+    compiled = compile_rules(rules, df)
+    duplicated = {column: df[column].duplicated(keep=False).to_numpy() & df[column].notna().to_numpy()
+                  for rule, mask in compiled if isinstance(mask, tuple) for column in [mask[1]]}
+
+    counts = [0] * len(compiled)
+    samples = [[] for _ in compiled]
+    failing_rows = 0
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        failing = np.zeros(len(chunk), dtype=bool)
+        for i, (rule, mask) in enumerate(compiled):
+            if isinstance(mask, tuple):
+                bad = duplicated[mask[1]][start:start + chunk_rows]
+            else:
+                bad = mask(chunk)
+            failing |= bad
+            counts[i] += int(bad.sum())
+            if len(samples[i]) < sample_rows:
+                positions = np.flatnonzero(bad)[:sample_rows - len(samples[i])]
+                samples[i].extend(chunk.index[positions].tolist())
+        failing_rows += int(failing.sum())
+        if progress:
+            progress(min(start + chunk_rows, len(df)), len(df))
+
+    return {
+        'passed': failing_rows == 0,
+        'rows_checked': len(df),
+        'failing_rows': failing_rows,
+        'rules': [{
+            'rule': describe_rule(rule),
+            'column': rule.get('column'),
+            'check': rule['check'],
+            'violations': count,
+            'sample_rows': sample,
+        } for (rule, mask), count, sample in zip(compiled, counts, samples)],
+    }
+
+def validation_summary(result):
+    if result['passed']:
+        return f"All {len(result['rules'])} validation rules passed on {result['rows_checked']} rows"
+    failed = [r for r in result['rules'] if r['violations']]
+    lines = [f"{result['failing_rows']} of {result['rows_checked']} rows fail {len(failed)} of "
+             f"{len(result['rules'])} validation rules"]
+    lines.extend(f"{r['rule']}: {r['violations']} violations" for r in failed)
+    return "\n".join(lines)
+
+def rules_to_json(rules):
+    return json.dumps(rules, indent=2, default=str)
+
+def rules_from_json(text):
+    rules = json.loads(text)
+    if not isinstance(rules, list) or not all(isinstance(rule, dict) and 'check' in rule for rule in rules):
+        raise ValueError("Validation rules must be a JSON list of rule objects")
+    return rules
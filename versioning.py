@@ -0,0 +1,362 @@
+import pandas as pd
+import numpy as np
+import os
+import shutil
+import tempfile
+import pickle
+import itertools
+import threading
+from datetime import datetime
+
+# Version ids are unique across stores, so caches keyed by version survive a new upload
+_version_ids = itertools.count(1)
+
+# Versions are kept until their column buffers exceed this many bytes
+DEFAULT_MEMORY_CAP = 512 * 1024 ** 2
+
+def copy_on_write_enabled():
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except (KeyError, pd.errors.OptionError):
+        return False
+
+def _buffers(values):
+    # Extension arrays are re-wrapped on every column access, so compare the buffers underneath
+    if isinstance(values, np.ndarray):
+        return [(values.__array_interface__['data'][0], values.shape, values.strides, values.dtype.str)]
+    if isinstance(values, pd.Categorical):
+        categories = _buffers(values.categories.array)
+        return None if categories is None else _buffers(values.codes) + categories
+    pa_array = getattr(values, '_pa_array', None)
+    if pa_array is not None:
+        return [(buf.address, buf.size) for chunk in pa_array.chunks for buf in chunk.buffers() if buf is not None]
+    if hasattr(values, '_data') and hasattr(values, '_mask'):
+        return _buffers(values._data) + _buffers(values._mask)
+    if hasattr(values, '_ndarray'):
+        return _buffers(values._ndarray)
+    return None
+
+def _same_buffer(a, b):
+    if a is b:
+        return True
+    if type(a) is not type(b) or a.dtype != b.dtype or len(a) != len(b):
+        return False
+    buffers = _buffers(a)
+    return buffers is not None and buffers == _buffers(b)
+
+def buffer_key(values):
+    # Identifies the memory behind a column, so buffers shared between frames are sized once
+    buffers = _buffers(values)
+    return None if buffers is None else tuple(buffers)
+
+def _column_bytes(values):
+    return int(pd.Series(values, copy=False).memory_usage(deep=True, index=False))
+
+# Parquet needs unique string column names, so spilled frames use positions and keep the names aside.
+# Object columns Arrow can't type (e.g. numbers mixed with text) are stored pickled, one value per
+# cell, under a marked name and restored on read.
+PICKLED_SUFFIX = ':pickle'
+
+def write_frame_parquet(df, path):
+    import pyarrow as pa
+    frame = df.copy(deep=False)
+    frame.columns = [str(i) for i in range(frame.shape[1])]
+    try:
+        frame.to_parquet(path, index=None)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        names = list(frame.columns)
+        for i, name in enumerate(names):
+            if frame[name].dtype == object:
+                try:
+                    pa.array(frame[name], from_pandas=True)
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    frame[name] = frame[name].map(pickle.dumps)
+                    names[i] = name + PICKLED_SUFFIX
+        frame.columns = names
+        frame.to_parquet(path, index=None)
+    return list(df.columns)
+
+def read_frame_parquet(path, columns):
+    frame = pd.read_parquet(path)
+    for name in frame.columns:
+        if name.endswith(PICKLED_SUFFIX):
+            frame[name] = frame[name].map(pickle.loads).astype(object)
+    frame.columns = pd.Index(columns)
+    return frame
+
+class FrameVersion:
+    def __init__(self, version_id, label, columns, column_keys, index):
+        self.id = version_id
+        self.label = label
+        self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.columns = columns
+        self.column_keys = column_keys
+        self.index = index
+        self.shape = (len(index), len(columns))
+        self.spill_path = None
+
+    @property
+    def in_memory(self):
+        return self.column_keys is not None
+
+class FrameVersionStore:
+    def __init__(self, memory_cap=DEFAULT_MEMORY_CAP, max_versions=50, spill=True, spill_dir=None):
+        self.memory_cap = memory_cap
+        self.max_versions = max_versions
+        self.spill = spill
+        self.spill_dir = spill_dir
+        self._owns_spill_dir = False
+        self.copy_on_write = copy_on_write_enabled()
+        self.versions = []
+        self.position = -1
+        self._next_key = 1
+        # Column pool: key -> [values, nbytes, refcount], shared between versions
+        self._pool = {}
+        # Session budgets size and spill stores from other sessions' threads
+        self._lock = threading.RLock()
+
+    # ----- committing -----
+    def commit(self, df, label):
+        with self._lock:
+            return self._commit(df, label)
+
+    def _commit(self, df, label):
+        previous = self._current_version()
+        prev_columns = {}
+        if previous is not None and previous.in_memory:
+            prev_columns = dict(zip(previous.columns, previous.column_keys))
+
+        column_keys = []
+        for i, col in enumerate(df.columns):
+            column = df.iloc[:, i]
+            key = prev_columns.get(col)
+            if key is None or not self._matches(key, column.values):
+                key = self._add_column(column)
+            self._pool[key][2] += 1
+            column_keys.append(key)
+
+        index = df.index
+        if previous is not None and previous.index is not None and previous.index.equals(index):
+            index = previous.index
+
+        # Committing after an undo discards the redo branch
+        for version in self.versions[self.position + 1:]:
+            self._release(version)
+        del self.versions[self.position + 1:]
+
+        version = FrameVersion(next(_version_ids), label, list(df.columns), column_keys, index)
+        self.versions.append(version)
+        self.position = len(self.versions) - 1
+        self._enforce_limits()
+        return version.id
+
+    def _matches(self, key, values):
+        stored = self._pool[key][0].values
+        if _same_buffer(stored, values):
+            return True
+        if self.copy_on_write:
+            # Under copy-on-write a changed column always gets a new buffer
+            return False
+        if stored.dtype != values.dtype or len(stored) != len(values):
+            return False
+        return pd.Series(stored, copy=False).equals(pd.Series(values, copy=False))
+
+    def _add_column(self, column):
+        # The pool keeps Series rather than arrays: under copy-on-write pandas tracks them as references
+        # and copies the buffer before an in-place write (fillna(inplace=True), df.loc[...] = ...), so
+        # stored versions never change and a mutated column shows up as a new buffer
+        values = column.reset_index(drop=True)
+        if not self.copy_on_write:
+            values = values.copy()
+        key = self._next_key
+        self._next_key += 1
+        self._pool[key] = [values, _column_bytes(values), 0]
+        return key
+
+    def _release(self, version):
+        if version.in_memory:
+            self._release_columns(version)
+        if version.spill_path and os.path.exists(version.spill_path):
+            os.unlink(version.spill_path)
+            version.spill_path = None
+
+    def _release_columns(self, version):
+        for key in version.column_keys:
+            entry = self._pool[key]
+            entry[2] -= 1
+            if entry[2] == 0:
+                del self._pool[key]
+        version.column_keys = None
+
+    # ----- memory management -----
+    def _indexes(self):
+        indexes = {}
+        for version in self.versions:
+            if version.in_memory:
+                indexes.setdefault(id(version.index), version.index)
+        return list(indexes.values())
+
+    def memory_usage(self):
+        with self._lock:
+            total = sum(entry[1] for entry in self._pool.values())
+            return total + sum(index.memory_usage(deep=True) for index in self._indexes())
+
+    def memory_parts(self):
+        # The pooled columns and indexes, for callers that size them together with other frames
+        with self._lock:
+            return [entry[0] for entry in self._pool.values()] + self._indexes()
+
+    def _enforce_limits(self):
+        while len(self.versions) > self.max_versions and self.position > 0:
+            self._release(self.versions.pop(0))
+            self.position -= 1
+
+        # Oldest versions go first; the current version always stays in memory
+        current = self._current_version()
+        for version in list(self.versions):
+            if self.memory_usage() <= self.memory_cap:
+                break
+            if version is current or not version.in_memory:
+                continue
+            if self.spill:
+                self._spill(version)
+            else:
+                self._release(version)
+                self.versions.remove(version)
+        self.position = self.versions.index(current)
+
+    def _spill(self, version):
+        # A version that can't be written (full disk, unpicklable values) stays in memory;
+        # spilling is only there to relieve memory and never fails a commit
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='neatsheet_versions_')
+            self._owns_spill_dir = True
+        path = os.path.join(self.spill_dir, f"version_{version.id}.parquet")
+        try:
+            write_frame_parquet(self._materialize(version), path)
+        except Exception:
+            if os.path.exists(path):
+                os.unlink(path)
+            return
+        version.spill_path = path
+        self._release_columns(version)
+        version.index = None
+
+    def spill_all(self):
+        # Used for idle sessions; the next commit or checkout reads the current version back
+        with self._lock:
+            for version in self.versions:
+                if version.in_memory:
+                    self._spill(version)
+
+    # ----- checkout -----
+    def _current_version(self):
+        if 0 <= self.position < len(self.versions):
+            return self.versions[self.position]
+        return None
+
+    def _materialize(self, version):
+        if not version.in_memory:
+            return read_frame_parquet(version.spill_path, version.columns)
+        if not version.column_keys:
+            return pd.DataFrame(index=version.index, columns=pd.Index(version.columns))
+        frame = pd.DataFrame({i: self._pool[key][0] for i, key in enumerate(version.column_keys)}, copy=False)
+        frame.index = version.index
+        frame.columns = pd.Index(version.columns)
+        return frame
+
+    def checkout(self, version_id):
+        with self._lock:
+            for version in self.versions:
+                if version.id == version_id:
+                    frame = self._materialize(version)
+                    # Without copy-on-write the caller could mutate pooled buffers in place
+                    return frame if self.copy_on_write else frame.copy()
+        raise KeyError(f"Unknown version {version_id}")
+
+    def current(self):
+        with self._lock:
+            version = self._current_version()
+            return None if version is None else self.checkout(version.id)
+
+    @property
+    def current_id(self):
+        version = self._current_version()
+        return None if version is None else version.id
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.versions) - 1
+
+    def undo(self):
+        with self._lock:
+            if not self.can_undo():
+                return None
+            self.position -= 1
+            return self.current()
+
+    def redo(self):
+        with self._lock:
+            if not self.can_redo():
+                return None
+            self.position += 1
+            return self.current()
+
+    # ----- inspection -----
+    def diff(self, old_id, new_id):
+        with self._lock:
+            return self._diff(old_id, new_id)
+
+    def _diff(self, old_id, new_id):
+        old = self._find(old_id)
+        new = self._find(new_id)
+        common = [col for col in new.columns if col in old.columns]
+
+        if old.in_memory and new.in_memory:
+            # Pooled columns are shared, so an unchanged column keeps its key
+            old_keys = dict(zip(old.columns, old.column_keys))
+            new_keys = dict(zip(new.columns, new.column_keys))
+            changed = [col for col in common if old_keys[col] != new_keys[col]]
+        else:
+            old_frame = self._materialize(old).reset_index(drop=True)
+            new_frame = self._materialize(new).reset_index(drop=True)
+            changed = [col for col in common if not old_frame[col].equals(new_frame[col])]
+
+        return {
+            'added': [col for col in new.columns if col not in old.columns],
+            'removed': [col for col in old.columns if col not in new.columns],
+            'changed': changed,
+            'rows_before': old.shape[0],
+            'rows_after': new.shape[0],
+        }
+
+    def _find(self, version_id):
+        for version in self.versions:
+            if version.id == version_id:
+                return version
+        raise KeyError(f"Unknown version {version_id}")
+
+    def history(self):
+        return [{
+            'id': version.id,
+            'label': version.label,
+            'timestamp': version.timestamp,
+            'shape': version.shape,
+            'current': i == self.position,
+            'spilled': not version.in_memory,
+        } for i, version in enumerate(self.versions)]
+
+    def close(self):
+        with self._lock:
+            for version in self.versions:
+                self._release(version)
+            self.versions = []
+            self.position = -1
+            if self._owns_spill_dir and self.spill_dir:
+                shutil.rmtree(self.spill_dir, ignore_errors=True)
+                self.spill_dir = None
+                self._owns_spill_dir = False